@@ -0,0 +1,182 @@
+import argparse
+import logging
+import pathlib
+from typing import List, Optional
+
+from src.core import benchmark, defaults, synthetic_template
+
+
+def run(
+    work_dir: pathlib.Path,
+    spec: synthetic_template.TemplateSpec,
+    repeat: int = 3,
+    baselines_path: pathlib.Path = pathlib.Path("benchmarks.json"),
+    save: Optional[str] = None,
+    compare: Optional[str] = None,
+    threshold: float = benchmark.DEFAULT_THRESHOLD,
+) -> List[benchmark.BenchmarkResult]:
+    """Benchmark the runner on a synthetic template, then store the results as a
+    baseline or compare them with a baseline
+
+    Args:
+        work_dir (pathlib.Path): directory receiving the synthetic template and the
+            outputs, removed at the end
+        spec (synthetic_template.TemplateSpec): shape of the template
+        repeat (int): number of measures of each benchmark
+        baselines_path (pathlib.Path): file storing the baselines
+        save (Optional[str]): label of the baseline stored, such as a commit
+        compare (Optional[str]): label of the baseline compared with, the
+            comparison is skipped if the baseline is missing
+        threshold (float): relative slowdown of the median time reported as a
+            regression
+
+    Raises:
+        RuntimeError: at least one benchmark regressed
+
+    Returns:
+        List[benchmark.BenchmarkResult]: result of each benchmark
+    """
+    baseline = None
+    if compare is not None:
+        baseline = benchmark.get_baseline(baselines_path=baselines_path, label=compare)
+        if baseline is None:
+            logging.warning(
+                "No baseline {label} in {baselines_path}, the results are not"
+                " compared".format(label=compare, baselines_path=baselines_path)
+            )
+    results = benchmark.run_benchmarks(work_dir=work_dir, spec=spec, repeat=repeat)
+    logging.info(
+        "Benchmark results:\n{report}".format(
+            report=benchmark.format_results(results=results)
+        )
+    )
+    if save is not None:
+        benchmark.save_baseline(
+            baselines_path=baselines_path, label=save, spec=spec, results=results
+        )
+        logging.info(
+            "Stored the baseline {label} into {baselines_path}".format(
+                label=benchmark.get_baseline_label(label=save),
+                baselines_path=baselines_path,
+            )
+        )
+    if baseline is not None:
+        report, regressions = benchmark.compare_results(
+            results=results, baseline=baseline, threshold=threshold
+        )
+        logging.info(
+            "Comparison with the baseline {label}:\n{report}".format(
+                label=compare, report=report
+            )
+        )
+        if regressions:
+            raise RuntimeError(report)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    default_spec = synthetic_template.TemplateSpec()
+    parser.add_argument(
+        "--files", help="Number of text files", type=int, default=default_spec.files
+    )
+    parser.add_argument(
+        "--depth", help="Depth of the directories", type=int, default=default_spec.depth
+    )
+    parser.add_argument(
+        "--files-per-dir",
+        help="Number of files per directory",
+        type=int,
+        default=default_spec.files_per_dir,
+    )
+    parser.add_argument(
+        "--ignored-ratio",
+        help="Ratio of the directories ignored by the .gitignore of the template",
+        type=float,
+        default=default_spec.ignored_ratio,
+    )
+    parser.add_argument(
+        "--text-size",
+        help="Size of each text file, such as 4K",
+        type=defaults.parse_size,
+        default=default_spec.text_size,
+    )
+    parser.add_argument(
+        "--binary-files",
+        help="Number of binary asset files",
+        type=int,
+        default=default_spec.binary_files,
+    )
+    parser.add_argument(
+        "--binary-size",
+        help="Size of each binary asset file, such as 1M",
+        type=defaults.parse_size,
+        default=default_spec.binary_size,
+    )
+    parser.add_argument(
+        "--seed", help="Seed of the synthetic template", type=int, default=0
+    )
+    parser.add_argument(
+        "--repeat", help="Number of measures of each benchmark", type=int, default=3
+    )
+    parser.add_argument(
+        "--work-dir",
+        help="Directory receiving the synthetic template, removed at the end",
+        default=pathlib.Path(".", ".cookiecutter-runner_benchmark"),
+    )
+    parser.add_argument(
+        "--baselines",
+        help="File storing the baselines",
+        default=pathlib.Path(".", "benchmarks.json"),
+    )
+    parser.add_argument(
+        "--save",
+        help="Store the results as a baseline with this label (the current git commit"
+        " if no label is given)",
+        nargs="?",
+        const="",
+        default=None,
+    )
+    parser.add_argument(
+        "--compare",
+        help="Compare the results with the baseline of this label, fail if a median"
+        " time regressed beyond the threshold (skipped if the baseline is missing)",
+        default=None,
+    )
+    parser.add_argument(
+        "--threshold",
+        help="Relative slowdown of the median time reported as a regression",
+        type=float,
+        default=benchmark.DEFAULT_THRESHOLD,
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    run(
+        work_dir=pathlib.Path(args.work_dir),
+        spec=synthetic_template.TemplateSpec(
+            files=args.files,
+            depth=args.depth,
+            files_per_dir=args.files_per_dir,
+            ignored_ratio=args.ignored_ratio,
+            text_size=args.text_size,
+            binary_files=args.binary_files,
+            binary_size=args.binary_size,
+            seed=args.seed,
+        ),
+        repeat=args.repeat,
+        baselines_path=pathlib.Path(args.baselines),
+        save=(
+            (args.save or benchmark.get_commit(cwd=pathlib.Path(__file__).parent))
+            if args.save is not None
+            else None
+        ),
+        compare=args.compare,
+        threshold=args.threshold,
+    )
+
+
+if __name__ == "__main__":
+    main()
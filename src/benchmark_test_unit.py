@@ -0,0 +1,43 @@
+import logging
+import pathlib
+import shutil
+
+import pytest
+
+from src import benchmark as test_module
+from src.core import benchmark, synthetic_template
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "benchmark_test_assets"
+)
+
+
+def test_run_without_baseline(caplog: pytest.LogCaptureFixture) -> None:
+    baselines_path = TEST_ASSETS_DIR.joinpath("baselines_cached", "baselines.json")
+    if baselines_path.parent.is_dir():
+        shutil.rmtree(baselines_path.parent)
+    spec = synthetic_template.TemplateSpec(files=20, depth=2, files_per_dir=5)
+    with caplog.at_level(logging.WARNING):
+        results = test_module.run(
+            work_dir=TEST_ASSETS_DIR.joinpath("work_cached"),
+            spec=spec,
+            repeat=1,
+            baselines_path=baselines_path,
+            save="abc1234-dirty",
+            compare="abc1233",
+        )
+    assert "No baseline abc1233" in caplog.text
+    assert len(results) == 4
+    assert sorted(benchmark.load_baselines(baselines_path=baselines_path)) == [
+        "abc1234"
+    ]
+    # The next commit compares with the baseline saved from the dirty tree
+    test_module.run(
+        work_dir=TEST_ASSETS_DIR.joinpath("work_cached"),
+        spec=spec,
+        repeat=1,
+        baselines_path=baselines_path,
+        compare="abc1234",
+        threshold=float("inf"),
+    )
+    shutil.rmtree(baselines_path.parent)
@@ -0,0 +1,333 @@
+import json
+import logging
+import os
+import pathlib
+import shutil
+import statistics
+import subprocess
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from src.core import initialize_project, isolate_temp_template, synthetic_template
+
+BASELINES_VERSION = 1
+# Suffix of git describe --dirty, stripped from the baseline labels
+DIRTY_SUFFIX = "-dirty"
+# Relative slowdown of the median time reported as a regression
+DEFAULT_THRESHOLD = 0.1
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    files: int
+    times: Tuple[float, ...]
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.times)
+
+    @property
+    def throughput(self) -> float:
+        return self.files / self.median if self.median > 0 else float("inf")
+
+
+def measure(
+    func: Callable[[], object],
+    repeat: int,
+    setup: Optional[Callable[[], object]] = None,
+) -> Tuple[float, ...]:
+    """Measure the wall time of a function
+
+    Args:
+        func (Callable[[], object]): measured function
+        repeat (int): number of measures
+        setup (Optional[Callable[[], object]]): called before each measure, not
+            measured
+
+    Returns:
+        Tuple[float, ...]: wall time of each measure in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return tuple(times)
+
+
+def run_benchmarks(
+    work_dir: pathlib.Path,
+    spec: synthetic_template.TemplateSpec,
+    repeat: int = 3,
+) -> List[BenchmarkResult]:
+    """Synthesize a template, then measure the path discovery, the isolation (from
+    scratch and up to date) and the rendering
+
+    Args:
+        work_dir (pathlib.Path): directory receiving the template and the outputs,
+            removed at the end
+        spec (synthetic_template.TemplateSpec): shape of the template
+        repeat (int): number of measures of each benchmark
+
+    Raises:
+        ValueError: repeat is not a positive number
+
+    Returns:
+        List[BenchmarkResult]: result of each benchmark, the throughput is in
+        isolated files per second
+    """
+    if repeat < 1:
+        raise ValueError("Invalid number of repeats: {repeat}".format(repeat=repeat))
+    work_dir = work_dir.absolute()
+    template_dir = work_dir.joinpath("template")
+    cache_dir = work_dir.joinpath("isolated")
+    output_dir = work_dir.joinpath("output")
+    try:
+        files = synthetic_template.synthesize_template(
+            template_dir=template_dir, spec=spec
+        )
+        logging.info(
+            "Synthesized {files} valid files into {template_dir}".format(
+                files=files, template_dir=template_dir
+            )
+        )
+
+        def remove(dir_path: pathlib.Path) -> None:
+            if dir_path.is_dir():
+                shutil.rmtree(dir_path)
+
+        def isolate() -> None:
+            isolate_temp_template.run(template_dir=template_dir, cache_dir=cache_dir)
+
+        results = [
+            BenchmarkResult(
+                name="get_valid_paths",
+                files=files,
+                times=measure(
+                    func=lambda: isolate_temp_template.get_valid_paths(
+                        cur_dir=template_dir
+                    ),
+                    repeat=repeat,
+                ),
+            ),
+            BenchmarkResult(
+                name="isolate",
+                files=files,
+                times=measure(
+                    func=isolate, repeat=repeat, setup=lambda: remove(cache_dir)
+                ),
+            ),
+            BenchmarkResult(
+                name="isolate_up_to_date",
+                files=files,
+                times=measure(func=isolate, repeat=repeat),
+            ),
+            BenchmarkResult(
+                name="create_project",
+                files=files,
+                times=measure(
+                    func=lambda: initialize_project.create_project(
+                        template_dir=cache_dir, output_dir=output_dir
+                    ),
+                    repeat=repeat,
+                    setup=lambda: remove(output_dir),
+                ),
+            ),
+        ]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def get_commit(cwd: Optional[pathlib.Path] = None) -> str:
+    """Get the current git commit, used as the default baseline label
+
+    Args:
+        cwd (Optional[pathlib.Path]): directory inside the git repository
+
+    Returns:
+        str: abbreviated commit hash, with a -dirty suffix if the tree has local
+        changes, unknown outside of a git repository
+    """
+    try:
+        return (
+            subprocess.run(
+                ["git", "describe", "--always", "--dirty"],
+                cwd=None if cwd is None else str(cwd),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                check=True,
+            )
+            .stdout.decode("utf-8")
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def get_baseline_label(label: str) -> str:
+    """Get the label a baseline is stored and looked up with
+
+    The baselines measured on a tree with local changes are stored as the baseline
+    of their commit, so the label given by get_commit matches the one of git
+    describe on the same commit.
+
+    Args:
+        label (str): name of the baseline, such as a commit
+
+    Returns:
+        str: the label without the -dirty suffix
+    """
+    if label.endswith(DIRTY_SUFFIX):
+        return label[: -len(DIRTY_SUFFIX)]
+    return label
+
+
+def load_baselines(baselines_path: pathlib.Path) -> Dict[str, Dict[str, Any]]:
+    """Load the stored baselines
+
+    Args:
+        baselines_path (pathlib.Path): baselines file path
+
+    Returns:
+        Dict[str, Dict[str, Any]]: baseline of each label, empty if the file is missing or
+        outdated
+    """
+    if not baselines_path.is_file():
+        return {}
+    with open(baselines_path, "r") as f:
+        data = json.load(f)
+    if data.get("version") != BASELINES_VERSION:
+        return {}
+    baselines: Dict[str, Dict[str, Any]] = data["baselines"]
+    return baselines
+
+
+def get_baseline(baselines_path: pathlib.Path, label: str) -> Optional[Dict[str, Any]]:
+    """Get a stored baseline
+
+    Args:
+        baselines_path (pathlib.Path): baselines file path
+        label (str): name of the baseline, with or without the -dirty suffix
+
+    Returns:
+        Optional[Dict[str, Any]]: the baseline, None if it is not stored
+    """
+    return load_baselines(baselines_path=baselines_path).get(
+        get_baseline_label(label=label)
+    )
+
+
+def save_baseline(
+    baselines_path: pathlib.Path,
+    label: str,
+    spec: synthetic_template.TemplateSpec,
+    results: List[BenchmarkResult],
+) -> None:
+    """Store the results as the baseline of a label, such as a commit, keeping the
+    other baselines
+
+    Args:
+        baselines_path (pathlib.Path): baselines file path
+        label (str): name of the baseline, stored without the -dirty suffix
+        spec (synthetic_template.TemplateSpec): shape of the benchmarked template
+        results (List[BenchmarkResult]): results of the benchmarks
+    """
+    baselines = load_baselines(baselines_path=baselines_path)
+    baselines[get_baseline_label(label=label)] = {
+        "spec": spec._asdict(),
+        "results": {
+            result.name: {
+                "files": result.files,
+                "median": result.median,
+                "throughput": result.throughput,
+                "times": list(result.times),
+            }
+            for result in results
+        },
+    }
+    os.makedirs(baselines_path.absolute().parent, exist_ok=True)
+    tmp_path = baselines_path.with_name(baselines_path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {"version": BASELINES_VERSION, "baselines": baselines},
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+    os.replace(tmp_path, baselines_path)
+
+
+def compare_results(
+    results: List[BenchmarkResult],
+    baseline: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> Tuple[str, List[str]]:
+    """Compare the results with a baseline
+
+    Args:
+        results (List[BenchmarkResult]): results of the benchmarks
+        baseline (Dict[str, Any]): stored baseline, see save_baseline
+        threshold (float): relative slowdown of the median time reported as a
+            regression
+
+    Raises:
+        ValueError: the baseline was measured on a template of another shape
+
+    Returns:
+        Tuple[str, List[str]]:
+        - one line per benchmark with the baseline and current median times
+        - names of the regressed benchmarks
+    """
+    lines, regressions = [], []
+    for result in results:
+        previous = baseline["results"].get(result.name)
+        if previous is None:
+            lines.append(
+                "{name}: {median:.4f}s (no baseline)".format(
+                    name=result.name, median=result.median
+                )
+            )
+            continue
+        if previous["files"] != result.files:
+            raise ValueError(
+                "The baseline of {name} was measured on {files} files".format(
+                    name=result.name, files=previous["files"]
+                )
+            )
+        change = result.median / previous["median"] - 1 if previous["median"] else 0.0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(result.name)
+        lines.append(
+            "{name}: {previous:.4f}s -> {median:.4f}s ({change:+.1%}){flag}".format(
+                name=result.name,
+                previous=previous["median"],
+                median=result.median,
+                change=change,
+                flag=" REGRESSION" if regressed else "",
+            )
+        )
+    return "\n".join(lines), regressions
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    """Format the results of the benchmarks
+
+    Args:
+        results (List[BenchmarkResult]): results of the benchmarks
+
+    Returns:
+        str: one line per benchmark with its median time and throughput
+    """
+    return "\n".join(
+        "{name}: {median:.4f}s median of {n}, {throughput:.0f} files/s".format(
+            name=result.name,
+            median=result.median,
+            n=len(result.times),
+            throughput=result.throughput,
+        )
+        for result in results
+    )
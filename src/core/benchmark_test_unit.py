@@ -0,0 +1,98 @@
+import pathlib
+import shutil
+
+import pytest
+
+from . import benchmark as test_module
+from . import synthetic_template
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "benchmark_test_assets"
+)
+
+
+def test_measure() -> None:
+    calls = []
+    times = test_module.measure(
+        func=lambda: calls.append("func"),
+        repeat=3,
+        setup=lambda: calls.append("setup"),
+    )
+    assert len(times) == 3
+    assert all(t >= 0 for t in times)
+    assert calls == ["setup", "func"] * 3
+
+
+def test_run_benchmarks() -> None:
+    work_dir = TEST_ASSETS_DIR.joinpath("work_cached")
+    results = test_module.run_benchmarks(
+        work_dir=work_dir,
+        spec=synthetic_template.TemplateSpec(files=20, depth=2, files_per_dir=5),
+        repeat=2,
+    )
+    assert [result.name for result in results] == [
+        "get_valid_paths",
+        "isolate",
+        "isolate_up_to_date",
+        "create_project",
+    ]
+    assert all(len(result.times) == 2 for result in results)
+    assert all(result.throughput > 0 for result in results)
+    assert not work_dir.exists()
+    with pytest.raises(ValueError):
+        test_module.run_benchmarks(
+            work_dir=work_dir, spec=synthetic_template.TemplateSpec(), repeat=0
+        )
+
+
+def test_save_and_compare_baselines() -> None:
+    baselines_path = TEST_ASSETS_DIR.joinpath("baselines_cached", "baselines.json")
+    if baselines_path.parent.is_dir():
+        shutil.rmtree(baselines_path.parent)
+    assert test_module.load_baselines(baselines_path=baselines_path) == {}
+    spec = synthetic_template.TemplateSpec(files=10)
+    results = [
+        test_module.BenchmarkResult(name="isolate", files=12, times=(1.0, 2.0, 3.0)),
+        test_module.BenchmarkResult(name="render", files=12, times=(1.0,)),
+    ]
+    test_module.save_baseline(
+        baselines_path=baselines_path, label="v1", spec=spec, results=results
+    )
+    test_module.save_baseline(
+        baselines_path=baselines_path, label="v2", spec=spec, results=results[:1]
+    )
+    baselines = test_module.load_baselines(baselines_path=baselines_path)
+    assert sorted(baselines) == ["v1", "v2"]
+    assert baselines["v1"]["results"]["isolate"]["median"] == 2.0
+
+    new_results = [
+        test_module.BenchmarkResult(name="isolate", files=12, times=(2.1,)),
+        test_module.BenchmarkResult(name="render", files=12, times=(1.5,)),
+    ]
+    report, regressions = test_module.compare_results(
+        results=new_results, baseline=baselines["v1"]
+    )
+    assert regressions == ["render"]
+    assert "render: 1.0000s -> 1.5000s (+50.0%) REGRESSION" in report
+    report, regressions = test_module.compare_results(
+        results=new_results, baseline=baselines["v2"]
+    )
+    assert regressions == []
+    assert "render: 1.5000s (no baseline)" in report
+    with pytest.raises(ValueError):
+        test_module.compare_results(
+            results=[test_module.BenchmarkResult(name="isolate", files=1, times=(1,))],
+            baseline=baselines["v1"],
+        )
+
+    # A baseline measured with local changes is the baseline of its commit
+    test_module.save_baseline(
+        baselines_path=baselines_path, label="v3-dirty", spec=spec, results=results
+    )
+    assert "v3-dirty" not in test_module.load_baselines(baselines_path=baselines_path)
+    for label in ["v3", "v3-dirty"]:
+        baseline = test_module.get_baseline(baselines_path=baselines_path, label=label)
+        assert baseline is not None
+        assert baseline["results"]["isolate"]["median"] == 2.0
+    assert test_module.get_baseline(baselines_path=baselines_path, label="v4") is None
+    shutil.rmtree(baselines_path.parent)
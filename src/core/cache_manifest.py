@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import pathlib
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+MANIFEST_NAME = ".cookiecutter-runner_manifest.json"
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ManifestEntry(NamedTuple):
+    size: int
+    mtime_ns: int
+    sha256: str
+
+
+class Manifest(NamedTuple):
+    template_dir: str
+    files: Dict[str, ManifestEntry]
+    # Mode of the isolated files, copy if the requested mode fell back for all
+    link_mode: str = "copy"
+    # Mode requested for the isolation, link_mode if not specified
+    requested_link_mode: Optional[str] = None
+
+
+def hash_file(f_path: pathlib.Path) -> str:
+    """Compute the sha256 digest of a file content
+
+    Args:
+        f_path (pathlib.Path): file path
+
+    Returns:
+        str: hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(f_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_entry(
+    f_path: pathlib.Path,
+    previous: Optional[ManifestEntry] = None,
+    stat: Optional[os.stat_result] = None,
+) -> ManifestEntry:
+    """Compute the manifest entry of a file, reusing the previous hash when the
+    size and the modification time are unchanged
+
+    Args:
+        f_path (pathlib.Path): file path
+        previous (Optional[ManifestEntry]): entry recorded by the previous run
+        stat (Optional[os.stat_result]): stat result of the file if already known,
+            such as the one cached by a scan
+
+    Returns:
+        ManifestEntry: entry of the file
+    """
+    if stat is None:
+        stat = os.stat(f_path)
+    if (
+        previous is not None
+        and previous.size == stat.st_size
+        and previous.mtime_ns == stat.st_mtime_ns
+    ):
+        return previous
+    return ManifestEntry(
+        size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256=hash_file(f_path)
+    )
+
+
+def load_manifest(cache_dir: pathlib.Path) -> Optional[Manifest]:
+    """Load the manifest stored in a cache directory
+
+    Args:
+        cache_dir (pathlib.Path): cache directory path
+
+    Returns:
+        Optional[Manifest]: the manifest, None if missing, unreadable or outdated
+    """
+    manifest_path = cache_dir.joinpath(MANIFEST_NAME)
+    if not manifest_path.is_file():
+        return None
+    try:
+        with open(manifest_path, "r") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        files = {
+            rel_path: ManifestEntry(
+                size=entry["size"],
+                mtime_ns=entry["mtime_ns"],
+                sha256=entry["sha256"],
+            )
+            for rel_path, entry in data["files"].items()
+        }
+        return Manifest(
+            template_dir=data["template_dir"],
+            files=files,
+            link_mode=data.get("link_mode", "copy"),
+            requested_link_mode=data.get("requested_link_mode"),
+        )
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def save_manifest(cache_dir: pathlib.Path, manifest: Manifest) -> None:
+    """Atomically write the manifest into a cache directory
+
+    Args:
+        cache_dir (pathlib.Path): cache directory path
+        manifest (Manifest): manifest to be stored
+    """
+    manifest_path = cache_dir.joinpath(MANIFEST_NAME)
+    tmp_path = cache_dir.joinpath(MANIFEST_NAME + ".tmp")
+    data = {
+        "version": MANIFEST_VERSION,
+        "template_dir": manifest.template_dir,
+        "link_mode": manifest.link_mode,
+        "requested_link_mode": manifest.requested_link_mode,
+        "files": {
+            rel_path: entry._asdict()
+            for rel_path, entry in sorted(manifest.files.items())
+        },
+    }
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def diff_manifests(
+    old: Dict[str, ManifestEntry], new: Dict[str, ManifestEntry]
+) -> Tuple[List[str], List[str]]:
+    """Compare two manifests by content hash
+
+    Args:
+        old (Dict[str, ManifestEntry]): files of the previous manifest
+        new (Dict[str, ManifestEntry]): files of the current manifest
+
+    Returns:
+        Tuple[List[str], List[str]]:
+        - relative paths added or changed in the new manifest
+        - relative paths removed from the old manifest
+    """
+    changed = sorted(
+        rel_path
+        for rel_path, entry in new.items()
+        if rel_path not in old or old[rel_path].sha256 != entry.sha256
+    )
+    removed = sorted(rel_path for rel_path in old if rel_path not in new)
+    return changed, removed
@@ -0,0 +1,77 @@
+import pathlib
+import shutil
+
+from . import cache_manifest as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "cache_manifest_test_assets"
+)
+
+
+def test_diff_manifests() -> None:
+    old = {
+        "same.py": test_module.ManifestEntry(size=1, mtime_ns=1, sha256="a"),
+        "changed.py": test_module.ManifestEntry(size=1, mtime_ns=1, sha256="b"),
+        "removed.py": test_module.ManifestEntry(size=1, mtime_ns=1, sha256="c"),
+    }
+    new = {
+        "same.py": test_module.ManifestEntry(size=1, mtime_ns=2, sha256="a"),
+        "changed.py": test_module.ManifestEntry(size=1, mtime_ns=1, sha256="d"),
+        "added.py": test_module.ManifestEntry(size=1, mtime_ns=1, sha256="e"),
+    }
+    changed, removed = test_module.diff_manifests(old=old, new=new)
+    assert changed == ["added.py", "changed.py"]
+    assert removed == ["removed.py"]
+
+
+class Test_manifest:
+    def get_cache_dir(self) -> pathlib.Path:
+        cache_dir = TEST_ASSETS_DIR.joinpath("manifest_cached")
+        if cache_dir.is_dir():
+            shutil.rmtree(cache_dir)
+        cache_dir.mkdir(parents=True)
+        return cache_dir
+
+    def test_save_and_load(self) -> None:
+        cache_dir = self.get_cache_dir()
+        f_path = cache_dir.joinpath("file.txt")
+        with open(f_path, "w") as f:
+            f.write("content")
+        entry = test_module.compute_entry(f_path=f_path)
+        assert entry.size == len("content")
+        manifest = test_module.Manifest(
+            template_dir="template", files={"file.txt": entry}
+        )
+        test_module.save_manifest(cache_dir=cache_dir, manifest=manifest)
+        assert test_module.load_manifest(cache_dir=cache_dir) == manifest
+        shutil.rmtree(cache_dir)
+
+    def test_reuse_previous_hash(self) -> None:
+        cache_dir = self.get_cache_dir()
+        f_path = cache_dir.joinpath("file.txt")
+        with open(f_path, "w") as f:
+            f.write("content")
+        stat = f_path.stat()
+        previous = test_module.ManifestEntry(
+            size=stat.st_size, mtime_ns=stat.st_mtime_ns, sha256="previous"
+        )
+        # Unchanged size and modification time do not re-hash the file
+        assert test_module.compute_entry(f_path=f_path, previous=previous) == previous
+        # The stat result of a scan is used instead of the file one
+        assert (
+            test_module.compute_entry(
+                f_path=cache_dir.joinpath("missing.txt"), previous=previous, stat=stat
+            )
+            == previous
+        )
+        entry = test_module.compute_entry(f_path=f_path)
+        assert entry.sha256 == test_module.hash_file(f_path=f_path)
+        shutil.rmtree(cache_dir)
+
+    def test_load_invalid_manifest(self) -> None:
+        cache_dir = self.get_cache_dir()
+        assert test_module.load_manifest(cache_dir=cache_dir) is None
+        with open(cache_dir.joinpath(test_module.MANIFEST_NAME), "w") as f:
+            f.write("not a json")
+        assert test_module.load_manifest(cache_dir=cache_dir) is None
+        shutil.rmtree(cache_dir)
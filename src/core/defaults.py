@@ -0,0 +1,43 @@
+import os
+import pathlib
+import re
+
+# Options of the subsystems offered by the command line, kept in a module without
+# dependencies so that parsing the arguments does not import the subsystems
+
+# Rendering backends of initialize_project.create_project
+RENDER_BACKENDS = ["auto", "api", "subprocess"]
+
+# Workspace modes of runner.run, see workspace.create_workspace
+WORKSPACES = ["disk", "tmpfs"]
+DEFAULT_TMPFS_DIR = pathlib.Path("/dev/shm")
+DEFAULT_BUDGET = 1024**3
+
+# Seconds without any event before a change is handled, see
+# template_watcher.wait_for_change
+DEFAULT_DEBOUNCE = 0.3
+
+# Isolation modes of link_files.link_file
+LINK_MODES = ["copy", "hardlink", "reflink", "symlink"]
+# Same default as concurrent.futures.ThreadPoolExecutor
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_size(value: str) -> int:
+    """Parse a size such as 512M or 2G
+
+    Args:
+        value (str): number of bytes, optionally followed by K, M, G or T
+
+    Raises:
+        ValueError: invalid size
+
+    Returns:
+        int: number of bytes
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*", value.upper())
+    if match is None:
+        raise ValueError("Invalid size: {value}".format(value=value))
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
@@ -0,0 +1,11 @@
+import pytest
+
+from . import defaults as test_module
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("512", 512), ("1K", 1024), ("2g", 2 * 1024**3), ("1.5M", 1536 * 1024)],
+)
+def test_parse_size(value: str, expected: int) -> None:
+    assert test_module.parse_size(value=value) == expected
@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import os
+import pathlib
+import shutil
+import threading
+from typing import Optional
+
+VENV_DIR_NAME = ".venv"
+KEY_FILES = ["pyproject.toml", "poetry.lock"]
+# Only these files of a virtual environment refer to its own absolute path
+RELOCATED_DIRS = ["bin", "Scripts"]
+RELOCATED_FILES = ["pyvenv.cfg"]
+MAX_RELOCATED_SIZE = 1024 * 1024
+
+
+def compute_env_key(project_dir: pathlib.Path) -> Optional[str]:
+    """Compute the key of the environment of a project from its dependency files
+
+    Args:
+        project_dir (pathlib.Path): project directory path
+
+    Returns:
+        Optional[str]: sha256 of pyproject.toml and poetry.lock, None if the project
+        has no pyproject.toml
+    """
+    if not project_dir.joinpath("pyproject.toml").is_file():
+        return None
+    digest = hashlib.sha256()
+    for name in KEY_FILES:
+        f_path = project_dir.joinpath(name)
+        if f_path.is_file():
+            digest.update(name.encode("utf-8") + b"\0")
+            with open(f_path, "rb") as f:
+                digest.update(f.read())
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def relocate_env(
+    env_dir: pathlib.Path, old_prefix: pathlib.Path, new_prefix: pathlib.Path
+) -> None:
+    """Rewrite the absolute path of a moved virtual environment in its scripts
+    (shebangs, activation scripts) and its configuration
+
+    Args:
+        env_dir (pathlib.Path): virtual environment directory path
+        old_prefix (pathlib.Path): previous absolute path of the environment
+        new_prefix (pathlib.Path): new absolute path of the environment
+    """
+    old = str(old_prefix).encode("utf-8")
+    new = str(new_prefix).encode("utf-8")
+    f_paths = [env_dir.joinpath(name) for name in RELOCATED_FILES]
+    for name in RELOCATED_DIRS:
+        f_dir = env_dir.joinpath(name)
+        if f_dir.is_dir():
+            f_paths.extend(f_dir.iterdir())
+    for f_path in f_paths:
+        if f_path.is_symlink() or not f_path.is_file():
+            continue
+        if f_path.stat().st_size > MAX_RELOCATED_SIZE:
+            continue
+        with open(f_path, "rb") as f:
+            content = f.read()
+        if b"\0" in content or old not in content:
+            continue
+        tmp_path = f_path.with_name(f_path.name + ".relocate")
+        with open(tmp_path, "wb") as f:
+            f.write(content.replace(old, new))
+        shutil.copymode(f_path, tmp_path)
+        os.replace(tmp_path, f_path)
+
+
+def clone_env(
+    src_dir: pathlib.Path,
+    dest_dir: pathlib.Path,
+    prefix: pathlib.Path,
+) -> None:
+    """Clone a virtual environment to another path
+
+    Args:
+        src_dir (pathlib.Path): source environment directory path
+        dest_dir (pathlib.Path): destination environment directory path
+        prefix (pathlib.Path): path the clone is used from once dest_dir is renamed
+    """
+    shutil.copytree(src_dir, dest_dir, symlinks=True)
+    relocate_env(
+        env_dir=dest_dir, old_prefix=src_dir.absolute(), new_prefix=prefix.absolute()
+    )
+
+
+def restore_env(
+    project_dir: pathlib.Path,
+    cache_dir: pathlib.Path,
+    key: str,
+) -> bool:
+    """Clone the cached environment of the key into the project
+
+    Args:
+        project_dir (pathlib.Path): project directory path
+        cache_dir (pathlib.Path): environment cache directory path
+        key (str): environment key, see compute_env_key
+
+    Returns:
+        bool: True if the environment has been restored
+    """
+    cached_env_dir = cache_dir.joinpath(key, VENV_DIR_NAME)
+    env_dir = project_dir.joinpath(VENV_DIR_NAME)
+    if not cached_env_dir.is_dir() or env_dir.exists():
+        return False
+    logging.info(
+        "Restoring cached environment {key} into {project_dir}".format(
+            key=key, project_dir=project_dir
+        )
+    )
+    tmp_dir = project_dir.joinpath(VENV_DIR_NAME + ".restoring")
+    if tmp_dir.is_dir():
+        shutil.rmtree(tmp_dir)
+    clone_env(src_dir=cached_env_dir, dest_dir=tmp_dir, prefix=env_dir)
+    os.rename(tmp_dir, env_dir)
+    return True
+
+
+def store_env(
+    project_dir: pathlib.Path,
+    cache_dir: pathlib.Path,
+    key: str,
+) -> bool:
+    """Store the environment of the project in the cache if the key is not cached yet
+
+    The environment is cloned into a temporary directory, then renamed to its key,
+    thus concurrent projects with the same key never see a partial environment.
+
+    Args:
+        project_dir (pathlib.Path): project directory path
+        cache_dir (pathlib.Path): environment cache directory path
+        key (str): environment key, see compute_env_key
+
+    Returns:
+        bool: True if the environment has been stored
+    """
+    env_dir = project_dir.joinpath(VENV_DIR_NAME)
+    key_dir = cache_dir.joinpath(key)
+    if not env_dir.is_dir() or key_dir.exists():
+        return False
+    # Unique per process and thread, the projects of a process are installed
+    # concurrently
+    tmp_dir = cache_dir.joinpath(
+        "{key}.{pid}.{thread}.tmp".format(
+            key=key, pid=os.getpid(), thread=threading.get_ident()
+        )
+    )
+    if tmp_dir.is_dir():
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    clone_env(
+        src_dir=env_dir,
+        dest_dir=tmp_dir.joinpath(VENV_DIR_NAME),
+        prefix=key_dir.joinpath(VENV_DIR_NAME),
+    )
+    try:
+        os.rename(tmp_dir, key_dir)
+    except OSError:
+        # Another project with the same key has stored its environment first
+        shutil.rmtree(tmp_dir)
+        return False
+    logging.info(
+        "Stored environment {key} from {project_dir}".format(
+            key=key, project_dir=project_dir
+        )
+    )
+    return True
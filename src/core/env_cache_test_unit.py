@@ -0,0 +1,78 @@
+import pathlib
+import shutil
+
+from . import env_cache as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "env_cache_test_assets"
+)
+
+
+def create_project(project_dir: pathlib.Path, lock: str, with_env: bool) -> None:
+    project_dir.mkdir(parents=True)
+    with open(project_dir.joinpath("pyproject.toml"), "w") as f:
+        f.write("[tool.poetry]\n")
+    with open(project_dir.joinpath("poetry.lock"), "w") as f:
+        f.write(lock)
+    if with_env:
+        env_dir = project_dir.joinpath(test_module.VENV_DIR_NAME).absolute()
+        env_dir.joinpath("bin").mkdir(parents=True)
+        with open(env_dir.joinpath("bin", "activate"), "w") as f:
+            f.write('VIRTUAL_ENV="{env_dir}"\n'.format(env_dir=env_dir))
+        with open(env_dir.joinpath("bin", "black"), "w") as f:
+            f.write("#!{env_dir}/bin/python\n".format(env_dir=env_dir))
+        with open(env_dir.joinpath("pyvenv.cfg"), "w") as f:
+            f.write("home = /usr/bin\n")
+
+
+def test_compute_env_key() -> None:
+    work_dir = TEST_ASSETS_DIR.joinpath("compute_env_key_cached")
+    if work_dir.is_dir():
+        shutil.rmtree(work_dir)
+    create_project(work_dir.joinpath("a"), lock="lock 1", with_env=False)
+    create_project(work_dir.joinpath("b"), lock="lock 1", with_env=False)
+    create_project(work_dir.joinpath("c"), lock="lock 2", with_env=False)
+    work_dir.joinpath("d").mkdir()
+    key_a = test_module.compute_env_key(project_dir=work_dir.joinpath("a"))
+    assert key_a is not None
+    assert key_a == test_module.compute_env_key(project_dir=work_dir.joinpath("b"))
+    assert key_a != test_module.compute_env_key(project_dir=work_dir.joinpath("c"))
+    assert test_module.compute_env_key(project_dir=work_dir.joinpath("d")) is None
+    shutil.rmtree(work_dir)
+
+
+def test_store_and_restore_env() -> None:
+    work_dir = TEST_ASSETS_DIR.joinpath("store_and_restore_env_cached")
+    if work_dir.is_dir():
+        shutil.rmtree(work_dir)
+    cache_dir = work_dir.joinpath("cache")
+    cache_dir.mkdir(parents=True)
+    project_a = work_dir.joinpath("a")
+    project_b = work_dir.joinpath("b")
+    create_project(project_a, lock="lock", with_env=True)
+    create_project(project_b, lock="lock", with_env=False)
+    key = test_module.compute_env_key(project_dir=project_a)
+    assert key is not None
+
+    assert not test_module.restore_env(
+        project_dir=project_b, cache_dir=cache_dir, key=key
+    )
+    assert test_module.store_env(project_dir=project_a, cache_dir=cache_dir, key=key)
+    # The key is only stored once
+    assert not test_module.store_env(
+        project_dir=project_a, cache_dir=cache_dir, key=key
+    )
+    assert test_module.restore_env(project_dir=project_b, cache_dir=cache_dir, key=key)
+    # An existing environment is never replaced
+    assert not test_module.restore_env(
+        project_dir=project_b, cache_dir=cache_dir, key=key
+    )
+
+    env_dir = project_b.joinpath(test_module.VENV_DIR_NAME).absolute()
+    with open(env_dir.joinpath("bin", "activate"), "r") as f:
+        assert f.read() == 'VIRTUAL_ENV="{env_dir}"\n'.format(env_dir=env_dir)
+    with open(env_dir.joinpath("bin", "black"), "r") as f:
+        assert f.read() == "#!{env_dir}/bin/python\n".format(env_dir=env_dir)
+    with open(env_dir.joinpath("pyvenv.cfg"), "r") as f:
+        assert f.read() == "home = /usr/bin\n"
+    shutil.rmtree(work_dir)
@@ -0,0 +1,85 @@
+import asyncio
+import collections
+from typing import Any, Deque
+
+
+class FairLimiter:
+    """Bound the number of concurrent tasks shared by several groups, such as the
+    projects of several templates
+
+    Unlike asyncio.Semaphore which wakes its waiters in arrival order, a released
+    slot is given to the groups having waiters in turn, so a group queuing many
+    tasks first does not delay the tasks of the other groups until its end.
+    """
+
+    def __init__(self, value: int) -> None:
+        if value < 1:
+            raise ValueError("Invalid number of slots: {value}".format(value=value))
+        self.value = value
+        # Groups having waiters, the next served group first
+        self.waiters: "collections.OrderedDict[str, Deque[asyncio.Future[None]]]" = (
+            collections.OrderedDict()
+        )
+
+    async def acquire(self, group: str) -> None:
+        """Wait for a free slot
+
+        Args:
+            group (str): group of the task
+        """
+        if self.value > 0 and not self.waiters:
+            self.value -= 1
+            return
+        future: "asyncio.Future[None]" = asyncio.get_event_loop().create_future()
+        self.waiters.setdefault(group, collections.deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                queue = self.waiters.get(group)
+                if queue is not None and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self.waiters[group]
+            else:
+                # The slot was given before the cancellation
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Give the slot to the next group having waiters, or free it"""
+        while self.waiters:
+            group, queue = self.waiters.popitem(last=False)
+            future = queue.popleft()
+            if queue:
+                # The group is served again after the other groups
+                self.waiters[group] = queue
+            if not future.done():
+                future.set_result(None)
+                return
+        self.value += 1
+
+    def group(self, name: str) -> "FairLimiterGroup":
+        """Get the limiter of a group, used as asyncio.Semaphore
+
+        Args:
+            name (str): group name
+
+        Returns:
+            FairLimiterGroup: async context manager holding a slot
+        """
+        return FairLimiterGroup(limiter=self, name=name)
+
+
+class FairLimiterGroup:
+    """Async context manager holding a slot of a FairLimiter for a group"""
+
+    def __init__(self, limiter: FairLimiter, name: str) -> None:
+        self.limiter = limiter
+        self.name = name
+
+    async def __aenter__(self) -> None:
+        await self.limiter.acquire(group=self.name)
+
+    async def __aexit__(self, *args: Any) -> None:
+        self.limiter.release()
@@ -0,0 +1,45 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from . import fair_limiter as test_module
+
+
+def test_round_robin() -> None:
+    order: List[str] = []
+
+    async def task(limiter: test_module.FairLimiter, group: str, index: int) -> None:
+        async with limiter.group(name=group):
+            order.append("{group}{index}".format(group=group, index=index))
+            await asyncio.sleep(0.01)
+
+    async def run_all() -> None:
+        limiter = test_module.FairLimiter(value=1)
+        await asyncio.gather(
+            *[task(limiter=limiter, group="a", index=i) for i in range(4)],
+            *[task(limiter=limiter, group="b", index=i) for i in range(2)],
+        )
+        assert limiter.value == 1
+
+    asyncio.run(run_all())
+    # asyncio.Semaphore would run a0, a1, a2, a3, b0, b1
+    assert order == ["a0", "a1", "b0", "a2", "b1", "a3"]
+
+
+def test_cancel_waiter() -> None:
+    async def run_all() -> None:
+        limiter = test_module.FairLimiter(value=1)
+        await limiter.acquire(group="a")
+        waiter = asyncio.ensure_future(limiter.acquire(group="b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert not limiter.waiters
+        limiter.release()
+        assert limiter.value == 1
+
+    asyncio.run(run_all())
+    with pytest.raises(ValueError):
+        test_module.FairLimiter(value=0)
@@ -0,0 +1,265 @@
+import hashlib
+import pathlib
+import re
+from typing import Dict, List, NamedTuple, Optional, Pattern, Sequence
+
+
+class GitignoreRule(NamedTuple):
+    pattern: str
+    regex: str
+    negation: bool
+    directory_only: bool
+
+
+def translate_pattern(pattern: str) -> str:
+    """Translate the glob of a .gitignore rule to a regular expression
+
+    The expression matches a path relative to the .gitignore directory, written with
+    "/" separators. A path never contains a new line, thus the wildcards do not match
+    a new line either, which allows to match many paths joined by new lines at once.
+
+    Args:
+        pattern (str): glob pattern, without the negation and the trailing slash
+
+    Returns:
+        str: regular expression matching the path itself (without anchors)
+    """
+    anchored = "/" in pattern
+    if pattern.startswith("/"):
+        pattern = pattern[1:]
+    res = [] if anchored else ["(?:[^\n]*/)?"]
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            res.append("(?:[^\n]*/)?")
+            i += 3
+        elif (
+            pattern.startswith("**", i)
+            and i + 2 == n
+            and i > 0
+            and pattern[i - 1] == "/"
+        ):
+            res.append("[^\n]*")
+            i += 2
+        elif c == "*":
+            while i < n and pattern[i] == "*":
+                i += 1
+            res.append("[^/\n]*")
+        elif c == "?":
+            res.append("[^/\n]")
+            i += 1
+        elif c == "\\" and i + 1 < n:
+            res.append(re.escape(pattern[i + 1]))
+            i += 2
+        elif c == "[":
+            j = i + 1
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 1
+            if j >= n:
+                res.append(re.escape(c))
+                i += 1
+                continue
+            content = pattern[i + 1 : j].replace("\\", "\\\\")
+            if content[0] in "!^":
+                content = "^/\n" + content[1:]
+            res.append("[{content}]".format(content=content))
+            i = j + 1
+        else:
+            res.append(re.escape(c))
+            i += 1
+    return "".join(res)
+
+
+def parse_rule(line: str) -> Optional[GitignoreRule]:
+    """Parse a line of a .gitignore file
+
+    Args:
+        line (str): the line
+
+    Returns:
+        Optional[GitignoreRule]: the rule, None for blank lines and comments
+    """
+    pattern = line.rstrip("\r\n")
+    # Trailing spaces are ignored unless they are escaped with a backslash
+    stripped = pattern.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(pattern):
+        stripped += " "
+    pattern = stripped
+    if not pattern or pattern.startswith("#"):
+        return None
+    negation = pattern.startswith("!")
+    if negation:
+        pattern = pattern[1:]
+    directory_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    if not pattern:
+        return None
+    return GitignoreRule(
+        pattern=line.rstrip("\r\n"),
+        regex=translate_pattern(pattern),
+        negation=negation,
+        directory_only=directory_only,
+    )
+
+
+class GitignoreMatcher:
+    """Rules of a .gitignore file compiled into combined regular expressions
+
+    The paths given to the matcher are relative to the .gitignore directory and use
+    "/" separators. A rule also matches the descendants of the paths it matches, and
+    the last matching rule wins (a negated rule re-includes the path).
+    """
+
+    def __init__(self, rules: List[GitignoreRule]) -> None:
+        self.rules = rules
+        self.has_negation = any(rule.negation for rule in rules)
+        # Each rule matches the path itself or one of its descendants, the
+        # directory-only rules only match a file through one of its parents
+        self.file_regexes: List[Pattern[str]] = []
+        self.dir_regexes: List[Pattern[str]] = []
+        for rule in rules:
+            dir_regex = "(?:{regex})(?:/[^\n]*)?".format(regex=rule.regex)
+            file_regex = dir_regex
+            if rule.directory_only:
+                file_regex = "(?:{regex})/[^\n]*".format(regex=rule.regex)
+            self.dir_regexes.append(re.compile(dir_regex))
+            self.file_regexes.append(re.compile(file_regex))
+        self.combined_file_regex = self.combine(
+            [regex.pattern for regex in self.file_regexes]
+        )
+        self.combined_dir_regex = self.combine(
+            [regex.pattern for regex in self.dir_regexes]
+        )
+
+    @staticmethod
+    def combine(regexes: List[str]) -> Optional[Pattern[str]]:
+        """Combine the expressions of the rules into a single line-anchored expression
+
+        Args:
+            regexes (List[str]): expressions of the rules
+
+        Returns:
+            Optional[Pattern[str]]: the combined expression, None if there is no rule
+        """
+        if not regexes:
+            return None
+        return re.compile(
+            "^(?:{regexes})$".format(regexes="|".join(regexes)), re.MULTILINE
+        )
+
+    def resolve(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """Find the last rule matching a path by checking the rules one by one
+
+        Args:
+            rel_path (str): path relative to the .gitignore directory
+            is_dir (bool): whether the path is a directory
+
+        Returns:
+            Optional[bool]: see match
+        """
+        regexes = self.dir_regexes if is_dir else self.file_regexes
+        for rule, regex in zip(reversed(self.rules), reversed(regexes)):
+            if regex.fullmatch(rel_path):
+                return not rule.negation
+        return None
+
+    def match(self, rel_path: str, is_dir: bool = False) -> Optional[bool]:
+        """Match a path against the rules
+
+        Args:
+            rel_path (str): path relative to the .gitignore directory
+            is_dir (bool): whether the path is a directory
+
+        Returns:
+            Optional[bool]:
+            - True if the path is ignored
+            - False if the path is re-included by a negated rule
+            - None if no rule matches the path
+        """
+        return self.match_many(rel_paths=[rel_path], are_dirs=[is_dir])[0]
+
+    def match_many(
+        self, rel_paths: Sequence[str], are_dirs: Sequence[bool]
+    ) -> List[Optional[bool]]:
+        """Match a batch of paths against the rules
+
+        The paths are joined by new lines and scanned by the combined expression in a
+        single pass, only the matched paths are checked rule by rule when the
+        .gitignore contains negated rules. The rare paths containing a new line are
+        checked rule by rule.
+
+        Args:
+            rel_paths (Sequence[str]): paths relative to the .gitignore directory
+            are_dirs (Sequence[bool]): whether each path is a directory
+
+        Returns:
+            List[Optional[bool]]: result of each path, see match
+        """
+        res: List[Optional[bool]] = [None] * len(rel_paths)
+        for is_dir, combined in [
+            (False, self.combined_file_regex),
+            (True, self.combined_dir_regex),
+        ]:
+            indexes = []
+            for i, value in enumerate(are_dirs):
+                if bool(value) != is_dir:
+                    continue
+                if "\n" in rel_paths[i]:
+                    res[i] = self.resolve(rel_path=rel_paths[i], is_dir=is_dir)
+                else:
+                    indexes.append(i)
+            if combined is None or not indexes:
+                continue
+            text = "\n".join(rel_paths[i] for i in indexes)
+            line_starts = {}
+            offset = 0
+            for i in indexes:
+                line_starts[offset] = i
+                offset += len(rel_paths[i]) + 1
+            for m in combined.finditer(text):
+                i = line_starts[m.start()]
+                if self.has_negation:
+                    res[i] = self.resolve(rel_path=rel_paths[i], is_dir=is_dir)
+                else:
+                    res[i] = True
+        return res
+
+
+COMPILED_CACHE: Dict[str, GitignoreMatcher] = {}
+
+
+def compile_gitignore(content: str) -> GitignoreMatcher:
+    """Compile the content of a .gitignore file, reusing the compiled form of an
+    identical content
+
+    Args:
+        content (str): content of the .gitignore file
+
+    Returns:
+        GitignoreMatcher: the compiled matcher
+    """
+    key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    if key not in COMPILED_CACHE:
+        rules = [parse_rule(line) for line in content.splitlines()]
+        COMPILED_CACHE[key] = GitignoreMatcher(
+            rules=[rule for rule in rules if rule is not None]
+        )
+    return COMPILED_CACHE[key]
+
+
+def load_gitignore(gitignore_path: pathlib.Path) -> GitignoreMatcher:
+    """Load and compile a .gitignore file
+
+    Args:
+        gitignore_path (pathlib.Path): .gitignore path
+
+    Returns:
+        GitignoreMatcher: the compiled matcher
+    """
+    with open(gitignore_path, "r", errors="replace") as f:
+        return compile_gitignore(content=f.read())
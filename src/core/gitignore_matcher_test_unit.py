@@ -0,0 +1,105 @@
+import pathlib
+from typing import List, Optional
+
+import pytest
+
+from . import gitignore_matcher as test_module
+
+
+@pytest.mark.parametrize(
+    "content, rel_path, is_dir, expected",
+    [
+        # Unanchored patterns match at any level
+        ("*.pyc", "a.pyc", False, True),
+        ("*.pyc", "dir/sub/a.pyc", False, True),
+        ("*.pyc", "a.py", False, None),
+        ("build", "build", True, True),
+        ("build", "src/build", False, True),
+        # A rule matching a directory also matches its descendants
+        ("build", "build/out/a.py", False, True),
+        # Directory-only patterns
+        ("log/", "log", True, True),
+        ("log/", "log", False, None),
+        ("log/", "log/a.txt", False, True),
+        # Anchored patterns
+        ("/root.txt", "root.txt", False, True),
+        ("/root.txt", "dir/root.txt", False, None),
+        ("doc/*.md", "doc/a.md", False, True),
+        ("doc/*.md", "doc/sub/a.md", False, None),
+        ("doc/*.md", "other/doc/a.md", False, None),
+        # Double asterisks
+        ("**/cache", "a/b/cache", True, True),
+        ("**/cache", "cache", True, True),
+        ("data/**", "data/a/b.csv", False, True),
+        ("a/**/b", "a/b", False, True),
+        ("a/**/b", "a/x/y/b", False, True),
+        # Wildcards do not match the separator
+        ("a?c", "abc", False, True),
+        ("a*c", "a/c", False, None),
+        ("[!a]b", "cb", False, True),
+        ("[!a]b", "ab", False, None),
+        ("[a-c].txt", "b.txt", False, True),
+        # Comments, blank lines and escapes
+        ("# comment\n\n\\#hash", "#hash", False, True),
+        ("# comment", "# comment", False, None),
+        ("\\!bang", "!bang", False, True),
+        # The last matching rule wins
+        ("*.txt\n!keep.txt", "keep.txt", False, False),
+        ("*.txt\n!keep.txt", "other.txt", False, True),
+        ("!keep.txt\n*.txt", "keep.txt", False, True),
+    ],
+)
+def test_match(
+    content: str, rel_path: str, is_dir: bool, expected: Optional[bool]
+) -> None:
+    matcher = test_module.compile_gitignore(content=content)
+    assert matcher.match(rel_path=rel_path, is_dir=is_dir) == expected
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["*.pyc\nbuild/\n/dist", "*.txt\n!keep.txt\nbuild/\n!build/keep/"],
+)
+def test_match_many(content: str) -> None:
+    matcher = test_module.compile_gitignore(content=content)
+    rel_paths = [
+        "a.pyc",
+        "build",
+        "build",
+        "src/build/x.py",
+        "dist",
+        "src/dist",
+        "keep.txt",
+        "notes.txt",
+        "line\nbreak.txt",
+        "main.py",
+    ]
+    are_dirs = [False, True, False, False, True, True, False, False, False, False]
+    expected: List[Optional[bool]] = [
+        matcher.resolve(rel_path=rel_path, is_dir=is_dir)
+        for rel_path, is_dir in zip(rel_paths, are_dirs)
+    ]
+    assert matcher.match_many(rel_paths=rel_paths, are_dirs=are_dirs) == expected
+    assert matcher.match_many(rel_paths=[], are_dirs=[]) == []
+
+
+def test_compile_cache() -> None:
+    content = "*.log\nbuild/\n"
+    assert test_module.compile_gitignore(
+        content=content
+    ) is test_module.compile_gitignore(content=content)
+    assert test_module.compile_gitignore(
+        content=content
+    ) is not test_module.compile_gitignore(content=content + "dist/\n")
+
+
+def test_load_gitignore() -> None:
+    gitignore_path = pathlib.Path(__file__).parent.joinpath(
+        "isolate_temp_template_test_assets",
+        "get_valid_paths_2_with_ignored_file",
+        "{{cookiecutter.var_name}}",
+        ".gitignore",
+    )
+    matcher = test_module.load_gitignore(gitignore_path=gitignore_path)
+    assert matcher.match(rel_path="test.py") is True
+    assert matcher.match(rel_path="test_2.py") is None
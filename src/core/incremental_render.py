@@ -0,0 +1,245 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from src.core import cache_manifest, initialize_project, isolate_temp_template
+
+RENDER_MANIFEST_NAME = ".cookiecutter-runner_render.json"
+RENDER_MANIFEST_VERSION = 1
+
+
+class RenderManifest(NamedTuple):
+    key: str
+    files: Dict[str, cache_manifest.ManifestEntry]
+
+
+def compute_render_key(
+    manifest: cache_manifest.Manifest, extra_context: Dict[str, str]
+) -> str:
+    """Compute the key of a rendering from the template contents and the context
+
+    Args:
+        manifest (cache_manifest.Manifest): manifest of the isolated template
+        extra_context (Dict[str, str]): values overriding the defaults of
+            cookiecutter.json
+
+    Returns:
+        str: sha256 of the template contents and the context
+    """
+    data = {
+        "files": {rel_path: entry.sha256 for rel_path, entry in manifest.files.items()},
+        "extra_context": extra_context,
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_render_manifest(output_dir: pathlib.Path) -> Optional[RenderManifest]:
+    """Load the manifest of the files rendered into an output directory
+
+    Args:
+        output_dir (pathlib.Path): output directory path
+
+    Returns:
+        Optional[RenderManifest]: the manifest, None if missing, unreadable or
+        outdated
+    """
+    manifest_path = output_dir.joinpath(RENDER_MANIFEST_NAME)
+    if not manifest_path.is_file():
+        return None
+    try:
+        with open(manifest_path, "r") as f:
+            data = json.load(f)
+        if data.get("version") != RENDER_MANIFEST_VERSION:
+            return None
+        return RenderManifest(
+            key=data["key"],
+            files={
+                rel_path: cache_manifest.ManifestEntry(
+                    size=entry["size"],
+                    mtime_ns=entry["mtime_ns"],
+                    sha256=entry["sha256"],
+                )
+                for rel_path, entry in data["files"].items()
+            },
+        )
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def save_render_manifest(output_dir: pathlib.Path, manifest: RenderManifest) -> None:
+    """Atomically write the manifest of the rendered files into the output directory
+
+    Args:
+        output_dir (pathlib.Path): output directory path
+        manifest (RenderManifest): manifest to be stored
+    """
+    manifest_path = output_dir.joinpath(RENDER_MANIFEST_NAME)
+    tmp_path = output_dir.joinpath(RENDER_MANIFEST_NAME + ".tmp")
+    data = {
+        "version": RENDER_MANIFEST_VERSION,
+        "key": manifest.key,
+        "files": {
+            rel_path: entry._asdict()
+            for rel_path, entry in sorted(manifest.files.items())
+        },
+    }
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def is_up_to_date(
+    output_dir: pathlib.Path, manifest: Optional[RenderManifest], key: str
+) -> bool:
+    """Check whether the rendered files are unchanged since the rendering of the key
+
+    Args:
+        output_dir (pathlib.Path): output directory path
+        manifest (Optional[RenderManifest]): manifest of the previous rendering
+        key (str): key of the rendering, see compute_render_key
+
+    Returns:
+        bool: True if the key is the same and no rendered file has been modified
+        (same size and modification time) or removed since
+    """
+    if manifest is None or manifest.key != key:
+        return False
+    for rel_path, entry in manifest.files.items():
+        try:
+            stat = os.stat(output_dir.joinpath(rel_path))
+        except OSError:
+            return False
+        if stat.st_size != entry.size or stat.st_mtime_ns != entry.mtime_ns:
+            return False
+    return True
+
+
+def sync_tree(
+    staging_dir: pathlib.Path,
+    dest_dir: pathlib.Path,
+    previous: Dict[str, cache_manifest.ManifestEntry],
+) -> Tuple[Dict[str, cache_manifest.ManifestEntry], List[str], List[str]]:
+    """Move the files of a fresh rendering into the output directory, leaving the
+    files with the same content untouched
+
+    The files which are not in the previous rendering (such as a virtual
+    environment or the caches of the tools) are never removed.
+
+    Args:
+        staging_dir (pathlib.Path): directory of the fresh rendering, emptied of the
+            changed files
+        dest_dir (pathlib.Path): output directory path
+        previous (Dict[str, cache_manifest.ManifestEntry]): files of the previous
+            rendering
+
+    Returns:
+        Tuple[Dict[str, cache_manifest.ManifestEntry], List[str], List[str]]:
+        - files of the rendering
+        - relative paths of the files written
+        - relative paths of the files of the previous rendering removed
+    """
+    files: Dict[str, cache_manifest.ManifestEntry] = {}
+    changed: List[str] = []
+    for cur_dir, _, f_names in os.walk(str(staging_dir)):
+        for f_name in f_names:
+            src_path = pathlib.Path(cur_dir, f_name)
+            rel_path = src_path.relative_to(staging_dir).as_posix()
+            dest_path = dest_dir.joinpath(rel_path)
+            if dest_path.is_file() and not dest_path.is_symlink():
+                entry = cache_manifest.compute_entry(
+                    f_path=dest_path, previous=previous.get(rel_path)
+                )
+                if entry.sha256 == cache_manifest.hash_file(f_path=src_path):
+                    if os.stat(src_path).st_mode != os.stat(dest_path).st_mode:
+                        shutil.copymode(src_path, dest_path)
+                    files[rel_path] = entry
+                    continue
+            elif dest_path.is_dir() and not dest_path.is_symlink():
+                shutil.rmtree(dest_path)
+            os.makedirs(dest_path.parent, exist_ok=True)
+            os.replace(src_path, dest_path)
+            files[rel_path] = cache_manifest.compute_entry(f_path=dest_path)
+            changed.append(rel_path)
+    removed = sorted(rel_path for rel_path in previous if rel_path not in files)
+    for rel_path in removed:
+        dest_path = dest_dir.joinpath(rel_path)
+        if dest_path.is_symlink() or dest_path.is_file():
+            dest_path.unlink()
+            isolate_temp_template.remove_empty_parents(
+                f_path=dest_path, root_dir=dest_dir
+            )
+    return files, sorted(changed), removed
+
+
+def render_incremental(
+    template_dir: pathlib.Path,
+    output_dir: pathlib.Path,
+    manifest: cache_manifest.Manifest,
+    extra_context: Optional[Dict[str, str]] = None,
+    backend: str = "auto",
+    console: bool = False,
+) -> List[str]:
+    """Render the template, only writing the output files whose content changed
+
+    The rendering is skipped if neither the template contents, nor the context,
+    nor the rendered files changed since the previous rendering. Otherwise the
+    template is rendered into a staging directory (hooks included), then only the
+    files with a different content are moved into the output directory, so that
+    the modification times used by make and the caches of the tools stay valid.
+
+    Args:
+        template_dir (pathlib.Path): isolated template directory path
+        output_dir (pathlib.Path): output directory path
+        manifest (cache_manifest.Manifest): manifest of the isolated template
+        extra_context (Optional[Dict[str, str]]): values overriding the defaults of
+            cookiecutter.json
+        backend (str): rendering backend, one of defaults.RENDER_BACKENDS
+        console (bool): print the cookiecutter CLI output live
+
+    Raises:
+        ValueError: unknown rendering backend
+        RuntimeError: project generating process failed
+
+    Returns:
+        List[str]: relative paths of the output files written or removed
+    """
+    key = compute_render_key(manifest=manifest, extra_context=extra_context or {})
+    previous = load_render_manifest(output_dir=output_dir)
+    if is_up_to_date(output_dir=output_dir, manifest=previous, key=key):
+        logging.info(
+            "Rendering of {output_dir} is up to date".format(output_dir=output_dir)
+        )
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+    staging_dir = pathlib.Path(
+        tempfile.mkdtemp(prefix=".staging_", dir=str(output_dir.parent))
+    )
+    try:
+        initialize_project.create_project(
+            template_dir=template_dir,
+            output_dir=staging_dir,
+            extra_context=extra_context,
+            backend=backend,
+            console=console,
+        )
+        files, changed, removed = sync_tree(
+            staging_dir=staging_dir,
+            dest_dir=output_dir,
+            previous={} if previous is None else previous.files,
+        )
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    save_render_manifest(
+        output_dir=output_dir, manifest=RenderManifest(key=key, files=files)
+    )
+    logging.info(
+        "Rendered {output_dir}: {n_changed} files written, {n_removed} removed".format(
+            output_dir=output_dir, n_changed=len(changed), n_removed=len(removed)
+        )
+    )
+    return changed + removed
@@ -0,0 +1,102 @@
+import pathlib
+import shutil
+
+from . import cache_manifest
+from . import incremental_render as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "incremental_render_test_assets"
+)
+
+
+def get_manifest(template_dir: pathlib.Path) -> cache_manifest.Manifest:
+    return cache_manifest.Manifest(
+        template_dir=str(template_dir),
+        files={
+            f_path.relative_to(template_dir).as_posix(): cache_manifest.compute_entry(
+                f_path=f_path
+            )
+            for f_path in template_dir.rglob("*")
+            if f_path.is_file()
+        },
+    )
+
+
+def test_render_incremental() -> None:
+    template_dir = TEST_ASSETS_DIR.joinpath("template")
+    output_dir = TEST_ASSETS_DIR.joinpath("output_cached")
+    if output_dir.is_dir():
+        shutil.rmtree(output_dir)
+    manifest = get_manifest(template_dir=template_dir)
+    changed = test_module.render_incremental(
+        template_dir=template_dir, output_dir=output_dir, manifest=manifest
+    )
+    assert changed == ["testing/Makefile", "testing/README.md"]
+    project_dir = output_dir.joinpath("testing")
+    project_dir.joinpath(".venv").mkdir()
+    mtimes = {
+        f_path.name: f_path.stat().st_mtime_ns for f_path in project_dir.glob("*")
+    }
+
+    # Nothing changed, the rendering is skipped
+    assert (
+        test_module.render_incremental(
+            template_dir=template_dir, output_dir=output_dir, manifest=manifest
+        )
+        == []
+    )
+
+    # Only the file depending on the changed variable is written
+    changed = test_module.render_incremental(
+        template_dir=template_dir,
+        output_dir=output_dir,
+        manifest=manifest,
+        extra_context={"greeting": "bonjour"},
+    )
+    assert changed == ["testing/README.md"]
+    assert project_dir.joinpath("README.md").read_text() == "bonjour\n"
+    assert project_dir.joinpath("Makefile").stat().st_mtime_ns == mtimes["Makefile"]
+    assert project_dir.joinpath(".venv").is_dir()
+
+    # A rendered file modified in the output is restored
+    project_dir.joinpath("Makefile").write_text("modified")
+    changed = test_module.render_incremental(
+        template_dir=template_dir,
+        output_dir=output_dir,
+        manifest=manifest,
+        extra_context={"greeting": "bonjour"},
+    )
+    assert changed == ["testing/Makefile"]
+    assert not any(
+        f_path.name.startswith(".staging_") for f_path in TEST_ASSETS_DIR.iterdir()
+    )
+    shutil.rmtree(output_dir)
+
+
+def test_sync_tree() -> None:
+    staging_dir = TEST_ASSETS_DIR.joinpath("staging_cached")
+    dest_dir = TEST_ASSETS_DIR.joinpath("dest_cached")
+    for f_dir in [staging_dir, dest_dir]:
+        if f_dir.is_dir():
+            shutil.rmtree(f_dir)
+        f_dir.joinpath("sub").mkdir(parents=True)
+    staging_dir.joinpath("same.txt").write_text("same")
+    staging_dir.joinpath("new.txt").write_text("new")
+    dest_dir.joinpath("same.txt").write_text("same")
+    dest_dir.joinpath("sub", "old.txt").write_text("old")
+    dest_dir.joinpath("untracked.txt").write_text("untracked")
+    previous = {
+        "sub/old.txt": cache_manifest.compute_entry(
+            f_path=dest_dir.joinpath("sub", "old.txt")
+        )
+    }
+    files, changed, removed = test_module.sync_tree(
+        staging_dir=staging_dir, dest_dir=dest_dir, previous=previous
+    )
+    assert sorted(files) == ["new.txt", "same.txt"]
+    assert changed == ["new.txt"]
+    assert removed == ["sub/old.txt"]
+    assert not dest_dir.joinpath("sub").exists()
+    assert dest_dir.joinpath("untracked.txt").is_file()
+    for f_dir in [staging_dir, dest_dir]:
+        shutil.rmtree(f_dir)
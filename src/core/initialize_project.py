@@ -1,44 +1,167 @@
+import asyncio
+import functools
 import logging
+import os
 import pathlib
 import shutil
-import subprocess
-from typing import List
+import sys
+import weakref
+from typing import Callable, Dict, List, Optional, Tuple
 
-logging.basicConfig(level=logging.INFO)
+from src.core import (
+    defaults,
+    env_cache,
+    instrumentation,
+    output_stream,
+    pipeline,
+    resource_limits,
+)
 
+# Lock of each cache directory and environment key, per event loop
+EnvLocks = Dict[Tuple[str, str], asyncio.Lock]
+ENV_LOCKS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, EnvLocks]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+@functools.lru_cache(maxsize=None)
+def load_cookiecutter_api() -> Optional[Callable[..., str]]:
+    """Import the cookiecutter Python API once per process
+
+    Returns:
+        Optional[Callable[..., str]]: the cookiecutter entrypoint, None if cookiecutter
+        is not importable in the current interpreter
+    """
+    try:
+        from cookiecutter.main import cookiecutter
+    except ImportError:
+        return None
+    return cookiecutter  # type: ignore[no-any-return]
 
-def create_project(template_dir: pathlib.Path, output_dir: pathlib.Path) -> None:
-    """Generate a project based on the template_dir
+
+def render_with_api(
+    template_dir: pathlib.Path,
+    output_dir: pathlib.Path,
+    extra_context: Optional[Dict[str, str]] = None,
+) -> None:
+    """Render the template in the current process with the cookiecutter Python API
+
+    The hooks of the template are executed in the template directory (cookiecutter
+    changes the working directory of the process), thus the rendering must not be
+    run concurrently in different threads.
 
     Args:
         template_dir (pathlib.Path): template directory path
         output_dir (pathlib.Path): output directory path
+        extra_context (Optional[Dict[str, str]]): values overriding the defaults of
+            cookiecutter.json
 
     Raises:
-        RuntimeError: project generating process failed
+        RuntimeError: cookiecutter is not importable or fails to render the template
     """
-    logging.info(
-        "Creating project based on template: {template_dir}".format(
-            template_dir=template_dir
+    cookiecutter = load_cookiecutter_api()
+    if cookiecutter is None:
+        raise RuntimeError("The cookiecutter Python API is not importable")
+    try:
+        cookiecutter(
+            str(template_dir.absolute()),
+            no_input=True,
+            overwrite_if_exists=True,
+            output_dir=str(output_dir.absolute()),
+            extra_context=extra_context or None,
         )
-    )
-    p = subprocess.Popen(
-        [
+    except Exception as e:
+        logging.error(str(e))
+        raise RuntimeError(str(e)) from e
+
+
+def render_with_subprocess(
+    template_dir: pathlib.Path,
+    output_dir: pathlib.Path,
+    extra_context: Optional[Dict[str, str]] = None,
+    console: bool = False,
+) -> None:
+    """Render the template by calling the cookiecutter CLI
+
+    Args:
+        template_dir (pathlib.Path): template directory path
+        output_dir (pathlib.Path): output directory path
+        extra_context (Optional[Dict[str, str]]): values overriding the defaults of
+            cookiecutter.json
+        console (bool): print the cookiecutter output live
+
+    Raises:
+        RuntimeError: project generating process failed
+    """
+    sink = output_stream.OutputSink(console=sys.stdout if console else None)
+    returncode = output_stream.run_process(
+        args=[
             "cookiecutter",
             str(template_dir.absolute()),
             "--no-input",
             "--overwrite-if-exists",
             "--output-dir",
             str(output_dir.absolute()),
+        ]
+        + [
+            "{name}={value}".format(name=name, value=value)
+            for name, value in (extra_context or {}).items()
         ],
-        stdout=subprocess.PIPE,
+        sink=sink,
+        source="cookiecutter",
     )
-    res, _ = p.communicate()
-    p.wait()
-    if p.returncode != 0:
-        message = res.decode("utf-8")
+    if returncode != 0:
+        message = sink.tail()
         logging.error(message)
         raise RuntimeError(message)
+
+
+def create_project(
+    template_dir: pathlib.Path,
+    output_dir: pathlib.Path,
+    extra_context: Optional[Dict[str, str]] = None,
+    backend: str = "auto",
+    console: bool = False,
+) -> None:
+    """Generate a project based on the template_dir
+
+    Args:
+        template_dir (pathlib.Path): template directory path
+        output_dir (pathlib.Path): output directory path
+        extra_context (Optional[Dict[str, str]]): values overriding the defaults of
+            cookiecutter.json
+        backend (str): rendering backend, one of defaults.RENDER_BACKENDS
+        - api: render in the current process with the cookiecutter Python API
+        - subprocess: spawn the cookiecutter CLI
+        - auto: api if cookiecutter is importable, subprocess otherwise
+        console (bool): print the cookiecutter CLI output live
+
+    Raises:
+        ValueError: unknown rendering backend
+        RuntimeError: project generating process failed
+    """
+    if backend not in defaults.RENDER_BACKENDS:
+        raise ValueError("Unknown render backend: {backend}".format(backend=backend))
+    if backend == "auto":
+        backend = "api" if load_cookiecutter_api() is not None else "subprocess"
+    logging.info(
+        "Creating project based on template: {template_dir} ({backend})".format(
+            template_dir=template_dir, backend=backend
+        )
+    )
+    if backend == "api":
+        render_with_api(
+            template_dir=template_dir,
+            output_dir=output_dir,
+            extra_context=extra_context,
+        )
+    else:
+        render_with_subprocess(
+            template_dir=template_dir,
+            output_dir=output_dir,
+            extra_context=extra_context,
+            console=console,
+        )
     logging.info("Created project at: {output_dir}".format(output_dir=output_dir))
 
 
@@ -59,30 +182,277 @@ def merge_commands(commands: List[List[str]], merge_operator: str) -> List[str]:
     return res
 
 
-def install_project(project_dir: pathlib.Path) -> None:
-    """Install and test the generated project directory
+class StageError(RuntimeError):
+    """A make-target failed, kind is one of resource_limits.FAILURE_KINDS"""
+
+    def __init__(self, message: str, kind: str = "failed") -> None:
+        super().__init__(message)
+        self.kind = kind
+
+
+async def run_make_target(
+    project_dir: pathlib.Path,
+    target: str,
+    sink: output_stream.OutputSink,
+    limits: resource_limits.ResourceLimits = resource_limits.ResourceLimits(),
+    usage: Optional[instrumentation.PhaseUsage] = None,
+) -> int:
+    """Run a make-target in the project directory
+
+    Args:
+        project_dir (pathlib.Path): project directory path
+        target (str): make-target
+        sink (output_stream.OutputSink): sink receiving the output lines, prefixed by
+            the make-target
+        limits (resource_limits.ResourceLimits): wall-clock timeout of the
+            make-target, CPU and memory limits of each of its processes
+        usage (Optional[instrumentation.PhaseUsage]): receives the resource usage of
+            make and of the processes it waited
+
+    Raises:
+        asyncio.TimeoutError: the make-target has been stopped after the timeout
+
+    Returns:
+        int: return code of make
+    """
+    return await output_stream.run_process_async(
+        args=resource_limits.limit_command(args=["make", target], limits=limits),
+        sink=sink,
+        source=target,
+        cwd=project_dir,
+        timeout=limits.timeout,
+        usage=usage,
+    )
+
+
+def get_env_lock(cache_dir: pathlib.Path, key: str) -> asyncio.Lock:
+    """Get the lock of an environment key, held by the project building the
+    environment so that the projects with the same key wait to restore it
+
+    Args:
+        cache_dir (pathlib.Path): environment cache directory path
+        key (str): environment key, see env_cache.compute_env_key
+
+    Returns:
+        asyncio.Lock: lock of the key in the running event loop
+    """
+    locks = ENV_LOCKS.setdefault(asyncio.get_event_loop(), {})
+    lock_key = (str(cache_dir.absolute()), key)
+    if lock_key not in locks:
+        locks[lock_key] = asyncio.Lock()
+    return locks[lock_key]
+
+
+async def restore_env_async(
+    project_dir: pathlib.Path, cache_dir: pathlib.Path, key: str
+) -> Optional[asyncio.Lock]:
+    """Restore the cached environment of the key into the project, once the project
+    building it, if any, has stored it
 
     Args:
         project_dir (pathlib.Path): project directory path
+        cache_dir (pathlib.Path): environment cache directory path
+        key (str): environment key, see env_cache.compute_env_key
+
+    Returns:
+        Optional[asyncio.Lock]: None if the environment has been restored, the lock of
+        the key otherwise, held until the project stores its environment
+    """
+    lock = get_env_lock(cache_dir=cache_dir, key=key)
+    await lock.acquire()
+    try:
+        restored = await asyncio.get_event_loop().run_in_executor(
+            None,
+            functools.partial(
+                env_cache.restore_env,
+                project_dir=project_dir,
+                cache_dir=cache_dir,
+                key=key,
+            ),
+        )
+    except BaseException:
+        lock.release()
+        raise
+    if not restored:
+        return lock
+    lock.release()
+    return None
+
+
+async def install_project_async(
+    project_dir: pathlib.Path,
+    log_path: Optional[pathlib.Path] = None,
+    env_cache_dir: Optional[pathlib.Path] = None,
+    recorder: Optional[instrumentation.Recorder] = None,
+    stages: Optional[List[pipeline.Stage]] = None,
+    stage_jobs: Optional[int] = None,
+    console: bool = False,
+    stage_limits: Optional[resource_limits.ResourceLimits] = None,
+) -> None:
+    """Install and test the generated project directory from the event loop
+
+    Each stage runs its make-target as soon as the stages it needs have succeeded,
+    the first failure cancels the running make-targets. The blocking file operations
+    (environment cache, .git removal) are run in the default executor.
+
+    Args:
+        project_dir (pathlib.Path): project directory path
+        log_path (Optional[pathlib.Path]): file receiving the make-target output
+            (stdout and stderr) line by line, only the last lines are kept in memory
+            to build the failure message
+        env_cache_dir (Optional[pathlib.Path]): shared virtual environment cache, the
+            project reuses the environment built by a previous project with the same
+            pyproject.toml and poetry.lock, and stores its own environment once its
+            install stage succeeded otherwise (the concurrent projects with the same
+            key wait for it, then restore it)
+        recorder (Optional[instrumentation.Recorder]): records the timing of each
+            make-target
+        stages (Optional[List[pipeline.Stage]]): make-targets and their dependencies,
+            pipeline.DEFAULT_STAGES if not specified
+        stage_jobs (Optional[int]): maximum number of concurrent make-targets, no
+            limit if not specified
+        console (bool): print the make-target output live, prefixed by the project
+        stage_limits (Optional[resource_limits.ResourceLimits]): default wall-clock
+            timeout, CPU and memory limits of each make-target, overridden by the
+            limits of the stage
 
     Raises:
-        RuntimeError: fails to execute the make-target
+        StageError: fails to execute a make-target, its kind tells whether the
+            make-target failed, timed out or hit a resource limit
+        ValueError: invalid stages
     """
     logging.info("Installing project {project_dir}".format(project_dir=project_dir))
-    p = subprocess.Popen(
-        ["make", "install", "lint", "check", "test"],
-        stdout=subprocess.PIPE,
-        cwd=str(project_dir),
+    loop = asyncio.get_event_loop()
+    if recorder is None:
+        recorder = instrumentation.Recorder(project=project_dir.name)
+    env_key = None
+    env_lock = None
+    if env_cache_dir is not None:
+        # The key is computed before the installation may update poetry.lock
+        env_key = env_cache.compute_env_key(project_dir=project_dir)
+    if env_cache_dir is not None and env_key is not None:
+        env_lock = await restore_env_async(
+            project_dir=project_dir, cache_dir=env_cache_dir, key=env_key
+        )
+
+    async def store_env() -> None:
+        # Releases the projects with the same key, restoring the stored environment
+        nonlocal env_lock
+        if env_lock is None:
+            return
+        try:
+            assert env_cache_dir is not None and env_key is not None
+            await loop.run_in_executor(
+                None,
+                functools.partial(
+                    env_cache.store_env,
+                    project_dir=project_dir,
+                    cache_dir=env_cache_dir,
+                    key=env_key,
+                ),
+            )
+        finally:
+            env_lock.release()
+            env_lock = None
+
+    log_file = None
+    if log_path is not None:
+        os.makedirs(log_path.parent, exist_ok=True)
+        log_file = open(log_path, "wb")
+    sink = output_stream.OutputSink(
+        log_file=log_file,
+        console=sys.stdout if console else None,
+        console_prefix=project_dir.name,
     )
-    res, _ = p.communicate()
-    p.wait()
-    if p.returncode != 0:
-        message = res.decode("utf-8")
-        logging.error(message)
-        raise RuntimeError(message)
+
+    async def run_stage(stage: pipeline.Stage) -> None:
+        limits = resource_limits.merge_limits(
+            limits=stage.limits,
+            defaults=stage_limits or resource_limits.ResourceLimits(),
+        )
+        with recorder.phase(name=stage.name, category="make-target") as usage:
+            try:
+                returncode = await run_make_target(
+                    project_dir=project_dir,
+                    target=stage.name,
+                    sink=sink,
+                    limits=limits,
+                    usage=usage,
+                )
+            except asyncio.TimeoutError:
+                message = "make {target} timed out after {timeout} seconds".format(
+                    target=stage.name, timeout=limits.timeout
+                )
+                logging.error(message)
+                raise StageError(message, kind="timeout")
+            if returncode != 0:
+                message = sink.tail(source=stage.name)
+                logging.error(message)
+                kind = resource_limits.classify_failure(
+                    returncode=returncode, limits=limits
+                )
+                if kind == "failed":
+                    guessed = resource_limits.guess_failure(
+                        output=message, limits=limits
+                    )
+                    if guessed is not None:
+                        logging.warning(
+                            "make {target} likely failed because of the {kind}, guessed"
+                            " from its output".format(target=stage.name, kind=guessed)
+                        )
+                        kind = guessed
+                raise StageError(message, kind=kind)
+        if stage.name == pipeline.INSTALL_STAGE:
+            await store_env()
+
+    try:
+        await pipeline.run_stages(
+            stages=pipeline.DEFAULT_STAGES if stages is None else stages,
+            run_stage=run_stage,
+            workers=stage_jobs,
+        )
+        # Without install stage, the environment is stored once all stages passed
+        await store_env()
+    finally:
+        if log_file is not None:
+            log_file.close()
+        if env_lock is not None:
+            env_lock.release()
     git_dir = project_dir.joinpath(".git")
     if git_dir.is_dir():
-        shutil.rmtree(str(git_dir))
+        await loop.run_in_executor(None, shutil.rmtree, str(git_dir))
     logging.info(
         "Finished installing project {project_dir}".format(project_dir=project_dir)
     )
+
+
+def install_project(
+    project_dir: pathlib.Path,
+    log_path: Optional[pathlib.Path] = None,
+    env_cache_dir: Optional[pathlib.Path] = None,
+    recorder: Optional[instrumentation.Recorder] = None,
+    stages: Optional[List[pipeline.Stage]] = None,
+    stage_jobs: Optional[int] = None,
+    console: bool = False,
+    stage_limits: Optional[resource_limits.ResourceLimits] = None,
+) -> None:
+    """Install and test the generated project directory, blocking until done
+
+    See install_project_async for the arguments.
+
+    Raises:
+        StageError: fails to execute a make-target
+        ValueError: invalid stages
+    """
+    asyncio.run(
+        install_project_async(
+            project_dir=project_dir,
+            log_path=log_path,
+            env_cache_dir=env_cache_dir,
+            recorder=recorder,
+            stages=stages,
+            stage_jobs=stage_jobs,
+            console=console,
+            stage_limits=stage_limits,
+        )
+    )
@@ -1,11 +1,13 @@
+import asyncio
 import logging
 import pathlib
 import shutil
-from typing import List
+from typing import List, Optional
 
 import pytest
 
 from . import initialize_project as test_module
+from . import pipeline, resource_limits
 
 logging.basicConfig(level=logging.INFO)
 
@@ -51,15 +53,19 @@ class Test_create_project:
             (pathlib.Path("create_project_case_5_python_app_sample"), True, True),
         ],
     )
+    @pytest.mark.parametrize("backend", ["api", "subprocess"])
     def test_normal_case(
-        self, template_dir: pathlib.Path, has_gitignore: bool, is_correct: bool
+        self,
+        template_dir: pathlib.Path,
+        has_gitignore: bool,
+        is_correct: bool,
+        backend: str,
     ) -> None:
         template_dir = TEST_ASSETS_DIR.joinpath(template_dir).absolute()
         output_dir = SAMPLES_DIR.joinpath(template_dir.name)
         if is_correct is True:
             test_module.create_project(
-                template_dir=template_dir,
-                output_dir=output_dir,
+                template_dir=template_dir, output_dir=output_dir, backend=backend
             )
             f_paths = list(output_dir.glob("*"))
             assert len(f_paths) == 1
@@ -69,7 +75,7 @@ class Test_create_project:
         else:
             with pytest.raises(RuntimeError):
                 test_module.create_project(
-                    template_dir=template_dir, output_dir=output_dir
+                    template_dir=template_dir, output_dir=output_dir, backend=backend
                 )
         if output_dir.is_dir():
             logging.info(
@@ -80,6 +86,16 @@ class Test_create_project:
             shutil.rmtree(output_dir)
             shutil.rmtree(SAMPLES_DIR)
 
+    def test_error_case(self) -> None:
+        with pytest.raises(ValueError):
+            test_module.create_project(
+                template_dir=TEST_ASSETS_DIR.joinpath(
+                    "create_project_case_1_empty_hooks"
+                ),
+                output_dir=SAMPLES_DIR,
+                backend="unknown",
+            )
+
 
 class Test_merge_commands:
     @pytest.mark.parametrize(
@@ -166,3 +182,94 @@ class Test_install_project:
         )
         if project_dir.is_dir():
             shutil.rmtree(project_dir)
+
+    def test_install_project_case_2_stages(self) -> None:
+        project_dir = self.get_test_directory(
+            project_dir=TEST_ASSETS_DIR.joinpath("install_project_case_1_simple")
+        )
+        test_module.install_project(
+            project_dir=project_dir,
+            stages=[
+                pipeline.Stage(name="install"),
+                pipeline.Stage(name="test", needs=("install",)),
+            ],
+        )
+        assert project_dir.joinpath("src").joinpath("install").is_file()
+        assert project_dir.joinpath("src").joinpath("test").is_file()
+        assert not project_dir.joinpath("src").joinpath("lint").is_file()
+        with pytest.raises(ValueError):
+            test_module.install_project(
+                project_dir=project_dir,
+                stages=[pipeline.Stage(name="test", needs=("install",))],
+            )
+        if project_dir.is_dir():
+            shutil.rmtree(project_dir)
+
+    def test_install_project_case_3_timeout(self) -> None:
+        with pytest.raises(RuntimeError, match="timed out"):
+            test_module.install_project(
+                project_dir=TEST_ASSETS_DIR.joinpath("install_project_case_2_timeout"),
+                stages=[pipeline.Stage(name="install")],
+                stage_limits=resource_limits.ResourceLimits(timeout=0.2),
+            )
+
+    @pytest.mark.parametrize(
+        "target, limits, kind",
+        [
+            ("cpu", resource_limits.ResourceLimits(cpu_time=1), "cpu-limit"),
+            (
+                "memory",
+                resource_limits.ResourceLimits(memory=256 * 1024**2),
+                "memory-limit",
+            ),
+        ],
+    )
+    def test_install_project_case_4_limits(
+        self, target: str, limits: resource_limits.ResourceLimits, kind: str
+    ) -> None:
+        with pytest.raises(test_module.StageError) as e:
+            test_module.install_project(
+                project_dir=TEST_ASSETS_DIR.joinpath("install_project_case_3_limits"),
+                stages=[pipeline.Stage(name=target, limits=limits)],
+            )
+        assert e.value.kind == kind
+
+    def test_install_project_case_5_env_cache(self) -> None:
+        work_dir = TEST_ASSETS_DIR.joinpath("env_cache_cached")
+        if work_dir.is_dir():
+            shutil.rmtree(work_dir)
+        cache_dir = work_dir.joinpath("cache")
+        cache_dir.mkdir(parents=True)
+        project_dirs = [work_dir.joinpath(name) for name in ["a", "b"]]
+        for project_dir in project_dirs:
+            shutil.copytree(
+                TEST_ASSETS_DIR.joinpath("install_project_case_4_env_cache"),
+                project_dir,
+            )
+
+        async def install_projects() -> List[Optional[BaseException]]:
+            # The environment is stored once installed, even if the next stage fails
+            return list(
+                await asyncio.gather(
+                    *[
+                        test_module.install_project_async(
+                            project_dir=project_dir,
+                            env_cache_dir=cache_dir,
+                            stages=[
+                                pipeline.Stage(name="install"),
+                                pipeline.Stage(name="fail", needs=("install",)),
+                            ],
+                        )
+                        for project_dir in project_dirs
+                    ],
+                    return_exceptions=True,
+                )
+            )
+
+        errors = asyncio.run(install_projects())
+        assert all(isinstance(error, test_module.StageError) for error in errors)
+        # Built by the first project, restored by the concurrent one
+        with open(work_dir.joinpath("installs.log"), "r") as f:
+            assert f.read().split() == ["built", "restored"]
+        assert len(list(cache_dir.iterdir())) == 1
+        shutil.rmtree(work_dir)
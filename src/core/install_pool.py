@@ -0,0 +1,317 @@
+import asyncio
+import logging
+import pathlib
+from typing import AsyncContextManager, List, NamedTuple, Optional, Tuple
+
+from src.core import initialize_project, instrumentation, pipeline, resource_limits
+
+# Kind of the projects not run or cancelled after a failure in fail-fast mode
+ABORTED = "aborted"
+
+
+class InstallResult(NamedTuple):
+    project_dir: pathlib.Path
+    success: bool
+    message: str
+    log_path: Optional[pathlib.Path]
+    cached: bool = False
+    phases: Tuple[instrumentation.PhaseRecord, ...] = ()
+    failure_kind: str = ""
+
+
+def get_log_path(
+    project_dir: pathlib.Path,
+    log_dir: Optional[pathlib.Path],
+    output_dir: Optional[pathlib.Path] = None,
+) -> Optional[pathlib.Path]:
+    """Get the log file path of a project
+
+    Args:
+        project_dir (pathlib.Path): project directory path
+        log_dir (Optional[pathlib.Path]): directory containing the log files
+        output_dir (Optional[pathlib.Path]): directory containing the projects, its
+            layout is mirrored in log_dir (only the project name is used if not specified)
+
+    Returns:
+        Optional[pathlib.Path]: log file path, None if log_dir is not specified
+    """
+    if log_dir is None:
+        return None
+    rel_path = pathlib.Path(project_dir.name)
+    if output_dir is not None:
+        rel_path = project_dir.relative_to(output_dir)
+    return log_dir.joinpath(rel_path.parent, "{name}.log".format(name=rel_path.name))
+
+
+async def install_one(
+    project_dir: pathlib.Path,
+    log_path: Optional[pathlib.Path],
+    env_cache_dir: Optional[pathlib.Path] = None,
+    stages: Optional[List[pipeline.Stage]] = None,
+    stage_jobs: Optional[int] = None,
+    console: bool = False,
+    stage_limits: Optional[resource_limits.ResourceLimits] = None,
+) -> InstallResult:
+    """Install and test a project, reporting the failure instead of raising it
+
+    Args:
+        project_dir (pathlib.Path): project directory path
+        log_path (Optional[pathlib.Path]): log file path of the project
+        env_cache_dir (Optional[pathlib.Path]): shared virtual environment cache
+        stages (Optional[List[pipeline.Stage]]): make-targets and their dependencies
+        stage_jobs (Optional[int]): maximum number of concurrent make-targets
+        console (bool): print the make-target output live
+        stage_limits (Optional[resource_limits.ResourceLimits]): default limits of
+            each make-target
+
+    Returns:
+        InstallResult: result of the installation
+    """
+    recorder = instrumentation.Recorder(project=project_dir.name)
+    success, message, failure_kind = True, "", ""
+    try:
+        with recorder.phase(name=project_dir.name, category="project") as usage:
+            try:
+                await initialize_project.install_project_async(
+                    project_dir=project_dir,
+                    log_path=log_path,
+                    env_cache_dir=env_cache_dir,
+                    recorder=recorder,
+                    stages=stages,
+                    stage_jobs=stage_jobs,
+                    console=console,
+                    stage_limits=stage_limits,
+                )
+            finally:
+                # The usage of the project is the usage of its make-targets
+                targets = [
+                    record
+                    for record in recorder.records
+                    if record.category == "make-target"
+                ]
+                usage.cpu_time = sum(record.cpu_time for record in targets)
+                usage.peak_rss_kb = max(
+                    [record.peak_rss_kb for record in targets], default=0
+                )
+    except initialize_project.StageError as e:
+        success, message, failure_kind = False, str(e), e.kind
+    except RuntimeError as e:
+        success, message, failure_kind = False, str(e), "failed"
+    logging.info(
+        "Finished {project_dir}: {status}".format(
+            project_dir=project_dir, status=failure_kind or "passed"
+        )
+    )
+    return InstallResult(
+        project_dir=project_dir,
+        success=success,
+        message=message,
+        log_path=log_path,
+        phases=tuple(recorder.records),
+        failure_kind=failure_kind,
+    )
+
+
+def get_aborted_result(
+    project_dir: pathlib.Path, log_path: Optional[pathlib.Path] = None
+) -> InstallResult:
+    """Get the result of a project not run or cancelled after a failure
+
+    Args:
+        project_dir (pathlib.Path): project directory path
+        log_path (Optional[pathlib.Path]): partial log file of a cancelled project
+
+    Returns:
+        InstallResult: unsuccessful result of kind ABORTED
+    """
+    return InstallResult(
+        project_dir=project_dir,
+        success=False,
+        message="Aborted after the failure of another project",
+        log_path=log_path,
+        failure_kind=ABORTED,
+    )
+
+
+async def install_projects_async(
+    project_dirs: List[pathlib.Path],
+    limiter: AsyncContextManager[None],
+    log_dir: Optional[pathlib.Path] = None,
+    output_dir: Optional[pathlib.Path] = None,
+    env_cache_dir: Optional[pathlib.Path] = None,
+    stages: Optional[List[pipeline.Stage]] = None,
+    stage_jobs: Optional[int] = None,
+    console: bool = False,
+    stage_limits: Optional[resource_limits.ResourceLimits] = None,
+    abort: Optional[asyncio.Event] = None,
+) -> List[InstallResult]:
+    """Install and test the projects concurrently from the event loop
+
+    The projects are queued in the order of project_dirs.
+
+    Args:
+        project_dirs (List[pathlib.Path]): project directory paths
+        limiter (AsyncContextManager[None]): bounds the number of projects installed
+            at the same time, such as an asyncio.Semaphore, it can be shared by several
+            calls
+        log_dir (Optional[pathlib.Path]): directory receiving one log file per project
+        output_dir (Optional[pathlib.Path]): directory containing the projects
+        env_cache_dir (Optional[pathlib.Path]): shared virtual environment cache
+        stages (Optional[List[pipeline.Stage]]): make-targets and their dependencies
+        stage_jobs (Optional[int]): maximum number of concurrent make-targets of a
+            project
+        console (bool): print the make-target output live, prefixed by the project
+        stage_limits (Optional[resource_limits.ResourceLimits]): default limits of
+            each make-target
+        abort (Optional[asyncio.Event]): fail-fast event, set by the first failing
+            project, it cancels the running projects and the next projects are not
+            run (their results are of kind ABORTED), it can be shared by several calls
+
+    Returns:
+        List[InstallResult]: results, in the same order as project_dirs
+    """
+
+    async def install_limited(project_dir: pathlib.Path) -> InstallResult:
+        log_path = get_log_path(
+            project_dir=project_dir, log_dir=log_dir, output_dir=output_dir
+        )
+        async with limiter:
+            if abort is not None and abort.is_set():
+                return get_aborted_result(project_dir=project_dir)
+            install = asyncio.ensure_future(
+                install_one(
+                    project_dir=project_dir,
+                    log_path=log_path,
+                    env_cache_dir=env_cache_dir,
+                    stages=stages,
+                    stage_jobs=stage_jobs,
+                    console=console,
+                    stage_limits=stage_limits,
+                )
+            )
+            if abort is None:
+                return await install
+            aborted = asyncio.ensure_future(abort.wait())
+            try:
+                await asyncio.wait(
+                    [install, aborted], return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                aborted.cancel()
+                if not install.done():
+                    install.cancel()
+                    await asyncio.gather(install, return_exceptions=True)
+            if install.cancelled():
+                logging.info("Cancelled {project_dir}".format(project_dir=project_dir))
+                return get_aborted_result(project_dir=project_dir, log_path=log_path)
+            result = install.result()
+            if not result.success:
+                abort.set()
+            return result
+
+    return list(
+        await asyncio.gather(
+            *[install_limited(project_dir=project_dir) for project_dir in project_dirs]
+        )
+    )
+
+
+def install_projects(
+    project_dirs: List[pathlib.Path],
+    jobs: int = 1,
+    log_dir: Optional[pathlib.Path] = None,
+    output_dir: Optional[pathlib.Path] = None,
+    env_cache_dir: Optional[pathlib.Path] = None,
+    stages: Optional[List[pipeline.Stage]] = None,
+    stage_jobs: Optional[int] = None,
+    console: bool = False,
+    stage_limits: Optional[resource_limits.ResourceLimits] = None,
+    fail_fast: bool = False,
+) -> List[InstallResult]:
+    """Install and test the projects, at most jobs projects at the same time
+
+    Args:
+        project_dirs (List[pathlib.Path]): project directory paths
+        jobs (int): maximum number of projects installed at the same time
+        log_dir (Optional[pathlib.Path]): directory receiving one log file per project
+        output_dir (Optional[pathlib.Path]): directory containing the projects
+        env_cache_dir (Optional[pathlib.Path]): shared virtual environment cache
+        stages (Optional[List[pipeline.Stage]]): make-targets and their dependencies
+        stage_jobs (Optional[int]): maximum number of concurrent make-targets of a
+            project
+        console (bool): print the make-target output live, prefixed by the project
+        stage_limits (Optional[resource_limits.ResourceLimits]): default limits of
+            each make-target
+        fail_fast (bool): stop at the first failing project, see
+            install_projects_async
+
+    Raises:
+        ValueError: jobs is not a positive number
+
+    Returns:
+        List[InstallResult]: results, in the same order as project_dirs
+    """
+    if jobs < 1:
+        raise ValueError("Invalid number of jobs: {jobs}".format(jobs=jobs))
+
+    async def install_all() -> List[InstallResult]:
+        return await install_projects_async(
+            project_dirs=project_dirs,
+            limiter=asyncio.Semaphore(jobs),
+            log_dir=log_dir,
+            output_dir=output_dir,
+            env_cache_dir=env_cache_dir,
+            stages=stages,
+            stage_jobs=stage_jobs,
+            console=console,
+            stage_limits=stage_limits,
+            abort=asyncio.Event() if fail_fast else None,
+        )
+
+    return asyncio.run(install_all())
+
+
+def format_report(results: List[InstallResult]) -> str:
+    """Format the combined pass/fail report of the installed projects
+
+    Args:
+        results (List[InstallResult]): installation results
+
+    Returns:
+        str: human readable report
+    """
+    n_passed = len([result for result in results if result.success])
+    n_aborted = len([result for result in results if result.failure_kind == ABORTED])
+    summary = "{n_passed} passed, {n_failed} failed".format(
+        n_passed=n_passed, n_failed=len(results) - n_passed - n_aborted
+    )
+    if n_aborted:
+        summary += ", {n_aborted} aborted".format(n_aborted=n_aborted)
+    kind_counts = [
+        "{n} {kind}".format(
+            n=len([result for result in results if result.failure_kind == kind]),
+            kind=kind,
+        )
+        for kind in resource_limits.FAILURE_KINDS[1:]
+        if any(result.failure_kind == kind for result in results)
+    ]
+    if kind_counts:
+        summary += " ({kind_counts})".format(kind_counts=", ".join(kind_counts))
+    lines = [summary]
+    for result in results:
+        line = "{status} {project_dir}".format(
+            status=(
+                "PASSED"
+                if result.success
+                else "ABORTED" if result.failure_kind == ABORTED else "FAILED"
+            ),
+            project_dir=result.project_dir,
+        )
+        if result.cached:
+            line += " (cached)"
+        if result.failure_kind and result.failure_kind not in ["failed", ABORTED]:
+            line += " ({failure_kind})".format(failure_kind=result.failure_kind)
+        if result.log_path is not None:
+            line += " (log: {log_path})".format(log_path=result.log_path)
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,67 @@
+import pathlib
+import shutil
+import time
+
+import pytest
+
+from . import install_pool as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "install_pool_test_assets"
+)
+
+
+class Test_install_projects:
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_normal_case(self, jobs: int) -> None:
+        log_dir = TEST_ASSETS_DIR.joinpath(".test_logs")
+        if log_dir.is_dir():
+            shutil.rmtree(log_dir)
+        project_dirs = [
+            TEST_ASSETS_DIR.joinpath("project_pass"),
+            TEST_ASSETS_DIR.joinpath("project_fail"),
+        ]
+        results = test_module.install_projects(
+            project_dirs=project_dirs, jobs=jobs, log_dir=log_dir
+        )
+        assert [result.project_dir for result in results] == project_dirs
+        assert [result.success for result in results] == [True, False]
+        assert "Checking failed" in results[1].message
+        for result in results:
+            assert result.log_path is not None
+            assert result.log_path.is_file()
+        with open(log_dir.joinpath("project_pass.log"), "r") as f:
+            assert "Testing" in f.read()
+
+        report = test_module.format_report(results=results)
+        assert report.splitlines()[0] == "1 passed, 1 failed"
+        shutil.rmtree(log_dir)
+
+    def test_fail_fast(self) -> None:
+        project_dirs = [
+            TEST_ASSETS_DIR.joinpath("project_fail"),
+            TEST_ASSETS_DIR.joinpath("project_slow"),
+            TEST_ASSETS_DIR.joinpath("project_pass"),
+        ]
+        start = time.monotonic()
+        results = test_module.install_projects(
+            project_dirs=project_dirs, jobs=2, fail_fast=True
+        )
+        # The slow project is cancelled and the last project is not run
+        assert time.monotonic() - start < 30
+        assert [result.project_dir for result in results] == project_dirs
+        assert [(result.success, result.failure_kind) for result in results] == [
+            (False, "failed"),
+            (False, test_module.ABORTED),
+            (False, test_module.ABORTED),
+        ]
+        report = test_module.format_report(results=results)
+        assert report.splitlines()[:2] == [
+            "0 passed, 1 failed, 2 aborted",
+            "FAILED {project_dir}".format(project_dir=project_dirs[0]),
+        ]
+        assert "ABORTED {project_dir}".format(project_dir=project_dirs[2]) in report
+
+    def test_error_case(self) -> None:
+        with pytest.raises(ValueError):
+            test_module.install_projects(project_dirs=[], jobs=0)
@@ -0,0 +1,216 @@
+import contextlib
+import json
+import os
+import pathlib
+import resource
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+
+class PhaseRecord(NamedTuple):
+    name: str
+    category: str
+    start: float
+    wall_time: float
+    cpu_time: float
+    peak_rss_kb: int
+    pid: int
+    success: bool
+    project: str = ""
+
+
+def get_cpu_time() -> float:
+    """Get the CPU time (user and system) of the current process and its children
+
+    Returns:
+        float: CPU time in seconds
+    """
+    cpu_time = 0.0
+    for who in [resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN]:
+        usage = resource.getrusage(who)
+        cpu_time += usage.ru_utime + usage.ru_stime
+    return cpu_time
+
+
+def get_peak_rss_kb() -> int:
+    """Get the peak resident set size of the current process and its children
+
+    Returns:
+        int: the high-water mark of the process or of its largest child, in KB
+    """
+    return max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+class PhaseUsage:
+    """Resource usage of the child processes of a phase, measured when each child is
+    waited (see output_stream.run_process_async)"""
+
+    def __init__(self) -> None:
+        self.cpu_time: Optional[float] = None
+        self.peak_rss_kb: Optional[int] = None
+
+    def add_child(self, usage: resource.struct_rusage) -> None:
+        """Add the usage of a waited child
+
+        Args:
+            usage (resource.struct_rusage): usage of the child returned by os.wait4
+        """
+        self.cpu_time = (self.cpu_time or 0.0) + usage.ru_utime + usage.ru_stime
+        self.peak_rss_kb = max(self.peak_rss_kb or 0, usage.ru_maxrss)
+
+
+class Recorder:
+    """Collect the wall time, CPU time and peak RSS of the phases of a run
+
+    The CPU time and the peak RSS of a phase running child processes (such as a
+    make-target) are those of its own children, see PhaseUsage. The other phases
+    report the CPU time of the whole process during the phase, including the children
+    processes waited and the phases run concurrently, and its high-water mark so far,
+    not the peak of the phase itself.
+    """
+
+    def __init__(self, project: str = "") -> None:
+        self.project = project
+        self.records: List[PhaseRecord] = []
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name: str, category: str = "phase") -> Iterator[PhaseUsage]:
+        """Record a phase, its success is False if the block raises
+
+        Args:
+            name (str): phase name
+            category (str): phase category such as phase, project or make-target
+
+        Yields:
+            PhaseUsage: usage of the child processes of the phase, to be filled by the
+            block
+        """
+        start = time.time()
+        start_counter = time.perf_counter()
+        start_cpu_time = get_cpu_time()
+        usage = PhaseUsage()
+        success = False
+        try:
+            yield usage
+            success = True
+        finally:
+            record = PhaseRecord(
+                name=name,
+                category=category,
+                start=start,
+                wall_time=time.perf_counter() - start_counter,
+                cpu_time=(
+                    get_cpu_time() - start_cpu_time
+                    if usage.cpu_time is None
+                    else usage.cpu_time
+                ),
+                peak_rss_kb=(
+                    get_peak_rss_kb()
+                    if usage.peak_rss_kb is None
+                    else usage.peak_rss_kb
+                ),
+                pid=os.getpid(),
+                success=success,
+                project=self.project,
+            )
+            with self.lock:
+                self.records.append(record)
+
+    def extend(self, records: List[PhaseRecord]) -> None:
+        """Add the records collected by another recorder (such as a worker process)
+
+        Args:
+            records (List[PhaseRecord]): records to be added
+        """
+        with self.lock:
+            self.records.extend(records)
+
+
+def write_json_report(
+    report_path: pathlib.Path,
+    records: List[PhaseRecord],
+    extra: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Write the records as a JSON report
+
+    Args:
+        report_path (pathlib.Path): report file path
+        records (List[PhaseRecord]): recorded phases
+        extra (Optional[Dict[str, Any]]): additional top-level values of the report
+    """
+    os.makedirs(report_path.parent, exist_ok=True)
+    data: Dict[str, Any] = dict(extra or {})
+    data["phases"] = [record._asdict() for record in records]
+    with open(report_path, "w") as f:
+        json.dump(data, f, indent=2, default=str)
+
+
+def write_junit_report(report_path: pathlib.Path, records: List[PhaseRecord]) -> None:
+    """Write the make-targets of each project as a JUnit XML report
+
+    Args:
+        report_path (pathlib.Path): report file path
+        records (List[PhaseRecord]): recorded phases, only the make-targets are kept
+    """
+    os.makedirs(report_path.parent, exist_ok=True)
+    cases = [record for record in records if record.category == "make-target"]
+    suite = ET.Element(
+        "testsuite",
+        name="cookiecutter-runner",
+        tests=str(len(cases)),
+        failures=str(len([case for case in cases if not case.success])),
+        time="{:.3f}".format(sum(case.wall_time for case in cases)),
+    )
+    for case in cases:
+        element = ET.SubElement(
+            suite,
+            "testcase",
+            classname=case.project,
+            name=case.name,
+            time="{:.3f}".format(case.wall_time),
+        )
+        if not case.success:
+            ET.SubElement(
+                element,
+                "failure",
+                message="make {name} failed".format(name=case.name),
+            )
+    root = ET.Element("testsuites")
+    root.append(suite)
+    ET.ElementTree(root).write(report_path, encoding="utf-8", xml_declaration=True)
+
+
+def write_chrome_trace(trace_path: pathlib.Path, records: List[PhaseRecord]) -> None:
+    """Write the records as a Chrome trace-event file (chrome://tracing, Perfetto)
+
+    Args:
+        trace_path (pathlib.Path): trace file path
+        records (List[PhaseRecord]): recorded phases
+    """
+    os.makedirs(trace_path.parent, exist_ok=True)
+    events = [
+        {
+            "name": record.name,
+            "cat": record.category,
+            "ph": "X",
+            "ts": int(record.start * 1e6),
+            "dur": int(record.wall_time * 1e6),
+            "pid": record.pid,
+            "tid": record.project or record.category,
+            "args": {
+                "project": record.project,
+                "cpu_time": record.cpu_time,
+                "peak_rss_kb": record.peak_rss_kb,
+                "success": record.success,
+            },
+        }
+        for record in records
+    ]
+    with open(trace_path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
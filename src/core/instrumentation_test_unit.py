@@ -0,0 +1,87 @@
+import json
+import pathlib
+import shutil
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from . import instrumentation as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "instrumentation_test_assets"
+)
+
+
+def test_recorder_phase() -> None:
+    recorder = test_module.Recorder(project="testing")
+    with recorder.phase(name="install", category="make-target"):
+        pass
+    with pytest.raises(RuntimeError):
+        with recorder.phase(name="test", category="make-target"):
+            raise RuntimeError("failed")
+    assert [(record.name, record.success) for record in recorder.records] == [
+        ("install", True),
+        ("test", False),
+    ]
+    for record in recorder.records:
+        assert record.project == "testing"
+        assert record.wall_time >= 0
+        assert record.cpu_time >= 0
+        assert record.peak_rss_kb > 0
+
+
+def test_recorder_phase_usage() -> None:
+    recorder = test_module.Recorder(project="testing")
+    with recorder.phase(name="install", category="make-target") as usage:
+        usage.cpu_time = 2.5
+        usage.peak_rss_kb = 1024
+    with recorder.phase(name="isolate"):
+        pass
+    assert recorder.records[0].cpu_time == 2.5
+    assert recorder.records[0].peak_rss_kb == 1024
+    assert 0 < recorder.records[1].peak_rss_kb <= test_module.get_peak_rss_kb()
+
+
+def test_write_reports() -> None:
+    reports_dir = TEST_ASSETS_DIR.joinpath("reports_cached")
+    if reports_dir.is_dir():
+        shutil.rmtree(reports_dir)
+    recorder = test_module.Recorder(project="testing")
+    with recorder.phase(name="testing", category="project"):
+        with recorder.phase(name="install", category="make-target"):
+            pass
+        with recorder.phase(name="test", category="make-target"):
+            pass
+    records = recorder.records
+    records[1] = records[1]._replace(success=False)
+
+    report_path = reports_dir.joinpath("report.json")
+    test_module.write_json_report(
+        report_path=report_path, records=records, extra={"name": "run"}
+    )
+    with open(report_path, "r") as f:
+        report = json.load(f)
+    assert report["name"] == "run"
+    assert [phase["name"] for phase in report["phases"]] == [
+        "install",
+        "test",
+        "testing",
+    ]
+
+    junit_path = reports_dir.joinpath("junit.xml")
+    test_module.write_junit_report(report_path=junit_path, records=records)
+    suite = ET.parse(junit_path).getroot().find("testsuite")
+    assert suite is not None
+    assert suite.get("tests") == "2"
+    assert suite.get("failures") == "1"
+    assert [case.get("name") for case in suite.findall("testcase")] == [
+        "install",
+        "test",
+    ]
+
+    trace_path = reports_dir.joinpath("trace.json")
+    test_module.write_chrome_trace(trace_path=trace_path, records=records)
+    with open(trace_path, "r") as f:
+        trace = json.load(f)
+    assert [event["ph"] for event in trace["traceEvents"]] == ["X", "X", "X"]
+    shutil.rmtree(reports_dir)
@@ -2,11 +2,74 @@ import logging
 import os
 import pathlib
 import shutil
-from typing import List
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 
-from gitignore_parser import parse_gitignore
+from src.core import cache_manifest, defaults, gitignore_matcher, link_files
 
-logging.basicConfig(level=logging.INFO)
+
+class TemplateEntry:
+    """File found by scan_template, its stat result is computed once on demand and
+    cached by its os.DirEntry"""
+
+    __slots__ = ("path", "rel_path", "dir_entry")
+
+    def __init__(self, dir_entry: "os.DirEntry[str]", root: str) -> None:
+        self.path = dir_entry.path
+        self.rel_path = dir_entry.path[len(root) + 1 :]
+        self.dir_entry = dir_entry
+
+    @property
+    def stat(self) -> os.stat_result:
+        return self.dir_entry.stat()
+
+
+class TemplateRoot(NamedTuple):
+    cookiecutter_json: Optional["os.DirEntry[str]"]
+    project_dirs: List["os.DirEntry[str]"]
+    hooks_dir: Optional["os.DirEntry[str]"]
+
+    @property
+    def is_valid(self) -> bool:
+        return self.cookiecutter_json is not None and len(self.project_dirs) == 1
+
+
+class TemplateDiff(NamedTuple):
+    # Manifest entry and absolute source path of each file to be isolated
+    files: Dict[str, cache_manifest.ManifestEntry]
+    src_paths: Dict[str, str]
+    # Relative paths to be linked, then to be removed from the isolated template
+    changed: List[str]
+    removed: List[str]
+
+
+def scan_template_root(cur_dir: pathlib.Path) -> TemplateRoot:
+    """List the entries of a template directory read by cookiecutter, in one scan
+
+    Args:
+        cur_dir (pathlib.Path): target template directory path
+
+    Raises:
+        FileNotFoundError: the directory does not exist
+
+    Returns:
+        TemplateRoot: cookiecutter.json, {{cookiecutter.var_name}} and hooks entries
+    """
+    if not cur_dir.exists():
+        raise FileNotFoundError(cur_dir)
+    cookiecutter_json, project_dirs, hooks_dir = None, [], None
+    with os.scandir(str(cur_dir)) as it:
+        for entry in it:
+            if entry.name == "cookiecutter.json" and entry.is_file():
+                cookiecutter_json = entry
+            elif entry.name.startswith("{{cookiecutter."):
+                project_dirs.append(entry)
+            elif entry.name == "hooks" and entry.is_dir():
+                hooks_dir = entry
+    return TemplateRoot(
+        cookiecutter_json=cookiecutter_json,
+        project_dirs=project_dirs,
+        hooks_dir=hooks_dir,
+    )
 
 
 def is_valid_template_directory(cur_dir: pathlib.Path) -> bool:
@@ -20,42 +83,217 @@ def is_valid_template_directory(cur_dir: pathlib.Path) -> bool:
         - True if having cookiecutter.json and a {{cookiecutter.var_name}} directory
         - False otherwise
     """
-    if not cur_dir.exists():
-        raise FileNotFoundError(cur_dir)
-    if not cur_dir.joinpath("cookiecutter.json").is_file():
-        return False
-    f_paths = list(cur_dir.glob("*"))
-    temp_dirs = [
-        f_path for f_path in f_paths if f_path.name.startswith("{{cookiecutter.")
+    return scan_template_root(cur_dir=cur_dir).is_valid
+
+
+def find_template_directories(root: pathlib.Path) -> List[pathlib.Path]:
+    """Find the template directories under a directory, such as a repository of
+    templates
+
+    The template directories are not descended into, neither are the hidden
+    directories.
+
+    Args:
+        root (pathlib.Path): directory to be searched, it may be a template itself
+
+    Returns:
+        List[pathlib.Path]: sorted template directory paths
+    """
+    template_dirs: List[pathlib.Path] = []
+    stack = [root]
+    while stack:
+        cur_dir = stack.pop()
+        if is_valid_template_directory(cur_dir=cur_dir):
+            template_dirs.append(cur_dir)
+            continue
+        with os.scandir(str(cur_dir)) as it:
+            stack.extend(
+                pathlib.Path(entry.path)
+                for entry in it
+                if entry.is_dir(follow_symlinks=False)
+                and not entry.name.startswith(".")
+            )
+    return sorted(template_dirs)
+
+
+def scan_not_ignored(
+    cur_dir: pathlib.Path,
+    matchers: List[Tuple[str, gitignore_matcher.GitignoreMatcher]],
+    root: Optional[pathlib.Path] = None,
+) -> Iterator[TemplateEntry]:
+    """Walk a directory in a single pass, skipping the paths ignored by git
+
+    The ignore rules are evaluated while descending, thus an ignored directory is
+    never entered. The .gitignore files found in the sub-directories add their rules
+    to their own sub-tree, the innermost .gitignore having a matching rule wins.
+    Symbolic links to directories are not followed.
+
+    Args:
+        cur_dir (pathlib.Path): directory to be walked
+        matchers (List[Tuple[str, gitignore_matcher.GitignoreMatcher]]): base
+            directory and compiled rules of the .gitignore files applied to cur_dir
+        root (Optional[pathlib.Path]): directory the relative paths of the entries
+            start from, cur_dir if not specified
+
+    Yields:
+        Iterator[TemplateEntry]: entries of the files not being ignored by git
+    """
+    root_path = str(cur_dir if root is None else root)
+    stack = [(str(cur_dir), matchers)]
+    while stack:
+        dir_path, dir_matchers = stack.pop()
+        nested_gitignore_path = os.path.join(dir_path, ".gitignore")
+        if dir_path != str(cur_dir) and os.path.isfile(nested_gitignore_path):
+            dir_matchers = dir_matchers + [
+                (
+                    dir_path,
+                    gitignore_matcher.load_gitignore(
+                        gitignore_path=pathlib.Path(nested_gitignore_path)
+                    ),
+                )
+            ]
+        with os.scandir(dir_path) as it:
+            entries = list(it)
+        are_dirs = [entry.is_dir(follow_symlinks=False) for entry in entries]
+        # Match all entries of the directory at once, the innermost .gitignore
+        # having a matching rule wins
+        ignored: List[Optional[bool]] = [None] * len(entries)
+        for base_dir, matcher in dir_matchers:
+            prefix_len = len(base_dir) + 1
+            matches = matcher.match_many(
+                rel_paths=[entry.path[prefix_len:] for entry in entries],
+                are_dirs=are_dirs,
+            )
+            ignored = [
+                previous if match is None else match
+                for previous, match in zip(ignored, matches)
+            ]
+        for entry, is_dir, is_ignored in zip(entries, are_dirs, ignored):
+            if is_ignored:
+                continue
+            if is_dir:
+                stack.append((entry.path, dir_matchers))
+            elif entry.is_file():
+                yield TemplateEntry(dir_entry=entry, root=root_path)
+
+
+def walk_not_ignored(
+    cur_dir: pathlib.Path,
+    matchers: List[Tuple[str, gitignore_matcher.GitignoreMatcher]],
+) -> Iterator[pathlib.Path]:
+    """Walk a directory in a single pass, skipping the paths ignored by git, see
+    scan_not_ignored
+
+    Args:
+        cur_dir (pathlib.Path): directory to be walked
+        matchers (List[Tuple[str, gitignore_matcher.GitignoreMatcher]]): base
+            directory and compiled rules of the .gitignore files applied to cur_dir
+
+    Yields:
+        Iterator[pathlib.Path]: paths of the files not being ignored by git
+    """
+    for entry in scan_not_ignored(cur_dir=cur_dir, matchers=matchers):
+        yield pathlib.Path(entry.path)
+
+
+def get_gitignore_matchers(
+    gitignore_path: pathlib.Path,
+) -> List[Tuple[str, gitignore_matcher.GitignoreMatcher]]:
+    """Compile the rules of a .gitignore file
+
+    Args:
+        gitignore_path (pathlib.Path): .gitignore path
+
+    Returns:
+        List[Tuple[str, gitignore_matcher.GitignoreMatcher]]: base directory and
+        compiled rules, empty if the file does not exist
+    """
+    if not gitignore_path.is_file():
+        return []
+    return [
+        (
+            str(gitignore_path.absolute().parent),
+            gitignore_matcher.load_gitignore(gitignore_path=gitignore_path),
+        )
     ]
-    if len(temp_dirs) != 1:
-        return False
-    return True
 
 
 def get_not_ignored_paths(
     cur_dir: pathlib.Path, gitignore_path: pathlib.Path
 ) -> List[pathlib.Path]:
-    """Get path not being ignored by git due to the .gitignore
+    """Get the paths of the files not ignored by git
 
     Args:
-        cur_dir (pathlib.Path): directory to be considered
-        gitignore_path (pathlib.Path): .gitignore path
+        cur_dir (pathlib.Path): target directory path
+        gitignore_path (pathlib.Path): .gitignore path, the nested .gitignore files
+            of the sub-directories are also applied
 
     Returns:
         List[pathlib.Path]: list of paths in cur_dir not being ignored by git
     """
-    f_paths = [f_path for f_path in cur_dir.rglob("*") if f_path.is_file()]
-    if not gitignore_path.is_file():
-        return list(f_paths)
+    return list(
+        walk_not_ignored(
+            cur_dir=cur_dir.absolute(),
+            matchers=get_gitignore_matchers(gitignore_path=gitignore_path),
+        )
+    )
 
-    matcher = parse_gitignore(gitignore_path)
-    f_paths = [
-        pathlib.Path(f_path).absolute()
-        for f_path in f_paths
-        if matcher(f_path) is False
-    ]
-    return list(f_paths)
+
+def scan_hooks(hooks_dir: str, root: str) -> Iterator[TemplateEntry]:
+    """Walk the hooks directory, the hooks are never ignored
+
+    Args:
+        hooks_dir (str): hooks directory path
+        root (str): template directory path
+
+    Yields:
+        Iterator[TemplateEntry]: entries of the hook files
+    """
+    stack = [hooks_dir]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    yield TemplateEntry(dir_entry=entry, root=root)
+
+
+def scan_template(cur_dir: pathlib.Path) -> Iterator[TemplateEntry]:
+    """Walk the files to be copied to .cache in a single pass
+
+    The template root is validated from its own scan, then cookiecutter.json, the
+    hooks (optional) and the files of the {{cookiecutter.var_name}} directory not
+    ignored by its .gitignore are yielded with their cached stat result, so that
+    the consumers (validation, filtering, manifest and copy) do not stat them again.
+
+    Args:
+        cur_dir (pathlib.Path): target template directory
+
+    Raises:
+        Exception: Invalid tempalte directory
+
+    Yields:
+        Iterator[TemplateEntry]: entries of the files to be copied, relative to
+        cur_dir
+    """
+    cur_dir = cur_dir.absolute()
+    template_root = scan_template_root(cur_dir=cur_dir)
+    if not template_root.is_valid:
+        raise Exception("Invalid template directory: {cur_dir}".format(cur_dir=cur_dir))
+    assert template_root.cookiecutter_json is not None
+    root = str(cur_dir)
+    yield TemplateEntry(dir_entry=template_root.cookiecutter_json, root=root)
+    if template_root.hooks_dir is not None:
+        yield from scan_hooks(hooks_dir=template_root.hooks_dir.path, root=root)
+    project_path = pathlib.Path(template_root.project_dirs[0].path)
+    yield from scan_not_ignored(
+        cur_dir=project_path,
+        matchers=get_gitignore_matchers(
+            gitignore_path=project_path.joinpath(".gitignore")
+        ),
+        root=cur_dir,
+    )
 
 
 def get_valid_paths(cur_dir: pathlib.Path) -> List[pathlib.Path]:
@@ -70,33 +308,10 @@ def get_valid_paths(cur_dir: pathlib.Path) -> List[pathlib.Path]:
     Returns:
         List[pathlib.Path]: paths to be copied
     """
-    if not is_valid_template_directory(cur_dir=cur_dir):
-        raise Exception("Invalid template directory: {cur_dir}".format(cur_dir=cur_dir))
-
-    cur_dir = cur_dir.absolute()
-    f_paths = list(pathlib.Path(cur_dir).glob("*"))
-
-    # cookiecutter.json and the hooks (optional) are added initially
-    result_paths = [cur_dir.joinpath("cookiecutter.json")]
-    hooks_dir_path = cur_dir.joinpath("hooks")
-    if hooks_dir_path.is_dir():
-        result_paths.extend(list(pathlib.Path(hooks_dir_path).rglob("*")))
-
-    # Get the only {{cookiecutter.var_name}} directory path
-    project_path = [
-        f_path for f_path in f_paths if f_path.name.startswith("{{cookiecutter.")
-    ][0]
-    gitignore_path = project_path.joinpath(".gitignore")
-
-    # Get paths of files not ignored by git in the template project
-    not_ignored_paths = get_not_ignored_paths(
-        cur_dir=project_path, gitignore_path=gitignore_path
-    )
-    # Append these paths to the final result
-    result_paths += not_ignored_paths
-    logging.info(
-        "Loaded {n} not ignored paths by .gitignore".format(n=len(not_ignored_paths))
-    )
+    result_paths = [
+        pathlib.Path(entry.path) for entry in scan_template(cur_dir=cur_dir)
+    ]
+    logging.info("Loaded {n} valid paths".format(n=len(result_paths)))
     return result_paths
 
 
@@ -117,12 +332,135 @@ def get_relative_path(
     return dest_dir.joinpath(f_path)
 
 
-def run(template_dir: pathlib.Path, cache_dir: pathlib.Path) -> None:
+def remove_empty_parents(f_path: pathlib.Path, root_dir: pathlib.Path) -> None:
+    """Remove the empty parent directories of f_path up to (excluding) root_dir
+
+    Args:
+        f_path (pathlib.Path): removed file path
+        root_dir (pathlib.Path): directory where the removal stops
+    """
+    parent = f_path.parent
+    while parent != root_dir and root_dir in parent.parents:
+        try:
+            parent.rmdir()
+        except OSError:
+            return
+        parent = parent.parent
+
+
+def get_requested_link_mode(manifest: cache_manifest.Manifest) -> str:
+    """Get the link mode requested when isolating a template
+
+    Args:
+        manifest (cache_manifest.Manifest): manifest of the isolated template
+
+    Returns:
+        str: the requested link mode, the mode of the isolated files for the
+        manifests which do not record it
+    """
+    if manifest.requested_link_mode is None:
+        return manifest.link_mode
+    return manifest.requested_link_mode
+
+
+def get_effective_link_mode(
+    link_mode: str, modes: List[str], kept_mode: Optional[str]
+) -> str:
+    """Get the mode of the files of an isolated template
+
+    Args:
+        link_mode (str): requested link mode
+        modes (List[str]): mode used for each added or changed file, see
+            link_files.link_many
+        kept_mode (Optional[str]): mode of the unchanged files, None if there is
+            none
+
+    Returns:
+        str: the requested mode if a file uses it (or no file was isolated), copy if
+        it fell back for all the files
+    """
+    used = set(modes)
+    if kept_mode is not None:
+        used.add(kept_mode)
+    if not used or link_mode in used:
+        return link_mode
+    return "copy"
+
+
+def diff_template(
+    template_dir: pathlib.Path,
+    manifest: Optional[cache_manifest.Manifest],
+    link_mode: str = "copy",
+) -> TemplateDiff:
+    """Compare the files to be isolated with the manifest of the isolated template,
+    without writing anything
+
+    Args:
+        template_dir (pathlib.Path): absolute template directory path
+        manifest (Optional[cache_manifest.Manifest]): manifest of the isolated
+            template, None if there is no isolated template yet
+        link_mode (str): how the files are isolated
+
+    Raises:
+        Exception: Invalid template directory
+
+    Returns:
+        TemplateDiff: the files to be isolated and their changes
+    """
+    previous_files: Dict[str, cache_manifest.ManifestEntry] = {}
+    old_files: Dict[str, cache_manifest.ManifestEntry] = {}
+    if manifest is not None:
+        # The size and modification time only identify the same file content
+        # when the previous manifest was built from the same template directory
+        if manifest.template_dir == str(template_dir):
+            previous_files = manifest.files
+        # The files isolated with another link mode are all replaced, the files
+        # copied because the requested mode is not supported are kept
+        if get_requested_link_mode(manifest=manifest) == link_mode:
+            old_files = manifest.files
+
+    # The manifest entries reuse the stat results of the scan
+    new_files: Dict[str, cache_manifest.ManifestEntry] = {}
+    src_paths: Dict[str, str] = {}
+    for entry in scan_template(cur_dir=template_dir):
+        new_files[entry.rel_path] = cache_manifest.compute_entry(
+            f_path=pathlib.Path(entry.path),
+            previous=previous_files.get(entry.rel_path),
+            stat=entry.stat,
+        )
+        src_paths[entry.rel_path] = entry.path
+    logging.info("Loaded {n} valid paths".format(n=len(new_files)))
+
+    changed, removed = cache_manifest.diff_manifests(old=old_files, new=new_files)
+    if manifest is not None and get_requested_link_mode(manifest=manifest) != link_mode:
+        removed = sorted(set(manifest.files) - set(new_files))
+    return TemplateDiff(
+        files=new_files, src_paths=src_paths, changed=changed, removed=removed
+    )
+
+
+def run(
+    template_dir: pathlib.Path,
+    cache_dir: pathlib.Path,
+    link_mode: str = "copy",
+    copy_workers: int = defaults.DEFAULT_WORKERS,
+) -> cache_manifest.Manifest:
     """Execute the isolating process
 
+    The cache directory is kept between runs together with a manifest of the
+    isolated files (size, modification time and content hash), so a rerun only
+    copies the added or changed files and deletes the removed ones.
+
     Args:
         template_dir (pathlib.Path): template directory path
         cache_dir (pathlib.Path): cache directory path
+        link_mode (str): how the files are isolated, one of defaults.LINK_MODES,
+            the isolated template is only read by cookiecutter thus it can share the
+            data of the template files
+        copy_workers (int): number of threads copying the files
+
+    Returns:
+        cache_manifest.Manifest: manifest of the isolated template
     """
     logging.info(
         "Isolating the template directory from {template_dir}".format(
@@ -131,19 +469,63 @@ def run(template_dir: pathlib.Path, cache_dir: pathlib.Path) -> None:
     )
     template_dir = template_dir.absolute()
 
-    if cache_dir.is_dir():
-        logging.info("Removing existing cache {cache_dir}".format(cache_dir=cache_dir))
+    manifest = cache_manifest.load_manifest(cache_dir=cache_dir)
+    if cache_dir.is_dir() and manifest is None:
+        logging.info(
+            "Removing existing cache without manifest {cache_dir}".format(
+                cache_dir=cache_dir
+            )
+        )
         shutil.rmtree(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
 
-    os.makedirs(cache_dir, exist_ok=False)
+    diff = diff_template(
+        template_dir=template_dir, manifest=manifest, link_mode=link_mode
+    )
+    new_files, changed, removed = diff.files, diff.changed, diff.removed
+    logging.info(
+        "Isolated cache diff: {n_changed} added or changed, {n_removed} removed, "
+        "{n_same} unchanged".format(
+            n_changed=len(changed),
+            n_removed=len(removed),
+            n_same=len(new_files) - len(changed),
+        )
+    )
 
-    res: List[pathlib.Path] = get_valid_paths(cur_dir=template_dir)
-    logging.info("Loaded {n} valid paths".format(n=len(res)))
+    for rel_path in removed:
+        dest_path = cache_dir.joinpath(rel_path)
+        if dest_path.is_file() or dest_path.is_symlink():
+            dest_path.unlink()
+        remove_empty_parents(f_path=dest_path, root_dir=cache_dir)
 
-    for f_path in res:
-        dest_path = get_relative_path(
-            f_path=f_path, cur_dir=template_dir, dest_dir=cache_dir
+    modes = link_files.link_many(
+        pairs=[
+            (pathlib.Path(diff.src_paths[rel_path]), cache_dir.joinpath(rel_path))
+            for rel_path in changed
+        ],
+        mode=link_mode,
+        workers=copy_workers,
+    )
+    n_copied = len([mode for mode in modes if mode != link_mode])
+    if n_copied > 0:
+        logging.warning(
+            "{link_mode} is not supported for {n_copied} of {n} files, copied them"
+            " instead".format(link_mode=link_mode, n_copied=n_copied, n=len(modes))
         )
-        dest_dir = pathlib.Path(dest_path).parent
-        os.makedirs(dest_dir, exist_ok=True)
-        shutil.copy(f_path, dest_path)
+
+    new_manifest = cache_manifest.Manifest(
+        template_dir=str(template_dir),
+        files=new_files,
+        link_mode=get_effective_link_mode(
+            link_mode=link_mode,
+            modes=modes,
+            kept_mode=(
+                manifest.link_mode
+                if manifest is not None and len(changed) < len(new_files)
+                else None
+            ),
+        ),
+        requested_link_mode=link_mode,
+    )
+    cache_manifest.save_manifest(cache_dir=cache_dir, manifest=new_manifest)
+    return new_manifest
@@ -1,6 +1,7 @@
+import logging
 import pathlib
 import shutil
-from typing import List
+from typing import Any, Dict, List
 
 import pytest
 
@@ -72,6 +73,101 @@ def test_get_valid_paths(cur_dir: pathlib.Path, expected: List[pathlib.Path]) ->
     assert sorted(res) == sorted(expected)
 
 
+def test_scan_template() -> None:
+    cur_dir = TEST_ASSETS_DIR.joinpath("get_valid_paths_2_with_ignored_file").absolute()
+    entries = list(test_module.scan_template(cur_dir=cur_dir))
+    assert sorted(entry.rel_path for entry in entries) == [
+        "cookiecutter.json",
+        "hooks/pre_gen_hook.py",
+        "{{cookiecutter.var_name}}/.gitignore",
+        "{{cookiecutter.var_name}}/test_2.py",
+    ]
+    for entry in entries:
+        assert entry.path == str(cur_dir.joinpath(entry.rel_path))
+        assert entry.stat.st_size == cur_dir.joinpath(entry.rel_path).stat().st_size
+        assert not hasattr(entry, "__dict__")
+
+    template_root = test_module.scan_template_root(cur_dir=cur_dir)
+    assert template_root.is_valid
+    assert template_root.hooks_dir is not None
+    invalid_dir = TEST_ASSETS_DIR.joinpath("invalid_cookiecutter_dir_1_no_json")
+    assert not test_module.scan_template_root(cur_dir=invalid_dir).is_valid
+    with pytest.raises(Exception):
+        list(test_module.scan_template(cur_dir=invalid_dir))
+
+
+def test_find_template_directories() -> None:
+    template_dirs = test_module.find_template_directories(root=TEST_ASSETS_DIR)
+    names = [template_dir.name for template_dir in template_dirs]
+    assert names == sorted(names)
+    assert "get_valid_paths_1" in names
+    assert "invalid_cookiecutter_dir_1_no_json" not in names
+    assert all(
+        test_module.is_valid_template_directory(cur_dir=template_dir)
+        for template_dir in template_dirs
+    )
+    template_dir = TEST_ASSETS_DIR.joinpath("get_valid_paths_1")
+    assert test_module.find_template_directories(root=template_dir) == [template_dir]
+
+
+class Test_get_not_ignored_paths:
+    def create_tree(self, root_dir: pathlib.Path, content: Dict[str, Any]) -> None:
+        root_dir.mkdir(parents=True, exist_ok=True)
+        for name, value in content.items():
+            f_path = root_dir.joinpath(name)
+            if isinstance(value, dict):
+                self.create_tree(root_dir=f_path, content=value)
+            else:
+                with open(f_path, "w") as f:
+                    f.write(value)
+
+    def test_nested_gitignore(self, monkeypatch: Any) -> None:
+        project_dir = TEST_ASSETS_DIR.joinpath("nested_gitignore_cached")
+        if project_dir.is_dir():
+            shutil.rmtree(project_dir)
+        self.create_tree(
+            root_dir=project_dir,
+            content={
+                ".gitignore": "ignored_dir/\nbuild\n*.pyc\n",
+                "main.py": "",
+                "main.pyc": "",
+                "ignored_dir": {"lib.py": "", "deep": {"lib.py": ""}},
+                "build": {"out.py": ""},
+                "sub": {
+                    ".gitignore": "*.log\n",
+                    "sub.py": "",
+                    "sub.log": "",
+                    "cache.pyc": "",
+                },
+                "other": {"other.log": ""},
+            },
+        )
+        scanned_dirs: List[str] = []
+        scandir = test_module.os.scandir
+
+        def recording_scandir(path: str) -> Any:
+            scanned_dirs.append(path)
+            return scandir(path)
+
+        monkeypatch.setattr(test_module.os, "scandir", recording_scandir)
+        res = test_module.get_not_ignored_paths(
+            cur_dir=project_dir, gitignore_path=project_dir.joinpath(".gitignore")
+        )
+        monkeypatch.undo()
+
+        assert sorted(f_path.relative_to(project_dir.absolute()) for f_path in res) == [
+            pathlib.Path(".gitignore"),
+            pathlib.Path("main.py"),
+            pathlib.Path("other", "other.log"),
+            pathlib.Path("sub", ".gitignore"),
+            pathlib.Path("sub", "sub.py"),
+        ]
+        # The ignored directories are never entered
+        assert not [f_dir for f_dir in scanned_dirs if "ignored_dir" in f_dir]
+        assert not [f_dir for f_dir in scanned_dirs if "build" in f_dir]
+        shutil.rmtree(project_dir)
+
+
 class Test_is_valid_template_directory:
     @pytest.mark.parametrize(
         "cur_dir, expected",
@@ -165,3 +261,88 @@ class Test_run:
         if ground_truth_cache_dir.is_dir():
             shutil.rmtree(ground_truth_cache_dir)
         assert not ground_truth_cache_dir.is_dir()
+
+    def test_incremental_cache(self) -> None:
+        template_dir = TEST_ASSETS_DIR.joinpath("incremental_template_cached")
+        cache_dir = self.get_cache_dir(template_dir=template_dir)
+        for f_dir in [template_dir, cache_dir]:
+            if f_dir.is_dir():
+                shutil.rmtree(f_dir)
+        shutil.copytree(TEST_ASSETS_DIR.joinpath("run_1_empty_hooks"), template_dir)
+        project_dir = template_dir.joinpath("{{cookiecutter.var_name}}")
+
+        test_module.run(template_dir=template_dir, cache_dir=cache_dir)
+        cached_project_dir = cache_dir.joinpath("{{cookiecutter.var_name}}")
+        unchanged_mtime = cached_project_dir.joinpath("test_a.py").stat().st_mtime_ns
+
+        # Change, add and remove template files
+        with open(project_dir.joinpath("test_b.py"), "w") as f:
+            f.write("changed = True\n")
+        project_dir.joinpath("new_dir").mkdir()
+        with open(project_dir.joinpath("new_dir", "new.py"), "w") as f:
+            f.write("new = True\n")
+        project_dir.joinpath(".gitignore").unlink()
+
+        test_module.run(template_dir=template_dir, cache_dir=cache_dir)
+        assert (
+            cached_project_dir.joinpath("test_a.py").stat().st_mtime_ns
+            == unchanged_mtime
+        )
+        with open(cached_project_dir.joinpath("test_b.py"), "r") as f:
+            assert f.read() == "changed = True\n"
+        assert cached_project_dir.joinpath("new_dir", "new.py").is_file()
+        assert not cached_project_dir.joinpath(".gitignore").exists()
+
+        # Removing the new directory from the template removes it from the cache
+        shutil.rmtree(project_dir.joinpath("new_dir"))
+        test_module.run(template_dir=template_dir, cache_dir=cache_dir)
+        assert not cached_project_dir.joinpath("new_dir").exists()
+
+        # Changing the link mode replaces every isolated file
+        test_module.run(
+            template_dir=template_dir, cache_dir=cache_dir, link_mode="symlink"
+        )
+        assert cached_project_dir.joinpath("test_a.py").is_symlink()
+        test_module.run(template_dir=template_dir, cache_dir=cache_dir)
+        assert not cached_project_dir.joinpath("test_a.py").is_symlink()
+
+        shutil.rmtree(template_dir)
+        shutil.rmtree(cache_dir)
+
+    def test_link_mode_fallback(self, monkeypatch: Any, caplog: Any) -> None:
+        template_dir = TEST_ASSETS_DIR.joinpath("run_1_empty_hooks").absolute()
+        cache_dir = TEST_ASSETS_DIR.joinpath("link_mode_fallback_cached")
+        if cache_dir.is_dir():
+            shutil.rmtree(cache_dir)
+
+        def unsupported_link(*args: Any) -> None:
+            raise OSError("Invalid cross-device link")
+
+        monkeypatch.setattr(test_module.link_files.os, "link", unsupported_link)
+        with caplog.at_level(logging.WARNING):
+            manifest = test_module.run(
+                template_dir=template_dir, cache_dir=cache_dir, link_mode="hardlink"
+            )
+        assert (
+            "hardlink is not supported for {n} of {n} files".format(
+                n=len(manifest.files)
+            )
+            in caplog.text
+        )
+        # The effective mode is recorded, the rerun keeps the copies
+        assert manifest.link_mode == "copy"
+        assert manifest.requested_link_mode == "hardlink"
+        caplog.clear()
+        manifest = test_module.run(
+            template_dir=template_dir, cache_dir=cache_dir, link_mode="hardlink"
+        )
+        assert manifest.link_mode == "copy"
+        assert "not supported" not in caplog.text
+        monkeypatch.undo()
+
+        # Once supported, changing the requested mode replaces the copies
+        manifest = test_module.run(
+            template_dir=template_dir, cache_dir=cache_dir, link_mode="symlink"
+        )
+        assert manifest.link_mode == "symlink"
+        shutil.rmtree(cache_dir)
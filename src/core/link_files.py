@@ -0,0 +1,119 @@
+import logging
+import os
+import pathlib
+import shutil
+from typing import List, Tuple
+
+from src.core import defaults
+
+# ioctl request sharing the extents of a file (linux/fs.h), supported by
+# copy-on-write file systems such as btrfs, xfs or overlayfs on top of them
+FICLONE = 0x40049409
+
+
+def reflink(src_path: pathlib.Path, dest_path: pathlib.Path) -> None:
+    """Clone a file with the FICLONE ioctl, the data blocks are shared until one of
+    the files is modified
+
+    Args:
+        src_path (pathlib.Path): source file path
+        dest_path (pathlib.Path): destination file path
+
+    Raises:
+        OSError: the platform or the file system does not support reflinks
+    """
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("Reflinks are not supported on this platform")
+    with open(src_path, "rb") as src_file, open(dest_path, "wb") as dest_file:
+        fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+    shutil.copymode(src_path, dest_path)
+
+
+def link_file(src_path: pathlib.Path, dest_path: pathlib.Path, mode: str) -> str:
+    """Materialize a source file at the destination path
+
+    The existing destination is removed first, so a hard link to the source is never
+    written through. If the file system does not support the requested mode (for
+    example a hard link across devices), the file is copied instead.
+
+    Args:
+        src_path (pathlib.Path): source file path
+        dest_path (pathlib.Path): destination file path
+        mode (str): one of defaults.LINK_MODES
+
+    Raises:
+        ValueError: unknown link mode
+
+    Returns:
+        str: the mode actually used
+    """
+    if mode not in defaults.LINK_MODES:
+        raise ValueError("Unknown link mode: {mode}".format(mode=mode))
+    if dest_path.is_symlink() or dest_path.exists():
+        dest_path.unlink()
+    if mode != "copy":
+        try:
+            if mode == "hardlink":
+                os.link(src_path, dest_path)
+            elif mode == "symlink":
+                os.symlink(src_path.absolute(), dest_path)
+            else:
+                reflink(src_path=src_path, dest_path=dest_path)
+            return mode
+        except OSError as e:
+            logging.debug(
+                "Falling back to copy for {src_path} ({mode}: {error})".format(
+                    src_path=src_path, mode=mode, error=e
+                )
+            )
+            if dest_path.is_symlink() or dest_path.exists():
+                dest_path.unlink()
+    shutil.copy(src_path, dest_path)
+    return "copy"
+
+
+def link_many(
+    pairs: List[Tuple[pathlib.Path, pathlib.Path]],
+    mode: str,
+    workers: int = defaults.DEFAULT_WORKERS,
+) -> List[str]:
+    """Materialize many source files at their destination paths
+
+    Each destination directory is created once up front, then the files are
+    processed by a pool of threads: the copies mostly wait on the storage, which
+    leaves most of the bandwidth idle when done one by one on high latency storage
+    (such as NFS).
+
+    Args:
+        pairs (List[Tuple[pathlib.Path, pathlib.Path]]): source and destination paths
+        mode (str): one of defaults.LINK_MODES
+        workers (int): number of threads, the files are processed serially if 1
+
+    Raises:
+        ValueError: unknown link mode or invalid number of workers
+
+    Returns:
+        List[str]: the mode actually used for each pair
+    """
+    if mode not in defaults.LINK_MODES:
+        raise ValueError("Unknown link mode: {mode}".format(mode=mode))
+    if workers < 1:
+        raise ValueError("Invalid number of workers: {workers}".format(workers=workers))
+    for dest_dir in sorted(set(dest_path.parent for _, dest_path in pairs)):
+        os.makedirs(dest_dir, exist_ok=True)
+    if workers == 1 or len(pairs) <= 1:
+        return [
+            link_file(src_path=src_path, dest_path=dest_path, mode=mode)
+            for src_path, dest_path in pairs
+        ]
+    import concurrent.futures
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(
+                lambda pair: link_file(src_path=pair[0], dest_path=pair[1], mode=mode),
+                pairs,
+            )
+        )
@@ -0,0 +1,96 @@
+import os
+import pathlib
+import shutil
+
+import pytest
+
+from . import defaults
+from . import link_files as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "link_files_test_assets"
+)
+
+
+class Test_link_file:
+    def get_work_dir(self) -> pathlib.Path:
+        work_dir = TEST_ASSETS_DIR.joinpath("link_file_cached")
+        if work_dir.is_dir():
+            shutil.rmtree(work_dir)
+        work_dir.mkdir(parents=True)
+        return work_dir
+
+    @pytest.mark.parametrize("mode", defaults.LINK_MODES)
+    def test_normal_case(self, mode: str) -> None:
+        work_dir = self.get_work_dir()
+        src_path = work_dir.joinpath("src.txt")
+        with open(src_path, "w") as f:
+            f.write("content")
+        dest_path = work_dir.joinpath("dest.txt")
+        with open(dest_path, "w") as f:
+            f.write("existing")
+
+        used_mode = test_module.link_file(
+            src_path=src_path, dest_path=dest_path, mode=mode
+        )
+        assert used_mode in [mode, "copy"]
+        with open(dest_path, "r") as f:
+            assert f.read() == "content"
+        if used_mode == "hardlink":
+            assert os.stat(src_path).st_ino == os.stat(dest_path).st_ino
+        if used_mode == "symlink":
+            assert dest_path.is_symlink()
+
+        # Replacing the destination never writes through to the source
+        other_path = work_dir.joinpath("other.txt")
+        with open(other_path, "w") as f:
+            f.write("other")
+        test_module.link_file(src_path=other_path, dest_path=dest_path, mode="copy")
+        with open(dest_path, "r") as f:
+            assert f.read() == "other"
+        with open(src_path, "r") as f:
+            assert f.read() == "content"
+        shutil.rmtree(work_dir)
+
+    def test_error_case(self) -> None:
+        work_dir = self.get_work_dir()
+        with pytest.raises(ValueError):
+            test_module.link_file(
+                src_path=work_dir.joinpath("src.txt"),
+                dest_path=work_dir.joinpath("dest.txt"),
+                mode="unknown",
+            )
+        shutil.rmtree(work_dir)
+
+
+class Test_link_many:
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_normal_case(self, workers: int) -> None:
+        work_dir = TEST_ASSETS_DIR.joinpath("link_many_cached")
+        if work_dir.is_dir():
+            shutil.rmtree(work_dir)
+        src_dir = work_dir.joinpath("src")
+        pairs = []
+        for i in range(20):
+            src_path = src_dir.joinpath(
+                "dir_{i}".format(i=i % 3), "{i}.txt".format(i=i)
+            )
+            src_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(src_path, "w") as f:
+                f.write(str(i))
+            pairs.append(
+                (
+                    src_path,
+                    work_dir.joinpath("dest", *src_path.relative_to(src_dir).parts),
+                )
+            )
+        res = test_module.link_many(pairs=pairs, mode="copy", workers=workers)
+        assert res == ["copy"] * len(pairs)
+        for i, (_, dest_path) in enumerate(pairs):
+            with open(dest_path, "r") as f:
+                assert f.read() == str(i)
+        shutil.rmtree(work_dir)
+
+    def test_error_case(self) -> None:
+        with pytest.raises(ValueError):
+            test_module.link_many(pairs=[], mode="copy", workers=0)
@@ -0,0 +1,372 @@
+import asyncio
+import collections
+import logging
+import os
+import pathlib
+import resource
+import signal
+import subprocess
+import threading
+import time
+from typing import IO, Any, BinaryIO, Deque, List, Optional, TextIO, Tuple
+
+from src.core import instrumentation
+
+# Lines kept in memory to build the failure message of a process
+RING_BUFFER_LINES = 200
+# Longer lines are split, so that a process printing no newline is still bounded
+MAX_LINE_BYTES = 64 * 1024
+# Seconds between two flushes of a log file
+FLUSH_INTERVAL = 1.0
+# Seconds given to a terminated process group before it is killed
+KILL_GRACE_PERIOD = 5.0
+# Seconds the output is still read once the process exited, the descendants which
+# escaped its process group may keep the pipes open
+DRAIN_TIMEOUT = 1.0
+
+
+class OutputSink:
+    """Receive the output lines of the processes run for a project
+
+    Each line is written to the log file and the console (if any) as soon as it is
+    read, only the last lines are kept in memory. The sink is shared by the processes
+    of the project running concurrently, each line is prefixed by its source.
+    """
+
+    def __init__(
+        self,
+        log_file: Optional[BinaryIO] = None,
+        console: Optional[TextIO] = None,
+        console_prefix: str = "",
+        max_lines: int = RING_BUFFER_LINES,
+    ) -> None:
+        self.log_file = log_file
+        self.console = console
+        self.console_prefix = console_prefix
+        self.lines: Deque[Tuple[str, bytes]] = collections.deque(maxlen=max_lines)
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+    def write_line(self, line: bytes, source: str = "") -> None:
+        """Write an output line
+
+        Args:
+            line (bytes): output line, including its newline
+            source (str): name of the process which printed the line
+        """
+        if not line.endswith(b"\n"):
+            line += b"\n"
+        with self.lock:
+            self.lines.append((source, line))
+            if self.log_file is not None:
+                if source:
+                    self.log_file.write("[{source}] ".format(source=source).encode())
+                self.log_file.write(line)
+                now = time.monotonic()
+                if now - self.last_flush > FLUSH_INTERVAL:
+                    self.log_file.flush()
+                    self.last_flush = now
+            if self.console is not None:
+                self.console.write(
+                    "[{prefix}] {line}".format(
+                        prefix=" ".join(
+                            name for name in [self.console_prefix, source] if name
+                        ),
+                        line=line.decode("utf-8", errors="replace"),
+                    )
+                )
+                self.console.flush()
+
+    def tail(self, source: Optional[str] = None) -> str:
+        """Get the last lines kept in memory
+
+        Args:
+            source (Optional[str]): only keep the lines of this source, all the lines
+                if not specified
+
+        Returns:
+            str: decoded lines
+        """
+        with self.lock:
+            lines = [
+                line
+                for line_source, line in self.lines
+                if source is None or line_source == source
+            ]
+        return b"".join(lines).decode("utf-8", errors="replace")
+
+
+def pump_lines(pipe: IO[bytes], sink: OutputSink, source: str = "") -> None:
+    """Forward the lines of a pipe to a sink until the pipe is closed
+
+    Args:
+        pipe (IO[bytes]): readable end of the pipe
+        sink (OutputSink): sink receiving the lines
+        source (str): name of the process writing to the pipe
+    """
+    with pipe:
+        for line in iter(lambda: pipe.readline(MAX_LINE_BYTES), b""):
+            sink.write_line(line=line, source=source)
+
+
+def terminate_process_group(pid: int, sig: int = signal.SIGTERM) -> None:
+    """Terminate a process started in its own session and all its children
+
+    Args:
+        pid (int): id of a process started with start_new_session, also the id of
+            its process group
+        sig (int): signal sent to the process group
+    """
+    try:
+        os.killpg(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def run_process(
+    args: List[str],
+    sink: OutputSink,
+    source: str = "",
+    cwd: Optional[pathlib.Path] = None,
+) -> int:
+    """Run a process, streaming its stdout and stderr line by line to a sink
+
+    The process is started in its own session, so that it can be terminated with
+    all the processes it has spawned.
+
+    Args:
+        args (List[str]): command line
+        sink (OutputSink): sink receiving the output lines
+        source (str): name of the process prefixing its lines
+        cwd (Optional[pathlib.Path]): working directory of the process
+
+    Returns:
+        int: return code of the process
+    """
+    p = subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=None if cwd is None else str(cwd),
+        start_new_session=True,
+    )
+    pumps = [
+        threading.Thread(target=pump_lines, args=(pipe, sink, source), daemon=True)
+        for pipe in [p.stdout, p.stderr]
+    ]
+    for pump in pumps:
+        pump.start()
+    try:
+        p.wait()
+    except BaseException:
+        terminate_process_group(pid=p.pid)
+        p.wait()
+        raise
+    finally:
+        for pump in pumps:
+            pump.join()
+    return p.returncode
+
+
+async def pump_stream(
+    reader: asyncio.StreamReader, sink: OutputSink, source: str = ""
+) -> None:
+    """Forward the lines of a stream to a sink until the end of the stream
+
+    Args:
+        reader (asyncio.StreamReader): stream of the process output, its limit is
+            the maximum line length
+        sink (OutputSink): sink receiving the lines
+        source (str): name of the process writing to the stream
+    """
+    while True:
+        try:
+            line = await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            line = e.partial
+        except asyncio.LimitOverrunError:
+            line = await reader.read(MAX_LINE_BYTES)
+        if not line:
+            break
+        sink.write_line(line=line, source=source)
+
+
+def get_returncode(status: int) -> int:
+    """Convert a wait status into a return code
+
+    Args:
+        status (int): status returned by os.wait4
+
+    Returns:
+        int: exit code of the process, or the negative number of the signal which
+        killed it (as subprocess)
+    """
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def wait_child(pid: int) -> "asyncio.Future[Tuple[int, resource.struct_rusage]]":
+    """Reap a child process from a dedicated thread
+
+    Unlike the asyncio child watchers, os.wait4 reports the resource usage of the
+    child itself (and of its waited descendants), not of every child of the process.
+
+    Args:
+        pid (int): child process id
+
+    Returns:
+        asyncio.Future[Tuple[int, resource.struct_rusage]]: return code and resource
+        usage of the child once it exited
+    """
+    loop = asyncio.get_event_loop()
+    future: "asyncio.Future[Tuple[int, resource.struct_rusage]]" = loop.create_future()
+
+    def set_result(result: Tuple[int, resource.struct_rusage]) -> None:
+        if not future.done():
+            future.set_result(result)
+
+    def wait() -> None:
+        _, status, usage = os.wait4(pid, 0)
+        loop.call_soon_threadsafe(set_result, (get_returncode(status=status), usage))
+
+    threading.Thread(target=wait, daemon=True).start()
+    return future
+
+
+async def open_reader(
+    pipe: IO[bytes],
+) -> Tuple[asyncio.StreamReader, asyncio.BaseTransport]:
+    """Read a pipe from the event loop
+
+    Args:
+        pipe (IO[bytes]): readable end of the pipe, closed at the end of the stream
+
+    Returns:
+        Tuple[asyncio.StreamReader, asyncio.BaseTransport]:
+        - stream of the pipe, its limit is the maximum line length
+        - transport of the pipe, closing it ends the stream
+    """
+    reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+    transport, _ = await asyncio.get_event_loop().connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), pipe
+    )
+    return reader, transport
+
+
+async def drain_pumps(
+    pumps: "asyncio.Future[Any]",
+    transports: List[asyncio.BaseTransport],
+    source: str = "",
+) -> None:
+    """Wait for the end of the output of an exited process, at most DRAIN_TIMEOUT
+
+    A descendant which inherited the pipes and escaped the process group (such as a
+    daemon calling setsid) keeps them open after the process exited, its output is
+    then no longer read.
+
+    Args:
+        pumps (asyncio.Future[Any]): forwarding of the pipes, see pump_stream
+        transports (List[asyncio.BaseTransport]): transports of the pipes
+        source (str): name of the process
+    """
+    try:
+        await asyncio.wait_for(asyncio.shield(pumps), timeout=DRAIN_TIMEOUT)
+        return
+    except asyncio.TimeoutError:
+        logging.warning(
+            "The output of {source} is still open after it exited, held by a process it"
+            " spawned, no longer reading it".format(source=source or "the process")
+        )
+    for transport in transports:
+        transport.close()
+    pumps.cancel()
+    await asyncio.gather(pumps, return_exceptions=True)
+
+
+async def stop_process(
+    pid: int, exited: "asyncio.Future[Tuple[int, resource.struct_rusage]]"
+) -> None:
+    """Terminate the process group of a process, then kill it if still running after
+    KILL_GRACE_PERIOD
+
+    Args:
+        pid (int): id of a process started with start_new_session
+        exited (asyncio.Future[Tuple[int, resource.struct_rusage]]): reaping of the
+            process, see wait_child
+    """
+    terminate_process_group(pid=pid)
+    try:
+        await asyncio.wait_for(asyncio.shield(exited), timeout=KILL_GRACE_PERIOD)
+    except asyncio.TimeoutError:
+        terminate_process_group(pid=pid, sig=signal.SIGKILL)
+        await exited
+
+
+async def run_process_async(
+    args: List[str],
+    sink: OutputSink,
+    source: str = "",
+    cwd: Optional[pathlib.Path] = None,
+    timeout: Optional[float] = None,
+    usage: Optional[instrumentation.PhaseUsage] = None,
+) -> int:
+    """Run a process from the event loop, streaming its stdout and stderr line by
+    line to a sink
+
+    The process is started in its own session. If the timeout expires or the task
+    is cancelled, the process is stopped with all the processes it has spawned. Once
+    it exited, its output is read for at most DRAIN_TIMEOUT, see drain_pumps.
+
+    Args:
+        args (List[str]): command line
+        sink (OutputSink): sink receiving the output lines
+        source (str): name of the process prefixing its lines
+        cwd (Optional[pathlib.Path]): working directory of the process
+        timeout (Optional[float]): maximum duration of the process in seconds, no
+            limit if not specified
+        usage (Optional[instrumentation.PhaseUsage]): receives the resource usage of
+            the process once it exited, even if stopped
+
+    Raises:
+        asyncio.TimeoutError: the process has been stopped after the timeout
+
+    Returns:
+        int: return code of the process
+    """
+    p = subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=None if cwd is None else str(cwd),
+        start_new_session=True,
+    )
+    # Reaped by wait_child instead of subprocess
+    exited = wait_child(pid=p.pid)
+    pumps = None
+    transports: List[asyncio.BaseTransport] = []
+    try:
+        assert p.stdout is not None and p.stderr is not None
+        readers = []
+        for pipe in [p.stdout, p.stderr]:
+            reader, transport = await open_reader(pipe=pipe)
+            readers.append(reader)
+            transports.append(transport)
+        pumps = asyncio.gather(
+            *[
+                pump_stream(reader=reader, sink=sink, source=source)
+                for reader in readers
+            ]
+        )
+        returncode, _ = await asyncio.wait_for(asyncio.shield(exited), timeout=timeout)
+    except BaseException:
+        await asyncio.shield(stop_process(pid=p.pid, exited=exited))
+        raise
+    finally:
+        if pumps is not None:
+            await drain_pumps(pumps=pumps, transports=transports, source=source)
+        if exited.done():
+            p.returncode, child_usage = exited.result()
+            if usage is not None:
+                usage.add_child(usage=child_usage)
+    return returncode
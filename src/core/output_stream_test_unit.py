@@ -0,0 +1,155 @@
+import asyncio
+import io
+import pathlib
+import shutil
+import sys
+import time
+
+import pytest
+
+from . import instrumentation
+from . import output_stream as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "output_stream_test_assets"
+)
+
+
+def test_output_sink() -> None:
+    log_file = io.BytesIO()
+    console = io.StringIO()
+    sink = test_module.OutputSink(
+        log_file=log_file, console=console, console_prefix="testing", max_lines=2
+    )
+    sink.write_line(line=b"Installing\n", source="install")
+    sink.write_line(line=b"Linting\n", source="lint")
+    sink.write_line(line=b"Testing", source="test")
+    # Only the last lines are kept in memory
+    assert sink.tail() == "Linting\nTesting\n"
+    assert sink.tail(source="test") == "Testing\n"
+    assert log_file.getvalue() == (
+        b"[install] Installing\n[lint] Linting\n[test] Testing\n"
+    )
+    assert console.getvalue().splitlines()[0] == "[testing install] Installing"
+
+
+def test_run_process() -> None:
+    log_dir = TEST_ASSETS_DIR.joinpath("logs_cached")
+    if log_dir.is_dir():
+        shutil.rmtree(log_dir)
+    log_dir.mkdir(parents=True)
+    with open(log_dir.joinpath("test.log"), "wb") as log_file:
+        sink = test_module.OutputSink(log_file=log_file)
+        returncode = test_module.run_process(
+            args=[
+                sys.executable,
+                "-c",
+                "import sys; print('out'); print('x' * 100000);"
+                " print('err', file=sys.stderr); sys.exit(3)",
+            ],
+            sink=sink,
+            source="test",
+        )
+    assert returncode == 3
+    with open(log_dir.joinpath("test.log"), "rb") as f:
+        lines = f.read().splitlines()
+    assert lines[0] == b"[test] out"
+    assert b"[test] err" in lines
+    # The long line is split in chunks of MAX_LINE_BYTES
+    assert max(len(line) for line in lines) <= test_module.MAX_LINE_BYTES + 8
+    shutil.rmtree(log_dir)
+
+
+def test_run_process_async() -> None:
+    sink = test_module.OutputSink()
+    returncode = asyncio.run(
+        test_module.run_process_async(
+            args=[
+                sys.executable,
+                "-c",
+                "import sys; print('x' * 100000); print('err', file=sys.stderr)",
+            ],
+            sink=sink,
+            source="test",
+        )
+    )
+    assert returncode == 0
+    lines = sink.tail(source="test").splitlines()
+    assert "err" in lines
+    assert max(len(line) for line in lines) <= test_module.MAX_LINE_BYTES
+
+
+def test_run_process_async_escaped_descendant() -> None:
+    # The descendant keeps the pipes open after the process exited
+    sink = test_module.OutputSink()
+    start = time.monotonic()
+    returncode = asyncio.run(
+        test_module.run_process_async(
+            args=["sh", "-c", "setsid sleep 10 & echo started"], sink=sink
+        )
+    )
+    assert returncode == 0
+    assert time.monotonic() - start < 5
+    assert sink.tail() == "started\n"
+
+
+def test_run_process_async_usage() -> None:
+    # Each process reports its own peak, not the high-water mark of the runner
+    usages = [instrumentation.PhaseUsage(), instrumentation.PhaseUsage()]
+    for code, usage in zip(["b = bytearray(256 * 1024 * 1024)", "pass"], usages):
+        returncode = asyncio.run(
+            test_module.run_process_async(
+                args=[sys.executable, "-c", code],
+                sink=test_module.OutputSink(),
+                usage=usage,
+            )
+        )
+        assert returncode == 0
+    assert usages[0].peak_rss_kb is not None and usages[1].peak_rss_kb is not None
+    assert usages[0].peak_rss_kb > 200 * 1024 > usages[1].peak_rss_kb
+
+    # The CPU time of a process does not include the concurrent processes
+    async def run_concurrently() -> None:
+        await asyncio.gather(
+            *[
+                test_module.run_process_async(
+                    args=[sys.executable, "-c", code],
+                    sink=test_module.OutputSink(),
+                    usage=usage,
+                )
+                for code, usage in zip(
+                    [
+                        "import time; time.sleep(1)",
+                        "import time\nstart = time.time()\n"
+                        "while time.time() - start < 1: pass",
+                    ],
+                    usages,
+                )
+            ]
+        )
+
+    usages = [instrumentation.PhaseUsage(), instrumentation.PhaseUsage()]
+    asyncio.run(run_concurrently())
+    assert usages[0].cpu_time is not None and usages[1].cpu_time is not None
+    assert usages[0].cpu_time < 0.5 < usages[1].cpu_time
+
+    # Killed by a signal
+    assert (
+        asyncio.run(
+            test_module.run_process_async(
+                args=["sh", "-c", "kill -9 $$"], sink=test_module.OutputSink()
+            )
+        )
+        == -9
+    )
+
+
+def test_run_process_async_timeout() -> None:
+    start = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(
+            test_module.run_process_async(
+                args=["sleep", "30"], sink=test_module.OutputSink(), timeout=0.2
+            )
+        )
+    assert time.monotonic() - start < 10
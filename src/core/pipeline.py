@@ -0,0 +1,179 @@
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from src.core import resource_limits
+
+# Make-target building the environment of a project, see env_cache
+INSTALL_STAGE = "install"
+
+
+class Stage(NamedTuple):
+    name: str
+    needs: Tuple[str, ...] = ()
+    limits: resource_limits.ResourceLimits = resource_limits.ResourceLimits()
+
+
+# Sequential as make install lint check test: lint may rewrite the sources (such as
+# isort and black) checked by check and tested by test, concurrent stages are opt-in
+DEFAULT_STAGES = [
+    Stage(name="install"),
+    Stage(name="lint", needs=("install",)),
+    Stage(name="check", needs=("lint",)),
+    Stage(name="test", needs=("check",)),
+]
+
+
+def parse_stage(spec: str) -> Stage:
+    """Parse a stage specification such as test, test:install,lint or
+    test:install@timeout=1800,memory=4G
+
+    Args:
+        spec (str): make-target, optionally followed by a colon and the comma
+            separated stages it needs, then by an at sign and its resource limits
+            (see resource_limits.parse_limits)
+
+    Raises:
+        ValueError: the make-target is empty or invalid resource limits
+
+    Returns:
+        Stage: the parsed stage
+    """
+    spec, _, limits = spec.partition("@")
+    name, _, needs = spec.partition(":")
+    name = name.strip()
+    if not name:
+        raise ValueError("Invalid stage: {spec}".format(spec=spec))
+    return Stage(
+        name=name,
+        needs=tuple(need.strip() for need in needs.split(",") if need.strip()),
+        limits=resource_limits.parse_limits(spec=limits),
+    )
+
+
+def sort_stages(stages: List[Stage]) -> List[Stage]:
+    """Sort the stages so that each stage comes after the stages it needs, the given
+    order is kept between independent stages
+
+    Args:
+        stages (List[Stage]): stages to be sorted
+
+    Raises:
+        ValueError: duplicated stage, unknown needed stage or dependency cycle
+
+    Returns:
+        List[Stage]: sorted stages
+    """
+    names = [stage.name for stage in stages]
+    for stage in stages:
+        if names.count(stage.name) > 1:
+            raise ValueError("Duplicated stage: {name}".format(name=stage.name))
+        for need in stage.needs:
+            if need not in names:
+                raise ValueError(
+                    "Unknown stage {need} needed by {name}".format(
+                        need=need, name=stage.name
+                    )
+                )
+    sorted_stages: List[Stage] = []
+    done: Set[str] = set()
+    remaining = list(stages)
+    while remaining:
+        ready = [
+            stage for stage in remaining if all(need in done for need in stage.needs)
+        ]
+        if not ready:
+            raise ValueError(
+                "Cyclic stage dependencies: {names}".format(
+                    names=", ".join(stage.name for stage in remaining)
+                )
+            )
+        sorted_stages.extend(ready)
+        done.update(stage.name for stage in ready)
+        remaining = [stage for stage in remaining if stage.name not in done]
+    return sorted_stages
+
+
+def remove_stages(stages: List[Stage], names: List[str]) -> List[Stage]:
+    """Remove stages which are already satisfied, such as an install stage whose
+    result is still valid
+
+    Args:
+        stages (List[Stage]): stages
+        names (List[str]): names of the stages to be removed, they are also removed
+            from the needs of the remaining stages
+
+    Returns:
+        List[Stage]: remaining stages
+    """
+    return [
+        stage._replace(needs=tuple(need for need in stage.needs if need not in names))
+        for stage in stages
+        if stage.name not in names
+    ]
+
+
+async def run_stages(
+    stages: List[Stage],
+    run_stage: Callable[[Stage], Awaitable[None]],
+    workers: Optional[int] = None,
+) -> None:
+    """Run each stage as an asyncio task as soon as the stages it needs have succeeded
+
+    The pipeline fails fast: after the first failure no stage is started anymore and
+    the running stages are cancelled. The first error is raised once the running
+    stages have returned. If the pipeline itself is cancelled, so are its stages.
+
+    Args:
+        stages (List[Stage]): stages to be run
+        run_stage (Callable[[Stage], Awaitable[None]]): runs a stage, raises if the
+            stage fails
+        workers (Optional[int]): maximum number of concurrent stages, no limit if not
+            specified, the stages are run one by one if 1
+
+    Raises:
+        ValueError: invalid stages or number of workers
+    """
+    # Imported on first use, parsing the stages of the command line does not need it
+    import asyncio
+
+    pending = sort_stages(stages=stages)
+    if workers is None:
+        workers = max(1, len(pending))
+    if workers < 1:
+        raise ValueError("Invalid number of workers: {workers}".format(workers=workers))
+    done: Set[str] = set()
+    error: Optional[BaseException] = None
+    running: Dict["asyncio.Future[None]", Stage] = {}
+    try:
+        while pending or running:
+            if error is None:
+                ready = [
+                    stage
+                    for stage in pending
+                    if all(need in done for need in stage.needs)
+                ]
+                for stage in ready[: workers - len(running)]:
+                    pending.remove(stage)
+                    running[asyncio.ensure_future(run_stage(stage))] = stage
+            if not running:
+                break
+            finished, _ = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in finished:
+                stage = running.pop(task)
+                if task.cancelled():
+                    continue
+                stage_error = task.exception()
+                if stage_error is None:
+                    done.add(stage.name)
+                elif error is None:
+                    error = stage_error
+                    for other_task in running:
+                        other_task.cancel()
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    if error is not None:
+        raise error
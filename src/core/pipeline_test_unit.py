@@ -0,0 +1,124 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from . import pipeline as test_module
+
+CONCURRENT_STAGES = [
+    test_module.Stage(name="install"),
+    test_module.Stage(name="lint", needs=("install",)),
+    test_module.Stage(name="check", needs=("install",)),
+    test_module.Stage(name="test", needs=("install",)),
+]
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("install", test_module.Stage(name="install")),
+        ("test:install", test_module.Stage(name="test", needs=("install",))),
+        (
+            "test:install, lint",
+            test_module.Stage(name="test", needs=("install", "lint")),
+        ),
+    ],
+)
+def test_parse_stage(spec: str, expected: test_module.Stage) -> None:
+    assert test_module.parse_stage(spec=spec) == expected
+    with pytest.raises(ValueError):
+        test_module.parse_stage(spec=":install")
+
+
+def test_sort_stages() -> None:
+    stages = [
+        test_module.Stage(name="test", needs=("lint",)),
+        test_module.Stage(name="lint", needs=("install",)),
+        test_module.Stage(name="check", needs=("install",)),
+        test_module.Stage(name="install"),
+    ]
+    assert [stage.name for stage in test_module.sort_stages(stages=stages)] == [
+        "install",
+        "lint",
+        "check",
+        "test",
+    ]
+    for invalid_stages in [
+        [test_module.Stage(name="install"), test_module.Stage(name="install")],
+        [test_module.Stage(name="test", needs=("install",))],
+        [
+            test_module.Stage(name="lint", needs=("test",)),
+            test_module.Stage(name="test", needs=("lint",)),
+        ],
+    ]:
+        with pytest.raises(ValueError):
+            test_module.sort_stages(stages=invalid_stages)
+
+
+def test_remove_stages() -> None:
+    assert test_module.remove_stages(
+        stages=test_module.DEFAULT_STAGES, names=["install"]
+    ) == [
+        test_module.Stage(name="lint"),
+        test_module.Stage(name="check", needs=("lint",)),
+        test_module.Stage(name="test", needs=("check",)),
+    ]
+
+
+def test_run_stages_normal_case() -> None:
+    started: List[str] = []
+    running: List[str] = []
+    max_running = [0]
+
+    async def run_stage(stage: test_module.Stage) -> None:
+        started.append(stage.name)
+        running.append(stage.name)
+        max_running[0] = max(max_running[0], len(running))
+        await asyncio.sleep(0.05)
+        running.remove(stage.name)
+
+    asyncio.run(test_module.run_stages(stages=CONCURRENT_STAGES, run_stage=run_stage))
+    assert started[0] == "install"
+    assert sorted(started[1:]) == ["check", "lint", "test"]
+    assert max_running[0] == 3
+
+    started.clear()
+    max_running[0] = 0
+    asyncio.run(
+        test_module.run_stages(stages=CONCURRENT_STAGES, run_stage=run_stage, workers=1)
+    )
+    assert started == ["install", "lint", "check", "test"]
+    assert max_running[0] == 1
+
+    # The default stages run one after the other
+    started.clear()
+    max_running[0] = 0
+    asyncio.run(
+        test_module.run_stages(stages=test_module.DEFAULT_STAGES, run_stage=run_stage)
+    )
+    assert started == ["install", "lint", "check", "test"]
+    assert max_running[0] == 1
+
+
+def test_run_stages_fail_fast() -> None:
+    started: List[str] = []
+    cancelled: List[str] = []
+    stages = CONCURRENT_STAGES + [
+        test_module.Stage(name="build", needs=("lint", "check", "test"))
+    ]
+
+    async def run_stage(stage: test_module.Stage) -> None:
+        started.append(stage.name)
+        if stage.name == "check":
+            raise RuntimeError("check failed")
+        if stage.name == "test":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(stage.name)
+                raise
+
+    with pytest.raises(RuntimeError, match="check failed"):
+        asyncio.run(test_module.run_stages(stages=stages, run_stage=run_stage))
+    assert "build" not in started
+    assert cancelled == ["test"]
@@ -0,0 +1,173 @@
+import resource
+import signal
+from typing import List, NamedTuple, Optional
+
+from src.core import defaults
+
+FAILURE_KINDS = ["failed", "timeout", "cpu-limit", "memory-limit"]
+# Printed by make (strsignal) when a command is killed by SIGXCPU
+CPU_LIMIT_MARKERS = ["CPU time limit exceeded"]
+# Printed by the usual runtimes when an allocation fails because of RLIMIT_AS
+MEMORY_LIMIT_MARKERS = [
+    "MemoryError",
+    "Cannot allocate memory",
+    "std::bad_alloc",
+    "out of memory",
+]
+
+
+class ResourceLimits(NamedTuple):
+    timeout: Optional[float] = None
+    cpu_time: Optional[int] = None
+    memory: Optional[int] = None
+
+
+def parse_limits(spec: str) -> ResourceLimits:
+    """Parse resource limits such as timeout=600,cpu=300,memory=2G
+
+    Args:
+        spec (str): comma separated limits, timeout and cpu are in seconds
+
+    Raises:
+        ValueError: unknown or invalid limit
+
+    Returns:
+        ResourceLimits: the parsed limits, the missing ones are not limited
+    """
+    limits = ResourceLimits()
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if name == "timeout":
+            limits = limits._replace(timeout=float(value))
+        elif name == "cpu":
+            limits = limits._replace(cpu_time=int(value))
+        elif name == "memory":
+            limits = limits._replace(memory=defaults.parse_size(value=value))
+        else:
+            raise ValueError("Unknown resource limit: {name}".format(name=name))
+    return limits
+
+
+def merge_limits(limits: ResourceLimits, defaults: ResourceLimits) -> ResourceLimits:
+    """Complete the limits with the defaults
+
+    Args:
+        limits (ResourceLimits): specific limits, such as the limits of a stage
+        defaults (ResourceLimits): limits used when not specified
+
+    Returns:
+        ResourceLimits: merged limits
+    """
+    return ResourceLimits(
+        timeout=limits.timeout if limits.timeout is not None else defaults.timeout,
+        cpu_time=limits.cpu_time if limits.cpu_time is not None else defaults.cpu_time,
+        memory=limits.memory if limits.memory is not None else defaults.memory,
+    )
+
+
+def clamp_rlimit(kind: int, value: int) -> int:
+    """Clamp a resource limit to the hard limit of the current process, inherited by
+    its children
+
+    Args:
+        kind (int): resource such as resource.RLIMIT_CPU
+        value (int): requested limit
+
+    Returns:
+        int: the requested limit, never above the current hard limit
+    """
+    _, current_hard = resource.getrlimit(kind)
+    if current_hard != resource.RLIM_INFINITY:
+        return min(value, current_hard)
+    return value
+
+
+def limit_command(args: List[str], limits: ResourceLimits) -> List[str]:
+    """Wrap a command so that it runs with the CPU and memory limits, inherited by
+    its children (each process has its own budget)
+
+    The limits are set by ulimit in a shell which then execs the command, so no
+    Python code runs in the child between fork and exec (preexec_fn is not safe
+    when the parent has threads). The CPU limit sends SIGXCPU, then SIGKILL one
+    second later. The memory limit bounds the address space, the allocations beyond
+    fail.
+
+    Args:
+        args (List[str]): command to be run
+        limits (ResourceLimits): limits to be applied
+
+    Returns:
+        List[str]: the wrapped command, args if neither CPU nor memory is limited
+    """
+    commands = []
+    if limits.cpu_time is not None:
+        # The soft limit first, the hard limit cannot be set below it
+        commands.append(
+            "ulimit -S -t {soft}".format(
+                soft=clamp_rlimit(resource.RLIMIT_CPU, limits.cpu_time)
+            )
+        )
+        commands.append(
+            "ulimit -H -t {hard}".format(
+                hard=clamp_rlimit(resource.RLIMIT_CPU, limits.cpu_time + 1)
+            )
+        )
+    if limits.memory is not None:
+        commands.append(
+            "ulimit -v {size}".format(
+                size=clamp_rlimit(resource.RLIMIT_AS, limits.memory) // 1024
+            )
+        )
+    if not commands:
+        return args
+    return ["sh", "-c", " && ".join(commands + ['exec "$@"']), "sh"] + args
+
+
+def classify_failure(returncode: int, limits: ResourceLimits) -> str:
+    """Get the kind of failure of a process which has not timed out, from its exit
+    status
+
+    Args:
+        returncode (int): return code of the process, negative for a signal
+        limits (ResourceLimits): limits applied to the process
+
+    Returns:
+        str: cpu-limit if the process was killed by the CPU limit (SIGXCPU at the
+        soft limit, SIGKILL at the hard limit), failed otherwise
+    """
+    if limits.cpu_time is not None and returncode in [
+        -signal.SIGXCPU,
+        -signal.SIGKILL,
+    ]:
+        return "cpu-limit"
+    return "failed"
+
+
+def guess_failure(output: str, limits: ResourceLimits) -> Optional[str]:
+    """Guess the kind of failure of a process from its output, a heuristic for the
+    failures the exit status does not tell
+
+    make exits with 2 whatever the failure of its command, and an allocation failing
+    beyond the memory limit is reported by the runtime (such as MemoryError, exiting
+    with 1), so they are recognized from the messages printed by make and the usual
+    runtimes, only for the limits applied.
+
+    Args:
+        output (str): last output lines of the process
+        limits (ResourceLimits): limits applied to the process
+
+    Returns:
+        Optional[str]: cpu-limit or memory-limit, None if no message matches
+    """
+    if limits.cpu_time is not None and any(
+        marker in output for marker in CPU_LIMIT_MARKERS
+    ):
+        return "cpu-limit"
+    if limits.memory is not None and any(
+        marker in output for marker in MEMORY_LIMIT_MARKERS
+    ):
+        return "memory-limit"
+    return None
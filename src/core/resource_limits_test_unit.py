@@ -0,0 +1,85 @@
+import signal
+import subprocess
+import sys
+
+import pytest
+
+from . import resource_limits as test_module
+
+
+def test_parse_limits() -> None:
+    assert test_module.parse_limits(spec="") == test_module.ResourceLimits()
+    assert test_module.parse_limits(
+        spec="timeout=1.5,cpu=10,memory=1K"
+    ) == test_module.ResourceLimits(timeout=1.5, cpu_time=10, memory=1024)
+    for spec in ["disk=1G", "memory=lots"]:
+        with pytest.raises(ValueError):
+            test_module.parse_limits(spec=spec)
+
+
+def test_merge_limits() -> None:
+    assert test_module.merge_limits(
+        limits=test_module.ResourceLimits(timeout=1),
+        defaults=test_module.ResourceLimits(timeout=2, memory=3),
+    ) == test_module.ResourceLimits(timeout=1, memory=3)
+
+
+def test_limit_command() -> None:
+    limits = test_module.ResourceLimits(cpu_time=1, memory=256 * 1024**2)
+    p = subprocess.run(
+        test_module.limit_command(
+            args=[sys.executable, "-c", "while True: pass"], limits=limits
+        )
+    )
+    assert p.returncode in [-signal.SIGXCPU, -signal.SIGKILL]
+    assert (
+        test_module.classify_failure(returncode=p.returncode, limits=limits)
+        == "cpu-limit"
+    )
+    p = subprocess.run(
+        test_module.limit_command(
+            args=[sys.executable, "-c", "data = bytearray(1 << 30)"], limits=limits
+        ),
+        stderr=subprocess.PIPE,
+    )
+    assert p.returncode == 1
+    assert test_module.classify_failure(returncode=p.returncode, limits=limits) == (
+        "failed"
+    )
+    assert test_module.guess_failure(output=p.stderr.decode(), limits=limits) == (
+        "memory-limit"
+    )
+    args = ["make", "test"]
+    assert (
+        test_module.limit_command(args=args, limits=test_module.ResourceLimits())
+        == args
+    )
+
+
+def test_classify_failure() -> None:
+    limits = test_module.ResourceLimits(cpu_time=1)
+    for returncode in [-signal.SIGXCPU, -signal.SIGKILL]:
+        assert (
+            test_module.classify_failure(returncode=returncode, limits=limits)
+            == "cpu-limit"
+        )
+    assert (
+        test_module.classify_failure(
+            returncode=-signal.SIGKILL, limits=test_module.ResourceLimits()
+        )
+        == "failed"
+    )
+    assert test_module.classify_failure(returncode=2, limits=limits) == "failed"
+
+
+def test_guess_failure() -> None:
+    limits = test_module.ResourceLimits(cpu_time=1)
+    assert (
+        test_module.guess_failure(
+            output="make: *** [Makefile:2: test] CPU time limit exceeded",
+            limits=limits,
+        )
+        == "cpu-limit"
+    )
+    # The memory markers are ignored when the memory is not limited
+    assert test_module.guess_failure(output="MemoryError", limits=limits) is None
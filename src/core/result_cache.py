@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import pathlib
+import time
+from typing import Any, Dict, List, Optional
+
+from src.core import cache_manifest
+
+
+def compute_result_key(
+    manifest: cache_manifest.Manifest,
+    extra_context: Dict[str, str],
+    make_targets: List[str],
+) -> str:
+    """Compute the key of a run from everything its result depends on
+
+    Args:
+        manifest (cache_manifest.Manifest): manifest of the isolated template, its
+            content hashes identify the template files (including cookiecutter.json)
+        extra_context (Dict[str, str]): values overriding the defaults of
+            cookiecutter.json
+        make_targets (List[str]): make-targets run in the generated projects
+
+    Returns:
+        str: sha256 of the template contents, the context and the make-targets
+    """
+    data = {
+        "files": {rel_path: entry.sha256 for rel_path, entry in manifest.files.items()},
+        "extra_context": extra_context,
+        "make_targets": make_targets,
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_result(cache_dir: pathlib.Path, key: str) -> Optional[Dict[str, Any]]:
+    """Load the result stored for a key
+
+    Args:
+        cache_dir (pathlib.Path): result cache directory path
+        key (str): key of the run, see compute_result_key
+
+    Returns:
+        Optional[Dict[str, Any]]: the stored result, None if missing or unreadable
+    """
+    result_path = cache_dir.joinpath("{key}.json".format(key=key))
+    if not result_path.is_file():
+        return None
+    try:
+        with open(result_path, "r") as f:
+            result: Dict[str, Any] = json.load(f)
+    except ValueError:
+        return None
+    return result
+
+
+def store_result(
+    cache_dir: pathlib.Path, key: str, projects: List[str], success: bool
+) -> None:
+    """Atomically store the result of a run
+
+    Args:
+        cache_dir (pathlib.Path): result cache directory path
+        key (str): key of the run, see compute_result_key
+        projects (List[str]): names of the generated projects
+        success (bool): whether all the projects have been installed and tested
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    result_path = cache_dir.joinpath("{key}.json".format(key=key))
+    tmp_path = cache_dir.joinpath("{key}.{pid}.tmp".format(key=key, pid=os.getpid()))
+    with open(tmp_path, "w") as f:
+        json.dump(
+            {
+                "key": key,
+                "projects": projects,
+                "success": success,
+                "finished_at": time.time(),
+            },
+            f,
+            indent=2,
+        )
+    os.replace(tmp_path, result_path)
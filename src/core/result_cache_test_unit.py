@@ -0,0 +1,77 @@
+import pathlib
+import shutil
+
+from . import cache_manifest
+from . import result_cache as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "result_cache_test_assets"
+)
+
+MANIFEST = cache_manifest.Manifest(
+    template_dir="template",
+    files={
+        "cookiecutter.json": cache_manifest.ManifestEntry(
+            size=1, mtime_ns=1, sha256="a"
+        ),
+        "{{cookiecutter.var_name}}/Makefile": cache_manifest.ManifestEntry(
+            size=1, mtime_ns=1, sha256="b"
+        ),
+    },
+)
+
+
+def test_compute_result_key() -> None:
+    key = test_module.compute_result_key(
+        manifest=MANIFEST, extra_context={}, make_targets=["install", "test"]
+    )
+    # The modification times and the template location are not part of the key
+    moved_manifest = cache_manifest.Manifest(
+        template_dir="moved",
+        files={
+            rel_path: entry._replace(mtime_ns=2)
+            for rel_path, entry in MANIFEST.files.items()
+        },
+    )
+    assert key == test_module.compute_result_key(
+        manifest=moved_manifest, extra_context={}, make_targets=["install", "test"]
+    )
+    changed_files = dict(MANIFEST.files)
+    changed_files["cookiecutter.json"] = changed_files["cookiecutter.json"]._replace(
+        sha256="c"
+    )
+    changed_manifest = cache_manifest.Manifest(
+        template_dir="template", files=changed_files
+    )
+    for other_key in [
+        test_module.compute_result_key(
+            manifest=changed_manifest,
+            extra_context={},
+            make_targets=["install", "test"],
+        ),
+        test_module.compute_result_key(
+            manifest=MANIFEST,
+            extra_context={"python_version": "3.8"},
+            make_targets=["install", "test"],
+        ),
+        test_module.compute_result_key(
+            manifest=MANIFEST, extra_context={}, make_targets=["install"]
+        ),
+    ]:
+        assert key != other_key
+
+
+def test_store_and_load_result() -> None:
+    cache_dir = TEST_ASSETS_DIR.joinpath("results_cached")
+    if cache_dir.is_dir():
+        shutil.rmtree(cache_dir)
+    assert test_module.load_result(cache_dir=cache_dir, key="key") is None
+    test_module.store_result(
+        cache_dir=cache_dir, key="key", projects=["testing"], success=True
+    )
+    result = test_module.load_result(cache_dir=cache_dir, key="key")
+    assert result is not None
+    assert result["success"] is True
+    assert result["projects"] == ["testing"]
+    assert [f_path.name for f_path in cache_dir.glob("*")] == ["key.json"]
+    shutil.rmtree(cache_dir)
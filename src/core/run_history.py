@@ -0,0 +1,164 @@
+import json
+import os
+import pathlib
+import time
+from typing import Dict, List, NamedTuple
+
+from src.core import install_pool
+
+HISTORY_VERSION = 1
+
+
+class ProjectHistory(NamedTuple):
+    success: bool
+    failure_kind: str
+    finished_at: float
+    # Wall time of the project and of each of its make-targets, in seconds
+    wall_time: float
+    stages: Dict[str, float]
+
+
+def get_project_key(project_dir: pathlib.Path, output_dir: pathlib.Path) -> str:
+    """Get the key of a project in the history
+
+    Args:
+        project_dir (pathlib.Path): project directory path
+        output_dir (pathlib.Path): output directory path containing the project
+
+    Returns:
+        str: path of the project relative to output_dir, such as testing or
+        0_python-3.8/testing with a matrix
+    """
+    return project_dir.absolute().relative_to(output_dir.absolute()).as_posix()
+
+
+def is_sub_key(key: str, parent: str) -> bool:
+    """Check whether a project is under a directory, such as a generation
+
+    Args:
+        key (str): key of the project, see get_project_key
+        parent (str): key of the directory
+
+    Returns:
+        bool: whether the project is the directory or is under it
+    """
+    return parent == "." or key == parent or key.startswith(parent + "/")
+
+
+def get_sub_history(
+    history: Dict[str, ProjectHistory], key: str
+) -> Dict[str, ProjectHistory]:
+    """Get the history of the projects under a directory, such as a generation
+
+    Args:
+        history (Dict[str, ProjectHistory]): history of each project key
+        key (str): key of the directory, see get_project_key
+
+    Returns:
+        Dict[str, ProjectHistory]: history of each project under the directory, keyed
+        by its path relative to the directory
+    """
+    if key == ".":
+        return dict(history)
+    return {
+        "." if project_key == key else project_key[len(key) + 1 :]: entry
+        for project_key, entry in history.items()
+        if is_sub_key(key=project_key, parent=key)
+    }
+
+
+def load_history(history_path: pathlib.Path) -> Dict[str, ProjectHistory]:
+    """Load the outcome of the last run of each project
+
+    Args:
+        history_path (pathlib.Path): history file path
+
+    Returns:
+        Dict[str, ProjectHistory]: history of each project key (see
+        get_project_key), empty if missing, unreadable or outdated
+    """
+    if not history_path.is_file():
+        return {}
+    try:
+        with open(history_path, "r") as f:
+            data = json.load(f)
+        if data.get("version") != HISTORY_VERSION:
+            return {}
+        return {
+            key: ProjectHistory(
+                success=entry["success"],
+                failure_kind=entry["failure_kind"],
+                finished_at=entry["finished_at"],
+                wall_time=entry["wall_time"],
+                stages=dict(entry["stages"]),
+            )
+            for key, entry in data["projects"].items()
+        }
+    except (ValueError, KeyError, TypeError):
+        return {}
+
+
+def save_history(
+    history_path: pathlib.Path, history: Dict[str, ProjectHistory]
+) -> None:
+    """Atomically write the history
+
+    Args:
+        history_path (pathlib.Path): history file path
+        history (Dict[str, ProjectHistory]): history of each project key
+    """
+    os.makedirs(history_path.absolute().parent, exist_ok=True)
+    tmp_path = history_path.with_name(
+        "{name}.{pid}.tmp".format(name=history_path.name, pid=os.getpid())
+    )
+    data = {
+        "version": HISTORY_VERSION,
+        "projects": {key: entry._asdict() for key, entry in sorted(history.items())},
+    }
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, history_path)
+
+
+def update_history(
+    history_path: pathlib.Path,
+    output_dir: pathlib.Path,
+    results: List[install_pool.InstallResult],
+) -> Dict[str, ProjectHistory]:
+    """Record the outcome and the durations of the projects run, keeping the history
+    of the other projects
+
+    The results loaded from the result cache and the projects aborted in fail-fast
+    mode did not run, the history of their projects is kept as is.
+
+    Args:
+        history_path (pathlib.Path): history file path
+        output_dir (pathlib.Path): output directory path containing the projects
+        results (List[install_pool.InstallResult]): results of a run
+
+    Returns:
+        Dict[str, ProjectHistory]: the updated history
+    """
+    history = load_history(history_path=history_path)
+    finished_at = time.time()
+    for result in results:
+        if result.cached or result.failure_kind == install_pool.ABORTED:
+            continue
+        key = get_project_key(project_dir=result.project_dir, output_dir=output_dir)
+        history[key] = ProjectHistory(
+            success=result.success,
+            failure_kind=result.failure_kind,
+            finished_at=finished_at,
+            wall_time=sum(
+                record.wall_time
+                for record in result.phases
+                if record.category == "project"
+            ),
+            stages={
+                record.name: record.wall_time
+                for record in result.phases
+                if record.category == "make-target"
+            },
+        )
+    save_history(history_path=history_path, history=history)
+    return history
@@ -0,0 +1,99 @@
+import pathlib
+import shutil
+
+from . import install_pool, instrumentation
+from . import run_history as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "run_history_test_assets"
+)
+
+
+def get_record(
+    name: str, category: str, wall_time: float
+) -> instrumentation.PhaseRecord:
+    return instrumentation.PhaseRecord(
+        name=name,
+        category=category,
+        start=0.0,
+        wall_time=wall_time,
+        cpu_time=0.0,
+        peak_rss_kb=0,
+        pid=0,
+        success=True,
+    )
+
+
+def test_update_history() -> None:
+    output_dir = TEST_ASSETS_DIR.joinpath("update_history_cached")
+    if output_dir.is_dir():
+        shutil.rmtree(output_dir)
+    history_path = output_dir.joinpath("history.json")
+    assert test_module.load_history(history_path=history_path) == {}
+
+    project_dir = output_dir.joinpath("0000_flavour-app", "testing")
+    result = install_pool.InstallResult(
+        project_dir=project_dir,
+        success=False,
+        message="make test failed",
+        log_path=None,
+        phases=(
+            get_record(name="install", category="make-target", wall_time=2.0),
+            get_record(name="test", category="make-target", wall_time=1.0),
+            get_record(name="testing", category="project", wall_time=3.5),
+        ),
+        failure_kind="failed",
+    )
+    history = test_module.update_history(
+        history_path=history_path, output_dir=output_dir, results=[result]
+    )
+    assert history == test_module.load_history(history_path=history_path)
+    entry = history["0000_flavour-app/testing"]
+    assert not entry.success
+    assert entry.failure_kind == "failed"
+    assert entry.wall_time == 3.5
+    assert entry.stages == {"install": 2.0, "test": 1.0}
+
+    # The cached results did not run, the other projects are kept
+    other_dir = output_dir.joinpath("0001_flavour-lib", "testing")
+    history = test_module.update_history(
+        history_path=history_path,
+        output_dir=output_dir,
+        results=[
+            result._replace(success=True, cached=True, phases=()),
+            result._replace(project_dir=other_dir, success=True, failure_kind=""),
+        ],
+    )
+    assert history["0000_flavour-app/testing"] == entry
+    assert history["0001_flavour-lib/testing"].success
+
+    # Nor did the aborted projects
+    history = test_module.update_history(
+        history_path=history_path,
+        output_dir=output_dir,
+        results=[install_pool.get_aborted_result(project_dir=project_dir)],
+    )
+    assert history["0000_flavour-app/testing"] == entry
+
+    # An unreadable history is ignored
+    history_path.write_text("{")
+    assert test_module.load_history(history_path=history_path) == {}
+    shutil.rmtree(output_dir)
+
+
+def test_get_sub_history() -> None:
+    entry = test_module.ProjectHistory(
+        success=True, failure_kind="", finished_at=0.0, wall_time=1.0, stages={}
+    )
+    history = {
+        "0000_flavour-app/testing": entry,
+        "0000_flavour-app/other": entry,
+        "0000_flavour-application/testing": entry,
+        "testing": entry,
+    }
+    assert test_module.get_sub_history(history=history, key="0000_flavour-app") == {
+        "testing": entry,
+        "other": entry,
+    }
+    assert test_module.get_sub_history(history=history, key="testing") == {".": entry}
+    assert test_module.get_sub_history(history=history, key=".") == history
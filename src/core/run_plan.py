@@ -0,0 +1,437 @@
+import json
+import os
+import pathlib
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from src.core import (
+    cache_manifest,
+    incremental_render,
+    isolate_temp_template,
+    pipeline,
+    result_cache,
+    run_history,
+    runner,
+    scheduling,
+    sharding,
+)
+
+PLAN_VERSION = 1
+
+
+class IsolationPlan(NamedTuple):
+    cache_dir: pathlib.Path
+    # Relative path and size of each file to be linked into the isolated template
+    copy: List[Tuple[str, int]]
+    remove: List[str]
+    unchanged: int
+
+    @property
+    def copy_size(self) -> int:
+        return sum(size for _, size in self.copy)
+
+
+class StagePlan(NamedTuple):
+    name: str
+    needs: Tuple[str, ...]
+    # run or skip
+    action: str
+    # Wall time of the last run in seconds, None without history
+    duration: Optional[float]
+
+
+class ProjectPlan(NamedTuple):
+    project_dir: pathlib.Path
+    # Estimated number of rendered bytes
+    size: int
+    stages: List[StagePlan]
+    last_success: Optional[bool]
+
+
+class GenerationPlan(NamedTuple):
+    generation_dir: pathlib.Path
+    extra_context: Dict[str, str]
+    # render or skip
+    action: str
+    reason: str
+    key: Optional[str]
+    projects: List[ProjectPlan]
+
+
+class RunPlan(NamedTuple):
+    template_dir: pathlib.Path
+    isolation: IsolationPlan
+    generations: List[GenerationPlan]
+
+    def get_duration(self) -> Tuple[float, int]:
+        """Sum the historical durations of the stages to be run
+
+        Returns:
+            Tuple[float, int]:
+            - known duration in seconds
+            - number of stages to be run without history
+        """
+        stages = [
+            stage
+            for generation in self.generations
+            for project in generation.projects
+            for stage in project.stages
+            if stage.action == "run"
+        ]
+        return (
+            sum(stage.duration for stage in stages if stage.duration is not None),
+            len([stage for stage in stages if stage.duration is None]),
+        )
+
+
+def plan_isolation(
+    template_dir: pathlib.Path, cache_dir: pathlib.Path, link_mode: str = "copy"
+) -> Tuple[IsolationPlan, cache_manifest.Manifest]:
+    """Plan the isolation of a template without writing the isolated template
+
+    Args:
+        template_dir (pathlib.Path): template directory path
+        cache_dir (pathlib.Path): isolated template directory path
+        link_mode (str): how the files are isolated
+
+    Raises:
+        Exception: Invalid template directory
+
+    Returns:
+        Tuple[IsolationPlan, cache_manifest.Manifest]:
+        - the files to be linked and removed
+        - manifest of the isolated template once isolated
+    """
+    template_dir = template_dir.absolute()
+    manifest = cache_manifest.load_manifest(cache_dir=cache_dir)
+    diff = isolate_temp_template.diff_template(
+        template_dir=template_dir, manifest=manifest, link_mode=link_mode
+    )
+    if manifest is None and cache_dir.is_dir():
+        # The isolated template without manifest is removed before isolating
+        removed: List[str] = []
+    else:
+        removed = diff.removed
+    return (
+        IsolationPlan(
+            cache_dir=cache_dir,
+            copy=[(rel_path, diff.files[rel_path].size) for rel_path in diff.changed],
+            remove=removed,
+            unchanged=len(diff.files) - len(diff.changed),
+        ),
+        cache_manifest.Manifest(
+            template_dir=str(template_dir), files=diff.files, link_mode=link_mode
+        ),
+    )
+
+
+def estimate_projects(
+    generation_dir: pathlib.Path, manifest: cache_manifest.Manifest
+) -> List[Tuple[pathlib.Path, int]]:
+    """Estimate the projects rendered into a generation directory before rendering
+
+    The rendered project names are those of the previous rendering if any, the name
+    of the template project directory otherwise (such as {{cookiecutter.var_name}}).
+
+    Args:
+        generation_dir (pathlib.Path): generation directory path
+        manifest (cache_manifest.Manifest): manifest of the isolated template
+
+    Returns:
+        List[Tuple[pathlib.Path, int]]: project directory path and estimated number
+        of rendered bytes, the size of the previous incremental rendering if any, the
+        size of the template files otherwise
+    """
+    template_sizes: Dict[str, int] = {}
+    for rel_path, entry in manifest.files.items():
+        name, _, f_path = rel_path.partition("/")
+        if f_path and name.startswith("{{cookiecutter."):
+            template_sizes[name] = template_sizes.get(name, 0) + entry.size
+    template_size = sum(template_sizes.values())
+    render_manifest = incremental_render.load_render_manifest(output_dir=generation_dir)
+    if render_manifest is not None:
+        rendered_sizes: Dict[str, int] = {}
+        for rel_path, entry in render_manifest.files.items():
+            name = rel_path.partition("/")[0]
+            rendered_sizes[name] = rendered_sizes.get(name, 0) + entry.size
+        return [
+            (generation_dir.joinpath(name), size)
+            for name, size in sorted(rendered_sizes.items())
+        ]
+    if generation_dir.is_dir():
+        project_dirs = sorted(
+            f_path for f_path in generation_dir.glob("*") if f_path.is_dir()
+        )
+        if project_dirs:
+            return [(project_dir, template_size) for project_dir in project_dirs]
+    return [
+        (generation_dir.joinpath(name), size)
+        for name, size in sorted(template_sizes.items())
+    ]
+
+
+def plan_run(
+    template_dir: pathlib.Path,
+    output_dir: pathlib.Path,
+    matrix: Optional[List[str]] = None,
+    matrix_sample: Optional[int] = None,
+    matrix_seed: int = 0,
+    link_mode: str = "copy",
+    result_cache_dir: Optional[pathlib.Path] = None,
+    force: bool = False,
+    stages: Optional[List[pipeline.Stage]] = None,
+    history_path: Optional[pathlib.Path] = None,
+    shard: Optional[sharding.Shard] = None,
+) -> RunPlan:
+    """Compute the work graph of a run without executing it
+
+    The template paths are discovered and compared with the isolated template, the
+    matrix is expanded, then each generation is looked up in the result cache and
+    each project in the history (see run_history). Nothing is written. See
+    runner.run for the arguments, only the generations of shard are planned if
+    specified.
+
+    The generations and the projects are planned in the run order, see scheduling.
+    The projects of an incremental run (see runner.watch) are all planned to run,
+    the changed rendered files are only known once rendered.
+
+    Raises:
+        Exception: Invalid template directory
+        ValueError: invalid stages
+
+    Returns:
+        RunPlan: files to be isolated, generations to be rendered and stages to be run
+        or skipped with their historical durations
+    """
+    template_dir = template_dir.absolute()
+    output_dir = output_dir.absolute()
+    stages = pipeline.sort_stages(
+        stages=pipeline.DEFAULT_STAGES if stages is None else stages
+    )
+    isolation, manifest = plan_isolation(
+        template_dir=template_dir,
+        cache_dir=template_dir.joinpath(".template_cache"),
+        link_mode=link_mode,
+    )
+    history = (
+        {}
+        if history_path is None
+        else run_history.load_history(history_path=history_path)
+    )
+    run_generations = runner.get_generations(
+        template_dir=template_dir,
+        output_dir=output_dir,
+        matrix=matrix,
+        matrix_sample=matrix_sample,
+        matrix_seed=matrix_seed,
+    )
+    if shard is not None:
+        run_generations = sharding.select_generations(
+            generations=run_generations,
+            output_dir=output_dir,
+            partition=sharding.partition_generations(
+                generations=run_generations, output_dir=output_dir, shard=shard
+            ),
+        )
+    run_generations = scheduling.order_generations(
+        generations=run_generations, output_dir=output_dir, history=history
+    )
+    generations = []
+    for extra_context, generation_dir in run_generations:
+        key, action, reason = None, "render", "not cached"
+        if result_cache_dir is not None:
+            key = result_cache.compute_result_key(
+                manifest=manifest,
+                extra_context=extra_context,
+                make_targets=[stage.name for stage in stages],
+            )
+            cached = result_cache.load_result(cache_dir=result_cache_dir, key=key)
+            if cached is not None and cached.get("success") is True:
+                action, reason = "skip", "already succeeded"
+                if force:
+                    action, reason = "render", "forced"
+        sizes = dict(
+            estimate_projects(generation_dir=generation_dir, manifest=manifest)
+        )
+        projects = []
+        for project_dir in scheduling.order_projects(
+            project_dirs=list(sizes),
+            generation_dir=generation_dir,
+            history=run_history.get_sub_history(
+                history=history,
+                key=run_history.get_project_key(
+                    project_dir=generation_dir, output_dir=output_dir
+                ),
+            ),
+            changed=None,
+        ):
+            size = sizes[project_dir]
+            previous = history.get(
+                run_history.get_project_key(
+                    project_dir=project_dir, output_dir=output_dir
+                )
+            )
+            projects.append(
+                ProjectPlan(
+                    project_dir=project_dir,
+                    size=size,
+                    stages=[
+                        StagePlan(
+                            name=stage.name,
+                            needs=stage.needs,
+                            action="run" if action == "render" else "skip",
+                            duration=(
+                                None
+                                if previous is None
+                                else previous.stages.get(stage.name)
+                            ),
+                        )
+                        for stage in stages
+                    ],
+                    last_success=None if previous is None else previous.success,
+                )
+            )
+        generations.append(
+            GenerationPlan(
+                generation_dir=generation_dir,
+                extra_context=extra_context,
+                action=action,
+                reason=reason,
+                key=key,
+                projects=projects,
+            )
+        )
+    return RunPlan(
+        template_dir=template_dir, isolation=isolation, generations=generations
+    )
+
+
+def plan_to_dict(plan: RunPlan) -> Dict[str, Any]:
+    """Convert a plan into JSON serializable data
+
+    Args:
+        plan (RunPlan): plan of a run
+
+    Returns:
+        Dict[str, Any]: the work graph
+    """
+    duration, n_unknown = plan.get_duration()
+    return {
+        "version": PLAN_VERSION,
+        "template_dir": str(plan.template_dir),
+        "isolation": {
+            "cache_dir": str(plan.isolation.cache_dir),
+            "copy": [
+                {"path": rel_path, "size": size}
+                for rel_path, size in plan.isolation.copy
+            ],
+            "copy_size": plan.isolation.copy_size,
+            "remove": plan.isolation.remove,
+            "unchanged": plan.isolation.unchanged,
+        },
+        "generations": [
+            {
+                "generation_dir": str(generation.generation_dir),
+                "extra_context": generation.extra_context,
+                "action": generation.action,
+                "reason": generation.reason,
+                "key": generation.key,
+                "projects": [
+                    {
+                        "project_dir": str(project.project_dir),
+                        "size": project.size,
+                        "last_success": project.last_success,
+                        "stages": [stage._asdict() for stage in project.stages],
+                    }
+                    for project in generation.projects
+                ],
+            }
+            for generation in plan.generations
+        ],
+        "duration": duration,
+        "stages_without_history": n_unknown,
+    }
+
+
+def write_plan(plan: RunPlan, plan_path: Optional[pathlib.Path] = None) -> None:
+    """Write a plan as JSON
+
+    Args:
+        plan (RunPlan): plan of a run
+        plan_path (Optional[pathlib.Path]): plan file path, the standard output if
+            not specified
+    """
+    data = json.dumps(plan_to_dict(plan=plan), indent=2)
+    if plan_path is None:
+        sys.stdout.write(data + "\n")
+        return
+    os.makedirs(plan_path.absolute().parent, exist_ok=True)
+    with open(plan_path, "w") as f:
+        f.write(data + "\n")
+
+
+def format_plan(plan: RunPlan) -> str:
+    """Format a plan
+
+    Args:
+        plan (RunPlan): plan of a run
+
+    Returns:
+        str: human readable work graph
+    """
+    isolation = plan.isolation
+    lines = [
+        "Isolate {template_dir}: copy {n_copy} files ({copy_size} bytes), remove"
+        " {n_remove}, {unchanged} unchanged".format(
+            template_dir=plan.template_dir,
+            n_copy=len(isolation.copy),
+            copy_size=isolation.copy_size,
+            n_remove=len(isolation.remove),
+            unchanged=isolation.unchanged,
+        )
+    ]
+    for generation in plan.generations:
+        lines.append(
+            "{action} {generation_dir} ({reason})".format(
+                action=generation.action.upper(),
+                generation_dir=generation.generation_dir,
+                reason=generation.reason,
+            )
+        )
+        for project in generation.projects:
+            lines.append(
+                "  {project_dir}: ~{size} bytes{last}".format(
+                    project_dir=project.project_dir.name,
+                    size=project.size,
+                    last=(
+                        ""
+                        if project.last_success is None
+                        else ", last run {status}".format(
+                            status="passed" if project.last_success else "failed"
+                        )
+                    ),
+                )
+            )
+            for stage in project.stages:
+                lines.append(
+                    "    {action} {name}{needs} ({duration})".format(
+                        action=stage.action,
+                        name=stage.name,
+                        needs=(
+                            ""
+                            if not stage.needs
+                            else " after {needs}".format(needs=", ".join(stage.needs))
+                        ),
+                        duration=(
+                            "no history"
+                            if stage.duration is None
+                            else "{duration:.1f}s".format(duration=stage.duration)
+                        ),
+                    )
+                )
+    duration, n_unknown = plan.get_duration()
+    lines.append(
+        "Estimated make-target time: {duration:.1f}s, {n_unknown} stages without"
+        " history".format(duration=duration, n_unknown=n_unknown)
+    )
+    return "\n".join(lines)
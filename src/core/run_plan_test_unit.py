@@ -0,0 +1,143 @@
+import json
+import pathlib
+import shutil
+
+from . import isolate_temp_template, pipeline, result_cache, run_history
+from . import run_plan as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "run_plan_test_assets"
+)
+
+
+def test_plan_run() -> None:
+    template_dir = TEST_ASSETS_DIR.joinpath("template_cached")
+    output_dir = TEST_ASSETS_DIR.joinpath("output_cached")
+    result_cache_dir = TEST_ASSETS_DIR.joinpath("results_cached")
+    history_path = result_cache_dir.joinpath("history.json")
+    for dir_path in [template_dir, output_dir, result_cache_dir]:
+        if dir_path.is_dir():
+            shutil.rmtree(dir_path)
+    shutil.copytree(TEST_ASSETS_DIR.joinpath("template"), template_dir)
+    stages = [pipeline.Stage(name="install"), pipeline.Stage(name="test")]
+
+    plan = test_module.plan_run(
+        template_dir=template_dir,
+        output_dir=output_dir,
+        matrix=["flavour"],
+        result_cache_dir=result_cache_dir,
+        stages=stages,
+        history_path=history_path,
+    )
+    # Nothing is written
+    assert not template_dir.joinpath(".template_cache").exists()
+    assert not output_dir.exists()
+    assert sorted(rel_path for rel_path, _ in plan.isolation.copy) == [
+        "cookiecutter.json",
+        "{{cookiecutter.var_name}}/Makefile",
+        "{{cookiecutter.var_name}}/version",
+    ]
+    assert plan.isolation.copy_size == sum(
+        f_path.stat().st_size for f_path in template_dir.rglob("*") if f_path.is_file()
+    )
+    assert [generation.extra_context for generation in plan.generations] == [
+        {"flavour": "app"},
+        {"flavour": "lib"},
+        {"flavour": "cli"},
+    ]
+    generation = plan.generations[0]
+    assert generation.action == "render"
+    assert [project.project_dir.name for project in generation.projects] == [
+        "{{cookiecutter.var_name}}"
+    ]
+    assert [
+        (stage.name, stage.action, stage.duration)
+        for stage in generation.projects[0].stages
+    ] == [("install", "run", None), ("test", "run", None)]
+    assert plan.get_duration() == (0, 6)
+
+    # Once isolated, rendered and run: the first generation succeeded, the second
+    # one failed
+    manifest = isolate_temp_template.run(
+        template_dir=template_dir, cache_dir=template_dir.joinpath(".template_cache")
+    )
+    run_history.save_history(
+        history_path=history_path,
+        history={
+            "0000_flavour-app/testing": run_history.ProjectHistory(
+                success=True,
+                failure_kind="",
+                finished_at=0.0,
+                wall_time=3.0,
+                stages={"install": 2.0, "test": 1.0},
+            ),
+            "0001_flavour-lib/testing": run_history.ProjectHistory(
+                success=False,
+                failure_kind="failed",
+                finished_at=0.0,
+                wall_time=4.0,
+                stages={"install": 2.5, "test": 1.5},
+            ),
+        },
+    )
+    for generation in plan.generations[:2]:
+        generation.generation_dir.joinpath("testing").mkdir(parents=True)
+    result_cache.store_result(
+        cache_dir=result_cache_dir,
+        key=result_cache.compute_result_key(
+            manifest=manifest,
+            extra_context={"flavour": "app"},
+            make_targets=["install", "test"],
+        ),
+        projects=["testing"],
+        success=True,
+    )
+    plan = test_module.plan_run(
+        template_dir=template_dir,
+        output_dir=output_dir,
+        matrix=["flavour"],
+        result_cache_dir=result_cache_dir,
+        stages=stages,
+        history_path=history_path,
+    )
+    assert plan.isolation.copy == []
+    assert plan.isolation.unchanged == 3
+    # The generation which failed is planned first
+    assert [
+        (generation.generation_dir.name, generation.action, generation.reason)
+        for generation in plan.generations
+    ] == [
+        ("0001_flavour-lib", "render", "not cached"),
+        ("0000_flavour-app", "skip", "already succeeded"),
+        ("0002_flavour-cli", "render", "not cached"),
+    ]
+    project = plan.generations[0].projects[0]
+    assert project.project_dir.name == "testing"
+    assert project.last_success is False
+    assert [(stage.action, stage.duration) for stage in project.stages] == [
+        ("run", 2.5),
+        ("run", 1.5),
+    ]
+    assert [stage.action for stage in plan.generations[1].projects[0].stages] == [
+        "skip",
+        "skip",
+    ]
+    assert plan.get_duration() == (4.0, 2)
+    assert "Estimated make-target time: 4.0s, 2 stages without history" in (
+        test_module.format_plan(plan=plan)
+    )
+
+    plan_path = output_dir.joinpath("plan.json")
+    test_module.write_plan(plan=plan, plan_path=plan_path)
+    with open(plan_path, "r") as f:
+        data = json.load(f)
+    assert data == json.loads(json.dumps(test_module.plan_to_dict(plan=plan)))
+    assert data["duration"] == 4.0
+    assert data["generations"][0]["projects"][0]["stages"][0] == {
+        "name": "install",
+        "needs": [],
+        "action": "run",
+        "duration": 2.5,
+    }
+    for dir_path in [template_dir, output_dir, result_cache_dir]:
+        shutil.rmtree(dir_path)
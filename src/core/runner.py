@@ -0,0 +1,1280 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import logging
+import pathlib
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from src.core import (
+    cache_manifest,
+    defaults,
+    fair_limiter,
+    incremental_render,
+    initialize_project,
+    install_pool,
+    instrumentation,
+    isolate_temp_template,
+    pipeline,
+    resource_limits,
+    result_cache,
+    run_history,
+    scheduling,
+    sharding,
+    template_watcher,
+    variable_matrix,
+    workspace,
+)
+
+
+def get_generations(
+    template_dir: pathlib.Path,
+    output_dir: pathlib.Path,
+    matrix: Optional[List[str]] = None,
+    matrix_sample: Optional[int] = None,
+    matrix_seed: int = 0,
+) -> List[Tuple[Dict[str, str], pathlib.Path]]:
+    """Get the contexts to be generated with their own output directory
+
+    Args:
+        template_dir (pathlib.Path): template directory path
+        output_dir (pathlib.Path): output directory path
+        matrix (Optional[List[str]]): choice variables expanded as a matrix (all choice
+            variables if empty), only the default context is generated if not specified
+        matrix_sample (Optional[int]): number of sampled matrix combinations
+        matrix_seed (int): seed of the matrix sampling
+
+    Returns:
+        List[Tuple[Dict[str, str], pathlib.Path]]: extra context and output directory
+        of each generation
+    """
+    if matrix is None:
+        return [({}, output_dir)]
+    combinations = variable_matrix.expand_matrix(
+        context=variable_matrix.load_context(template_dir=template_dir),
+        variables=matrix,
+        sample=matrix_sample,
+        seed=matrix_seed,
+    )
+    logging.info("Expanded {n} matrix combinations".format(n=len(combinations)))
+    return [
+        (
+            combination,
+            output_dir.joinpath(
+                variable_matrix.get_combination_name(
+                    index=index, combination=combination
+                )
+            ),
+        )
+        for index, combination in enumerate(combinations)
+    ]
+
+
+def run(
+    template_dir: pathlib.Path,
+    output_dir: pathlib.Path,
+    jobs: int = 1,
+    log_dir: Optional[pathlib.Path] = None,
+    matrix: Optional[List[str]] = None,
+    matrix_sample: Optional[int] = None,
+    matrix_seed: int = 0,
+    render_backend: str = "auto",
+    link_mode: str = "copy",
+    copy_workers: int = defaults.DEFAULT_WORKERS,
+    env_cache_dir: Optional[pathlib.Path] = None,
+    result_cache_dir: Optional[pathlib.Path] = None,
+    force: bool = False,
+    report_path: Optional[pathlib.Path] = None,
+    junit_path: Optional[pathlib.Path] = None,
+    trace_path: Optional[pathlib.Path] = None,
+    history_path: Optional[pathlib.Path] = None,
+    stages: Optional[List[pipeline.Stage]] = None,
+    stage_jobs: Optional[int] = None,
+    console: bool = False,
+    stage_limits: Optional[resource_limits.ResourceLimits] = None,
+    workspace_mode: str = "disk",
+    workspace_dir: pathlib.Path = defaults.DEFAULT_TMPFS_DIR,
+    workspace_budget: int = defaults.DEFAULT_BUDGET,
+    incremental: bool = False,
+    fail_fast: bool = False,
+    history: Optional[Dict[pathlib.Path, install_pool.InstallResult]] = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    shard_result_path: Optional[pathlib.Path] = None,
+) -> None:
+    """Create, install and test the project from a template
+
+    The isolated template is kept in template_dir/.template_cache between runs,
+    so the next run only synchronizes the changed template files.
+
+    The projects which failed in their last run (recorded in history_path) are run
+    first, then the projects whose rendered files changed (known with the
+    incremental rendering) or which never ran, see scheduling.
+
+    Args:
+        template_dir (pathlib.Path): template directory path
+        output_dir (pathlib.Path): output directory path
+        jobs (int): number of projects installed and tested at the same time
+        log_dir (Optional[pathlib.Path]): directory receiving one log file per project
+        matrix (Optional[List[str]]): choice variables expanded as a matrix, each
+            combination is generated into its own sub-directory of output_dir
+        matrix_sample (Optional[int]): number of sampled matrix combinations
+        matrix_seed (int): seed of the matrix sampling
+        render_backend (str): cookiecutter rendering backend (api, subprocess or auto)
+        link_mode (str): how the template files are isolated (copy, hardlink, reflink
+            or symlink)
+        copy_workers (int): number of threads copying the template files
+        env_cache_dir (Optional[pathlib.Path]): virtual environment cache shared by the
+            projects having the same pyproject.toml and poetry.lock
+        result_cache_dir (Optional[pathlib.Path]): results keyed by the template
+            contents, the context and the make-targets, a generation which already
+            succeeded is skipped
+        force (bool): run the generations already succeeded in result_cache_dir
+        report_path (Optional[pathlib.Path]): JSON report with the wall time, CPU time
+            and peak RSS of each phase and of each make-target of each project
+        junit_path (Optional[pathlib.Path]): JUnit XML report of the make-targets
+        trace_path (Optional[pathlib.Path]): Chrome trace-event file of the phases
+        history_path (Optional[pathlib.Path]): file recording the outcome and the
+            make-target durations of the last run of each project (see run_history),
+            used to plan the next runs
+        stages (Optional[List[pipeline.Stage]]): make-targets run in each project and
+            the stages they need, pipeline.DEFAULT_STAGES if not specified
+        stage_jobs (Optional[int]): maximum number of concurrent make-targets of a
+            project, no limit if not specified
+        console (bool): print the output of cookiecutter and of the make-targets live
+        stage_limits (Optional[resource_limits.ResourceLimits]): default wall-clock
+            timeout, CPU and memory limits of each make-target (overridden by the
+            limits of the stage), the make-target is stopped when it expires and the
+            project fails with the kind of the limit
+        workspace_mode (str): disk, or tmpfs to generate and test the projects in a
+            RAM-backed workspace, only the logs and the failing projects are copied
+            into log_dir and output_dir
+        workspace_dir (pathlib.Path): RAM-backed directory of the tmpfs mode
+        workspace_budget (int): maximum number of bytes written into the workspace,
+            the next generations are written on the disk once exhausted
+        incremental (bool): render into a staging directory, then only write the
+            output files whose content changed, so that the downstream tools (make,
+            pytest and mypy caches) stay warm
+        fail_fast (bool): stop at the first failing project, the running projects are
+            cancelled and the next ones are not run (reported as aborted), all the
+            projects are run and reported otherwise
+        history (Optional[Dict[pathlib.Path, install_pool.InstallResult]]): result of
+            the last run of each project, updated in place (see watch), with the
+            incremental rendering only the projects with changed files are rerun, and
+            without the install stage if no dependency file changed
+        shard_index (int): index of the shard run by this process, from 0 to
+            shard_count - 1
+        shard_count (int): number of shards the generations are partitioned into,
+            balanced by the durations recorded in history_path (the same history must
+            be given to every shard), a shard does not update the history, see
+            merge_shards
+        shard_result_path (Optional[pathlib.Path]): partial result file of the shard,
+            see merge_shards
+
+    Raises:
+        RuntimeError: at least one project fails to be installed or tested
+        ValueError: invalid stages or shard
+    """
+    project_history = None
+    if history_path is not None:
+        project_history = run_history.load_history(history_path=history_path)
+    partition = None
+    if shard_count != 1 or shard_index != 0 or shard_result_path is not None:
+        # Partitioned before running, the history is not updated by the shards so
+        # that every shard of the run gets the same partition
+        partition = sharding.partition_generations(
+            generations=get_generations(
+                template_dir=template_dir,
+                output_dir=output_dir,
+                matrix=matrix,
+                matrix_sample=matrix_sample,
+                matrix_seed=matrix_seed,
+            ),
+            output_dir=output_dir,
+            shard=sharding.create_shard(
+                index=shard_index, count=shard_count, history=project_history
+            ),
+        )
+    recorder = instrumentation.Recorder()
+    results: List[install_pool.InstallResult] = []
+    complete = False
+    try:
+        results = run_phases(
+            template_dir=template_dir,
+            output_dir=output_dir,
+            recorder=recorder,
+            jobs=jobs,
+            log_dir=log_dir,
+            matrix=matrix,
+            matrix_sample=matrix_sample,
+            matrix_seed=matrix_seed,
+            render_backend=render_backend,
+            link_mode=link_mode,
+            copy_workers=copy_workers,
+            env_cache_dir=env_cache_dir,
+            result_cache_dir=result_cache_dir,
+            force=force,
+            stages=stages,
+            stage_jobs=stage_jobs,
+            console=console,
+            stage_limits=stage_limits,
+            workspace_mode=workspace_mode,
+            workspace_dir=workspace_dir,
+            workspace_budget=workspace_budget,
+            incremental=incremental,
+            fail_fast=fail_fast,
+            history=history,
+            project_history=project_history,
+            partition=partition,
+        )
+        # The generations after a fail-fast abort did not run
+        complete = not any(
+            result.failure_kind == install_pool.ABORTED for result in results
+        )
+    finally:
+        write_reports(
+            recorder=recorder,
+            results=results,
+            report_path=report_path,
+            junit_path=junit_path,
+            trace_path=trace_path,
+        )
+        if history_path is not None and partition is None:
+            run_history.update_history(
+                history_path=history_path, output_dir=output_dir, results=results
+            )
+        if shard_result_path is not None and partition is not None:
+            sharding.write_shard_result(
+                result_path=shard_result_path,
+                index=shard_index,
+                count=shard_count,
+                partition=partition,
+                output_dir=output_dir,
+                results=results,
+                records=recorder.records,
+                complete=complete,
+            )
+    report = install_pool.format_report(results=results)
+    logging.info("Installation report:\n{report}".format(report=report))
+    if not all(result.success for result in results):
+        raise RuntimeError(report)
+
+
+def run_batch(
+    template_dirs: List[pathlib.Path],
+    output_dir: pathlib.Path,
+    jobs: int = 1,
+    log_dir: Optional[pathlib.Path] = None,
+    matrix: Optional[List[str]] = None,
+    matrix_sample: Optional[int] = None,
+    matrix_seed: int = 0,
+    render_backend: str = "auto",
+    link_mode: str = "copy",
+    copy_workers: int = defaults.DEFAULT_WORKERS,
+    env_cache_dir: Optional[pathlib.Path] = None,
+    result_cache_dir: Optional[pathlib.Path] = None,
+    force: bool = False,
+    report_path: Optional[pathlib.Path] = None,
+    junit_path: Optional[pathlib.Path] = None,
+    trace_path: Optional[pathlib.Path] = None,
+    history_path: Optional[pathlib.Path] = None,
+    stages: Optional[List[pipeline.Stage]] = None,
+    stage_jobs: Optional[int] = None,
+    console: bool = False,
+    stage_limits: Optional[resource_limits.ResourceLimits] = None,
+    workspace_mode: str = "disk",
+    workspace_dir: pathlib.Path = defaults.DEFAULT_TMPFS_DIR,
+    workspace_budget: int = defaults.DEFAULT_BUDGET,
+    incremental: bool = False,
+    fail_fast: bool = False,
+) -> Dict[str, List[install_pool.InstallResult]]:
+    """Create, install and test the projects of several templates in one process
+
+    The templates are isolated concurrently, their generations share the rendering
+    thread and their projects share the jobs workers: a free worker is given to
+    each template having projects waiting in turn, so that a template with many
+    projects does not hold back the others. A template failing to be isolated or
+    rendered is reported without stopping the other templates. In fail-fast mode,
+    the first failing project stops all the templates. See run for the other
+    arguments.
+
+    Args:
+        template_dirs (List[pathlib.Path]): template directory paths, see
+            isolate_temp_template.find_template_directories
+        output_dir (pathlib.Path): output directory path, each template is generated
+            into its own sub-directory (named after the template directory)
+        log_dir (Optional[pathlib.Path]): log directory path, mirroring output_dir
+
+    Raises:
+        RuntimeError: at least one template fails or one of its projects fails to be
+            installed or tested
+        ValueError: no template or jobs is not a positive number
+
+    Returns:
+        Dict[str, List[install_pool.InstallResult]]: result of each project of each
+        template
+    """
+    if not template_dirs:
+        raise ValueError("No template directory")
+    if jobs < 1:
+        raise ValueError("Invalid number of jobs: {jobs}".format(jobs=jobs))
+    names = get_template_names(template_dirs=template_dirs)
+    project_history = None
+    if history_path is not None:
+        project_history = run_history.load_history(history_path=history_path)
+    recorders = {name: instrumentation.Recorder(project=name) for name in names}
+    results: Dict[str, List[install_pool.InstallResult]] = {}
+    errors: Dict[str, str] = {}
+
+    async def run_template(
+        name: str,
+        template_dir: pathlib.Path,
+        limiter: fair_limiter.FairLimiter,
+        render_executor: concurrent.futures.Executor,
+        abort: Optional[asyncio.Event],
+    ) -> None:
+        try:
+            results[name] = await run_phases_async(
+                template_dir=template_dir,
+                output_dir=output_dir.joinpath(name),
+                recorder=recorders[name],
+                limiter=limiter.group(name=name),
+                render_executor=render_executor,
+                log_dir=None if log_dir is None else log_dir.joinpath(name),
+                matrix=matrix,
+                matrix_sample=matrix_sample,
+                matrix_seed=matrix_seed,
+                render_backend=render_backend,
+                link_mode=link_mode,
+                copy_workers=copy_workers,
+                env_cache_dir=env_cache_dir,
+                result_cache_dir=result_cache_dir,
+                force=force,
+                stages=stages,
+                stage_jobs=stage_jobs,
+                console=console,
+                stage_limits=stage_limits,
+                workspace_mode=workspace_mode,
+                workspace_dir=workspace_dir,
+                workspace_budget=workspace_budget,
+                incremental=incremental,
+                abort=abort,
+                project_history=(
+                    None
+                    if project_history is None
+                    else run_history.get_sub_history(history=project_history, key=name)
+                ),
+            )
+        except Exception as e:
+            logging.error(
+                "Template {template_dir} failed: {e}".format(
+                    template_dir=template_dir, e=e
+                )
+            )
+            errors[name] = str(e) or type(e).__name__
+
+    async def run_all() -> None:
+        limiter = fair_limiter.FairLimiter(value=jobs)
+        render_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        abort = asyncio.Event() if fail_fast else None
+        try:
+            await asyncio.gather(
+                *[
+                    run_template(
+                        name=name,
+                        template_dir=template_dir,
+                        limiter=limiter,
+                        render_executor=render_executor,
+                        abort=abort,
+                    )
+                    for name, template_dir in zip(names, template_dirs)
+                ]
+            )
+        finally:
+            render_executor.shutdown(wait=True)
+
+    try:
+        asyncio.run(run_all())
+    finally:
+        recorder = instrumentation.Recorder()
+        for name in names:
+            recorder.extend(records=recorders[name].records)
+        all_results = [result for name in names for result in results.get(name, [])]
+        write_reports(
+            recorder=recorder,
+            results=all_results,
+            report_path=report_path,
+            junit_path=junit_path,
+            trace_path=trace_path,
+        )
+        if history_path is not None:
+            run_history.update_history(
+                history_path=history_path, output_dir=output_dir, results=all_results
+            )
+    report = format_batch_report(names=names, results=results, errors=errors)
+    logging.info("Batch report:\n{report}".format(report=report))
+    if errors or not all(
+        result.success for name in names for result in results.get(name, [])
+    ):
+        raise RuntimeError(report)
+    return results
+
+
+def get_template_names(template_dirs: List[pathlib.Path]) -> List[str]:
+    """Get the unique name of each template of a batch
+
+    Args:
+        template_dirs (List[pathlib.Path]): template directory paths
+
+    Returns:
+        List[str]: name of each template directory, suffixed by its position if
+        several templates have the same name
+    """
+    names = [template_dir.absolute().name for template_dir in template_dirs]
+    return [
+        name if names.count(name) == 1 else "{name}_{index}".format(name=name, index=i)
+        for i, name in enumerate(names)
+    ]
+
+
+def format_batch_report(
+    names: List[str],
+    results: Dict[str, List[install_pool.InstallResult]],
+    errors: Dict[str, str],
+) -> str:
+    """Format the report of each template of a batch
+
+    Args:
+        names (List[str]): template names
+        results (Dict[str, List[install_pool.InstallResult]]): results of each
+            template which ran
+        errors (Dict[str, str]): error of each template which failed to run
+
+    Returns:
+        str: human readable report
+    """
+    n_passed = len(
+        [
+            name
+            for name in names
+            if name not in errors
+            and all(result.success for result in results.get(name, []))
+        ]
+    )
+    lines = [
+        "{n_passed} templates passed, {n_failed} failed".format(
+            n_passed=n_passed, n_failed=len(names) - n_passed
+        )
+    ]
+    for name in names:
+        if name in errors:
+            lines.append(
+                "== {name}: ERROR {error}".format(name=name, error=errors[name])
+            )
+        else:
+            lines.append(
+                "== {name}: {report}".format(
+                    name=name,
+                    report=install_pool.format_report(results=results.get(name, [])),
+                )
+            )
+    return "\n".join(lines)
+
+
+def merge_shards(
+    result_paths: List[pathlib.Path],
+    output_dir: pathlib.Path,
+    report_path: Optional[pathlib.Path] = None,
+    junit_path: Optional[pathlib.Path] = None,
+    trace_path: Optional[pathlib.Path] = None,
+    history_path: Optional[pathlib.Path] = None,
+) -> List[install_pool.InstallResult]:
+    """Merge the partial results of the shards of a run into one report, see run for
+    the report arguments
+
+    Args:
+        result_paths (List[pathlib.Path]): partial result file of each shard
+        output_dir (pathlib.Path): output directory path the projects are reported in
+        history_path (Optional[pathlib.Path]): history updated with the outcome of
+            the projects of all the shards, to be given to the shards of the next run
+
+    Raises:
+        RuntimeError: a shard did not run all of its projects or at least one project
+            failed to be installed or tested
+        ValueError: invalid partial results or missing shard
+
+    Returns:
+        List[install_pool.InstallResult]: result of each project of the run
+    """
+    results, records, incomplete = sharding.merge_shard_results(
+        result_paths=result_paths, output_dir=output_dir
+    )
+    recorder = instrumentation.Recorder()
+    recorder.extend(records=records)
+    write_reports(
+        recorder=recorder,
+        results=results,
+        report_path=report_path,
+        junit_path=junit_path,
+        trace_path=trace_path,
+    )
+    if history_path is not None:
+        run_history.update_history(
+            history_path=history_path, output_dir=output_dir, results=results
+        )
+    report = install_pool.format_report(results=results)
+    if incomplete:
+        report += "\nIncomplete shards: {indexes}".format(
+            indexes=", ".join(str(index) for index in incomplete)
+        )
+    logging.info("Merged report:\n{report}".format(report=report))
+    if incomplete or not all(result.success for result in results):
+        raise RuntimeError(report)
+    return results
+
+
+def watch(
+    template_dir: pathlib.Path,
+    output_dir: pathlib.Path,
+    debounce: float = defaults.DEFAULT_DEBOUNCE,
+    polling: bool = False,
+    max_runs: Optional[int] = None,
+    **kwargs: Any,
+) -> None:
+    """Run, then rerun on each change of the template files until interrupted
+
+    The template directory is watched with inotify (or polled), the files ignored by
+    git are not watched. Each change re-isolates and re-renders incrementally, then
+    only reruns the projects whose rendered files changed, without the install stage
+    if none of their dependency files (see template_watcher.DEPENDENCY_FILES)
+    changed. A failing run is reported and the watch goes on.
+
+    Args:
+        template_dir (pathlib.Path): template directory path
+        output_dir (pathlib.Path): output directory path
+        debounce (float): seconds without any change before rerunning
+        polling (bool): poll the template files instead of using inotify
+        max_runs (Optional[int]): stop after this number of runs, no limit if not
+            specified
+        **kwargs (Any): other arguments of run
+
+    Raises:
+        ValueError: tmpfs workspace, the projects are not kept between the runs
+    """
+    if kwargs.get("workspace_mode", "disk") != "disk":
+        raise ValueError("The watch mode only supports the disk workspace")
+    kwargs["incremental"] = True
+    history: Dict[pathlib.Path, install_pool.InstallResult] = {}
+    runs = 0
+    try:
+        with template_watcher.create_watcher(
+            template_dir=template_dir, polling=polling
+        ) as watcher:
+            snapshot = template_watcher.get_snapshot(template_dir=template_dir)
+            while True:
+                try:
+                    run(
+                        template_dir=template_dir,
+                        output_dir=output_dir,
+                        history=history,
+                        **kwargs,
+                    )
+                except Exception as e:
+                    logging.error("Run failed: {e}".format(e=e))
+                runs += 1
+                if max_runs is not None and runs >= max_runs:
+                    return
+                logging.info(
+                    "Watching {template_dir} for changes".format(
+                        template_dir=template_dir
+                    )
+                )
+                snapshot, changed = template_watcher.wait_for_change(
+                    watcher=watcher, snapshot=snapshot, debounce=debounce
+                )
+                logging.info(
+                    "{n} template files changed: {paths}".format(
+                        n=len(changed), paths=", ".join(changed[:10])
+                    )
+                )
+    except KeyboardInterrupt:
+        logging.info(
+            "Stopped watching {template_dir}".format(template_dir=template_dir)
+        )
+
+
+def run_phases(
+    template_dir: pathlib.Path,
+    output_dir: pathlib.Path,
+    recorder: instrumentation.Recorder,
+    jobs: int,
+    log_dir: Optional[pathlib.Path],
+    matrix: Optional[List[str]],
+    matrix_sample: Optional[int],
+    matrix_seed: int,
+    render_backend: str,
+    link_mode: str,
+    copy_workers: int,
+    env_cache_dir: Optional[pathlib.Path],
+    result_cache_dir: Optional[pathlib.Path],
+    force: bool,
+    stages: Optional[List[pipeline.Stage]] = None,
+    stage_jobs: Optional[int] = None,
+    console: bool = False,
+    stage_limits: Optional[resource_limits.ResourceLimits] = None,
+    workspace_mode: str = "disk",
+    workspace_dir: pathlib.Path = defaults.DEFAULT_TMPFS_DIR,
+    workspace_budget: int = defaults.DEFAULT_BUDGET,
+    incremental: bool = False,
+    fail_fast: bool = False,
+    history: Optional[Dict[pathlib.Path, install_pool.InstallResult]] = None,
+    project_history: Optional[Dict[str, run_history.ProjectHistory]] = None,
+    partition: Optional[sharding.Partition] = None,
+) -> List[install_pool.InstallResult]:
+    """Run the isolate phase, then pipeline the create and install phases, see run
+    for the arguments and run_phases_async for the phases
+
+    Raises:
+        ValueError: jobs is not a positive number or unknown workspace mode
+
+    Returns:
+        List[install_pool.InstallResult]: result of each project
+    """
+    if jobs < 1:
+        raise ValueError("Invalid number of jobs: {jobs}".format(jobs=jobs))
+
+    async def run_all() -> List[install_pool.InstallResult]:
+        render_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        try:
+            return await run_phases_async(
+                limiter=asyncio.Semaphore(jobs),
+                render_executor=render_executor,
+                template_dir=template_dir,
+                output_dir=output_dir,
+                recorder=recorder,
+                log_dir=log_dir,
+                matrix=matrix,
+                matrix_sample=matrix_sample,
+                matrix_seed=matrix_seed,
+                render_backend=render_backend,
+                link_mode=link_mode,
+                copy_workers=copy_workers,
+                env_cache_dir=env_cache_dir,
+                result_cache_dir=result_cache_dir,
+                force=force,
+                stages=stages,
+                stage_jobs=stage_jobs,
+                console=console,
+                stage_limits=stage_limits,
+                workspace_mode=workspace_mode,
+                workspace_dir=workspace_dir,
+                workspace_budget=workspace_budget,
+                incremental=incremental,
+                abort=asyncio.Event() if fail_fast else None,
+                history=history,
+                project_history=project_history,
+                partition=partition,
+            )
+        finally:
+            render_executor.shutdown(wait=True)
+
+    return asyncio.run(run_all())
+
+
+async def run_phases_async(
+    template_dir: pathlib.Path,
+    output_dir: pathlib.Path,
+    recorder: instrumentation.Recorder,
+    limiter: AsyncContextManager[None],
+    render_executor: concurrent.futures.Executor,
+    log_dir: Optional[pathlib.Path],
+    matrix: Optional[List[str]],
+    matrix_sample: Optional[int],
+    matrix_seed: int,
+    render_backend: str,
+    link_mode: str,
+    copy_workers: int,
+    env_cache_dir: Optional[pathlib.Path],
+    result_cache_dir: Optional[pathlib.Path],
+    force: bool,
+    stages: Optional[List[pipeline.Stage]] = None,
+    stage_jobs: Optional[int] = None,
+    console: bool = False,
+    stage_limits: Optional[resource_limits.ResourceLimits] = None,
+    workspace_mode: str = "disk",
+    workspace_dir: pathlib.Path = defaults.DEFAULT_TMPFS_DIR,
+    workspace_budget: int = defaults.DEFAULT_BUDGET,
+    incremental: bool = False,
+    abort: Optional[asyncio.Event] = None,
+    history: Optional[Dict[pathlib.Path, install_pool.InstallResult]] = None,
+    project_history: Optional[Dict[str, run_history.ProjectHistory]] = None,
+    partition: Optional[sharding.Partition] = None,
+) -> List[install_pool.InstallResult]:
+    """Run the isolate phase, then pipeline the create and install phases from the
+    event loop, see run for the other arguments
+
+    The generations are rendered one by one in a worker thread (the cookiecutter API
+    changes the working directory of the process), while the event loop installs and
+    tests the projects of the previous generations. The limiter and the rendering
+    thread can be shared by the templates run concurrently.
+
+    The generations having a project which failed in its last run are rendered
+    first, and the projects of each generation are queued by priority (see
+    scheduling). Once aborted, the next generations are not rendered.
+
+    In tmpfs workspace mode, the isolated template, the generations and the logs are
+    written into a RAM-backed workspace while its budget is not exhausted (on the
+    disk otherwise), then the logs and the failing projects are copied out. Before
+    installing a generation of the workspace, its install size is estimated and
+    reserved, the generation is moved to the disk if it exceeds the budget.
+
+    Args:
+        limiter (AsyncContextManager[None]): bounds the number of projects installed
+            at the same time
+        render_executor (concurrent.futures.Executor): single thread executor
+            rendering the generations
+        abort (Optional[asyncio.Event]): fail-fast event, see
+            install_pool.install_projects_async
+        project_history (Optional[Dict[str, run_history.ProjectHistory]]): history
+            of the projects of the previous runs, keyed relative to output_dir
+        partition (Optional[sharding.Partition]): only run the generations of this
+            shard
+
+    Raises:
+        ValueError: unknown workspace mode
+
+    Returns:
+        List[install_pool.InstallResult]: result of each project
+    """
+    if workspace_mode not in defaults.WORKSPACES:
+        raise ValueError(
+            "Unknown workspace mode: {workspace_mode}".format(
+                workspace_mode=workspace_mode
+            )
+        )
+    stages = pipeline.sort_stages(
+        stages=pipeline.DEFAULT_STAGES if stages is None else stages
+    )
+    # The rendering thread changes the working directory of the process
+    template_dir = template_dir.absolute()
+    output_dir = output_dir.absolute()
+    log_dir = None if log_dir is None else log_dir.absolute()
+    env_cache_dir = None if env_cache_dir is None else env_cache_dir.absolute()
+    result_cache_dir = None if result_cache_dir is None else result_cache_dir.absolute()
+    ram_workspace = None
+    if workspace_mode == "tmpfs":
+        ram_workspace = workspace.create_workspace(
+            root=workspace_dir, budget=workspace_budget
+        )
+    reservations = workspace.Reservations()
+
+    async def install_generation(
+        generation_dir: pathlib.Path,
+        generation_history: Optional[Dict[str, run_history.ProjectHistory]],
+        key: Optional[str],
+        projects_output_dir: pathlib.Path,
+        projects_log_dir: Optional[pathlib.Path],
+        changed: Optional[List[str]],
+    ) -> List[install_pool.InstallResult]:
+        async with reserve_install(
+            generation_dir=generation_dir,
+            projects_output_dir=projects_output_dir,
+            projects_log_dir=projects_log_dir,
+            output_dir=output_dir,
+            log_dir=log_dir,
+            ram_workspace=ram_workspace,
+            reservations=reservations,
+            env_cache_dir=env_cache_dir,
+        ) as (generation_dir, projects_output_dir, projects_log_dir):
+            project_dirs = scheduling.order_projects(
+                project_dirs=sorted(
+                    f_path for f_path in generation_dir.glob("*") if f_path.is_dir()
+                ),
+                generation_dir=generation_dir,
+                history=generation_history,
+                changed=changed,
+            )
+            results, batches = get_install_batches(
+                generation_dir=generation_dir,
+                project_dirs=project_dirs,
+                stages=stages,
+                changed=changed,
+                history=history,
+            )
+            logging.info(
+                "Installing and testing {n} projects of {generation_dir}".format(
+                    n=len(project_dirs) - len(results), generation_dir=generation_dir
+                )
+            )
+            with recorder.phase(
+                name="install {name}".format(name=generation_dir.name),
+                category="install",
+            ):
+                batch_results = await asyncio.gather(
+                    *[
+                        install_pool.install_projects_async(
+                            project_dirs=batch_project_dirs,
+                            limiter=limiter,
+                            log_dir=projects_log_dir,
+                            output_dir=projects_output_dir,
+                            env_cache_dir=env_cache_dir,
+                            stages=batch_stages,
+                            stage_jobs=stage_jobs,
+                            console=console,
+                            stage_limits=stage_limits,
+                            abort=abort,
+                        )
+                        for batch_stages, batch_project_dirs in batches
+                        if batch_project_dirs
+                    ]
+                )
+            new_results = [result for batch in batch_results for result in batch]
+            recorder.extend(
+                records=[record for result in new_results for record in result.phases]
+            )
+            results.extend(new_results)
+            results.sort(key=lambda result: result.project_dir)
+            if history is not None:
+                history.update((result.project_dir, result) for result in results)
+            if result_cache_dir is not None and key is not None:
+                result_cache.store_result(
+                    cache_dir=result_cache_dir,
+                    key=key,
+                    projects=[result.project_dir.name for result in results],
+                    success=all(result.success for result in results),
+                )
+            return results
+
+    async def run_generations(
+        isolated_template_dir: pathlib.Path,
+        manifest: cache_manifest.Manifest,
+        generations: List[Tuple[Dict[str, str], pathlib.Path]],
+    ) -> List[install_pool.InstallResult]:
+        installs: List["asyncio.Future[List[install_pool.InstallResult]]"] = []
+        try:
+            for i, (extra_context, generation_dir) in enumerate(generations):
+                if abort is not None and abort.is_set():
+                    logging.warning(
+                        "Aborted: {n} generations not rendered".format(
+                            n=len(generations) - i
+                        )
+                    )
+                    break
+                key = None
+                if result_cache_dir is not None:
+                    key = result_cache.compute_result_key(
+                        manifest=manifest,
+                        extra_context=extra_context,
+                        make_targets=[stage.name for stage in stages],
+                    )
+                    cached_results = load_cached_results(
+                        result_cache_dir=result_cache_dir,
+                        key=key,
+                        generation_dir=generation_dir,
+                        force=force,
+                    )
+                    if cached_results is not None:
+                        cached = loop.create_future()
+                        cached.set_result(cached_results)
+                        installs.append(cached)
+                        continue
+                work_generation_dir, projects_output_dir, projects_log_dir = (
+                    get_work_dirs(
+                        generation_dir=generation_dir,
+                        output_dir=output_dir,
+                        log_dir=log_dir,
+                        ram_workspace=ram_workspace,
+                        reserved=reservations.size,
+                    )
+                )
+                with recorder.phase(
+                    name="create {name}".format(name=generation_dir.name),
+                    category="create",
+                ):
+                    changed = await loop.run_in_executor(
+                        render_executor,
+                        functools.partial(
+                            get_render_function(
+                                incremental=incremental, manifest=manifest
+                            ),
+                            template_dir=isolated_template_dir,
+                            output_dir=work_generation_dir,
+                            extra_context=extra_context,
+                            backend=render_backend,
+                            console=console,
+                        ),
+                    )
+                installs.append(
+                    asyncio.ensure_future(
+                        install_generation(
+                            generation_dir=work_generation_dir,
+                            generation_history=(
+                                None
+                                if project_history is None
+                                else run_history.get_sub_history(
+                                    history=project_history,
+                                    key=run_history.get_project_key(
+                                        project_dir=generation_dir,
+                                        output_dir=output_dir,
+                                    ),
+                                )
+                            ),
+                            key=key,
+                            projects_output_dir=projects_output_dir,
+                            projects_log_dir=projects_log_dir,
+                            changed=changed if incremental else None,
+                        )
+                    )
+                )
+            generation_results = await asyncio.gather(*installs)
+        except BaseException:
+            for install in installs:
+                install.cancel()
+            await asyncio.gather(*installs, return_exceptions=True)
+            raise
+        return [result for results in generation_results for result in results]
+
+    loop = asyncio.get_event_loop()
+    try:
+        isolated_template_dir = template_dir.joinpath(".template_cache")
+        if ram_workspace is not None and workspace.has_room(workspace=ram_workspace):
+            isolated_template_dir = ram_workspace.template_dir
+        with recorder.phase(name="isolate"):
+            manifest = await loop.run_in_executor(
+                None,
+                functools.partial(
+                    isolate_temp_template.run,
+                    template_dir=template_dir,
+                    cache_dir=isolated_template_dir,
+                    link_mode=link_mode,
+                    copy_workers=copy_workers,
+                ),
+            )
+        generations = get_generations(
+            template_dir=isolated_template_dir,
+            output_dir=output_dir,
+            matrix=matrix,
+            matrix_sample=matrix_sample,
+            matrix_seed=matrix_seed,
+        )
+        if partition is not None:
+            generations = sharding.select_generations(
+                generations=generations, output_dir=output_dir, partition=partition
+            )
+        generations = scheduling.order_generations(
+            generations=generations, output_dir=output_dir, history=project_history
+        )
+        results = await run_generations(
+            isolated_template_dir=isolated_template_dir,
+            manifest=manifest,
+            generations=generations,
+        )
+        if ram_workspace is not None:
+            with recorder.phase(name="copy out"):
+                results = await loop.run_in_executor(
+                    None,
+                    functools.partial(
+                        workspace.copy_out,
+                        workspace=ram_workspace,
+                        results=results,
+                        output_dir=output_dir,
+                        log_dir=log_dir,
+                    ),
+                )
+        return results
+    finally:
+        if ram_workspace is not None:
+            workspace.remove_workspace(workspace=ram_workspace)
+
+
+def get_render_function(
+    incremental: bool, manifest: cache_manifest.Manifest
+) -> Callable[..., Any]:
+    """Get the function rendering a generation
+
+    Args:
+        incremental (bool): only write the output files whose content changed
+        manifest (cache_manifest.Manifest): manifest of the isolated template
+
+    Returns:
+        Callable[..., Any]: function taking the arguments of
+        initialize_project.create_project
+    """
+    if incremental:
+        return functools.partial(
+            incremental_render.render_incremental, manifest=manifest
+        )
+    return initialize_project.create_project
+
+
+def get_install_batches(
+    generation_dir: pathlib.Path,
+    project_dirs: List[pathlib.Path],
+    stages: List[pipeline.Stage],
+    changed: Optional[List[str]],
+    history: Optional[Dict[pathlib.Path, install_pool.InstallResult]],
+) -> Tuple[
+    List[install_pool.InstallResult],
+    List[Tuple[List[pipeline.Stage], List[pathlib.Path]]],
+]:
+    """Get the stages to be run for the projects of a generation
+
+    Args:
+        generation_dir (pathlib.Path): generation directory path
+        project_dirs (List[pathlib.Path]): projects of the generation
+        stages (List[pipeline.Stage]): stages of the run
+        changed (Optional[List[str]]): output files written or removed by the
+            incremental rendering, all the projects are run if not specified
+        history (Optional[Dict[pathlib.Path, install_pool.InstallResult]]): result of
+            the last run of each project, all the projects are run if not specified
+
+    Returns:
+        Tuple[List[install_pool.InstallResult], List[Tuple[List[pipeline.Stage],
+        List[pathlib.Path]]]]:
+        - results reused from the history
+        - stages and projects of each batch to be run
+    """
+    if history is None or changed is None:
+        return [], [(stages, project_dirs)]
+    reused, full, without_install = template_watcher.plan_reruns(
+        generation_dir=generation_dir,
+        project_dirs=project_dirs,
+        changed=changed,
+        history=history,
+    )
+    return reused, [
+        (stages, full),
+        (
+            pipeline.remove_stages(
+                stages=stages, names=[template_watcher.INSTALL_STAGE]
+            ),
+            without_install,
+        ),
+    ]
+
+
+def get_work_dirs(
+    generation_dir: pathlib.Path,
+    output_dir: pathlib.Path,
+    log_dir: Optional[pathlib.Path],
+    ram_workspace: Optional[workspace.Workspace],
+    reserved: int = 0,
+) -> Tuple[pathlib.Path, pathlib.Path, Optional[pathlib.Path]]:
+    """Get the directories a generation is written to, in the RAM-backed workspace
+    while it has room
+
+    Args:
+        generation_dir (pathlib.Path): generation directory path in output_dir
+        output_dir (pathlib.Path): output directory path on the disk
+        log_dir (Optional[pathlib.Path]): log directory path on the disk
+        ram_workspace (Optional[workspace.Workspace]): workspace of the tmpfs mode
+        reserved (int): bytes the generations being installed in the workspace are
+            expected to write, see workspace.estimate_install_size
+
+    Returns:
+        Tuple[pathlib.Path, pathlib.Path, Optional[pathlib.Path]]:
+        - generation directory path
+        - directory containing the projects, mirrored in the log directory
+        - log directory path
+    """
+    if ram_workspace is None or not workspace.has_room(
+        workspace=ram_workspace, size=reserved
+    ):
+        return generation_dir, output_dir, log_dir
+    return (
+        ram_workspace.output_dir.joinpath(generation_dir.relative_to(output_dir)),
+        ram_workspace.output_dir,
+        None if log_dir is None else ram_workspace.log_dir,
+    )
+
+
+def place_generation(
+    generation_dir: pathlib.Path,
+    projects_output_dir: pathlib.Path,
+    projects_log_dir: Optional[pathlib.Path],
+    output_dir: pathlib.Path,
+    log_dir: Optional[pathlib.Path],
+    ram_workspace: Optional[workspace.Workspace],
+    reserved: int,
+    env_cache_dir: Optional[pathlib.Path],
+) -> Tuple[pathlib.Path, pathlib.Path, Optional[pathlib.Path], int]:
+    """Keep a rendered generation in the RAM-backed workspace if it has room for its
+    install, move it to the disk otherwise
+
+    The make-targets write environments, build outputs and caches into the projects,
+    thus the room is checked again before the install, with the size of the other
+    generations being installed.
+
+    Args:
+        generation_dir (pathlib.Path): rendered generation directory path
+        projects_output_dir (pathlib.Path): directory containing the projects, see
+            get_work_dirs
+        projects_log_dir (Optional[pathlib.Path]): log directory path, see
+            get_work_dirs
+        output_dir (pathlib.Path): output directory path on the disk
+        log_dir (Optional[pathlib.Path]): log directory path on the disk
+        ram_workspace (Optional[workspace.Workspace]): workspace of the tmpfs mode
+        reserved (int): bytes the generations being installed in the workspace are
+            expected to write
+        env_cache_dir (Optional[pathlib.Path]): virtual environment cache directory
+
+    Returns:
+        Tuple[pathlib.Path, pathlib.Path, Optional[pathlib.Path], int]:
+        - generation directory path
+        - directory containing the projects
+        - log directory path
+        - bytes to reserve for the install, 0 on the disk
+    """
+    if ram_workspace is None or projects_output_dir != ram_workspace.output_dir:
+        return generation_dir, projects_output_dir, projects_log_dir, 0
+    size = workspace.estimate_install_size(
+        project_dirs=[f_path for f_path in generation_dir.glob("*") if f_path.is_dir()],
+        env_cache_dir=env_cache_dir,
+    )
+    if workspace.has_room(workspace=ram_workspace, size=reserved + size):
+        return generation_dir, projects_output_dir, projects_log_dir, size
+    disk_generation_dir = output_dir.joinpath(
+        generation_dir.relative_to(ram_workspace.output_dir)
+    )
+    logging.warning(
+        "The workspace has no room to install {generation_dir}, installing it on the"
+        " disk".format(generation_dir=disk_generation_dir)
+    )
+    workspace.move_tree(src_dir=generation_dir, dest_dir=disk_generation_dir)
+    return disk_generation_dir, output_dir, log_dir, 0
+
+
+@contextlib.asynccontextmanager
+async def reserve_install(
+    generation_dir: pathlib.Path,
+    projects_output_dir: pathlib.Path,
+    projects_log_dir: Optional[pathlib.Path],
+    output_dir: pathlib.Path,
+    log_dir: Optional[pathlib.Path],
+    ram_workspace: Optional[workspace.Workspace],
+    reservations: workspace.Reservations,
+    env_cache_dir: Optional[pathlib.Path],
+) -> AsyncIterator[Tuple[pathlib.Path, pathlib.Path, Optional[pathlib.Path]]]:
+    """Place a rendered generation for its install, reserving its install size in the
+    workspace until the install is done (the written files are then counted by the
+    usage of the workspace), see place_generation for the arguments
+
+    Yields:
+        Iterator[Tuple[pathlib.Path, pathlib.Path, Optional[pathlib.Path]]]:
+        - generation directory path
+        - directory containing the projects
+        - log directory path
+    """
+    loop = asyncio.get_event_loop()
+    async with reservations.lock:
+        generation_dir, projects_output_dir, projects_log_dir, size = (
+            await loop.run_in_executor(
+                None,
+                functools.partial(
+                    place_generation,
+                    generation_dir=generation_dir,
+                    projects_output_dir=projects_output_dir,
+                    projects_log_dir=projects_log_dir,
+                    output_dir=output_dir,
+                    log_dir=log_dir,
+                    ram_workspace=ram_workspace,
+                    reserved=reservations.size,
+                    env_cache_dir=env_cache_dir,
+                ),
+            )
+        )
+        reservations.size += size
+    try:
+        yield generation_dir, projects_output_dir, projects_log_dir
+    finally:
+        reservations.size -= size
+
+
+def load_cached_results(
+    result_cache_dir: pathlib.Path,
+    key: str,
+    generation_dir: pathlib.Path,
+    force: bool = False,
+) -> Optional[List[install_pool.InstallResult]]:
+    """Load the results of a generation which already succeeded
+
+    Args:
+        result_cache_dir (pathlib.Path): result cache directory path
+        key (str): key of the generation, see result_cache.compute_result_key
+        generation_dir (pathlib.Path): generation directory path
+        force (bool): ignore the cached results
+
+    Returns:
+        Optional[List[install_pool.InstallResult]]: cached successful results, None
+        if the generation must be run
+    """
+    cached = result_cache.load_result(cache_dir=result_cache_dir, key=key)
+    if force or cached is None or cached.get("success") is not True:
+        return None
+    logging.info(
+        "Skipping {generation_dir}, already succeeded ({key})".format(
+            generation_dir=generation_dir, key=key
+        )
+    )
+    return [
+        install_pool.InstallResult(
+            project_dir=generation_dir.joinpath(name),
+            success=True,
+            message="",
+            log_path=None,
+            cached=True,
+        )
+        for name in cached["projects"]
+    ]
+
+
+def write_reports(
+    recorder: instrumentation.Recorder,
+    results: List[install_pool.InstallResult],
+    report_path: Optional[pathlib.Path] = None,
+    junit_path: Optional[pathlib.Path] = None,
+    trace_path: Optional[pathlib.Path] = None,
+) -> None:
+    """Write the machine-readable reports of a run
+
+    Args:
+        recorder (instrumentation.Recorder): recorded phases of the run
+        results (List[install_pool.InstallResult]): result of each project
+        report_path (Optional[pathlib.Path]): JSON report path
+        junit_path (Optional[pathlib.Path]): JUnit XML report path
+        trace_path (Optional[pathlib.Path]): Chrome trace-event file path
+    """
+    if report_path is not None:
+        instrumentation.write_json_report(
+            report_path=report_path,
+            records=recorder.records,
+            extra={
+                "projects": [
+                    {
+                        "project_dir": str(result.project_dir),
+                        "success": result.success,
+                        "cached": result.cached,
+                        "failure_kind": result.failure_kind,
+                        "log_path": str(result.log_path) if result.log_path else None,
+                    }
+                    for result in results
+                ]
+            },
+        )
+    if junit_path is not None:
+        instrumentation.write_junit_report(
+            report_path=junit_path, records=recorder.records
+        )
+    if trace_path is not None:
+        instrumentation.write_chrome_trace(
+            trace_path=trace_path, records=recorder.records
+        )
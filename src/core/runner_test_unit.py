@@ -0,0 +1,447 @@
+import json
+import logging
+import pathlib
+import shutil
+from typing import Dict, List
+
+import pytest
+
+from . import install_pool, run_history
+from . import runner as test_module
+from . import workspace
+
+logging.basicConfig(level=logging.INFO)
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "runner_test_assets"
+)
+
+
+class Test_run:
+    def test_run_case_1(self) -> None:
+        def assert_content(f_path: pathlib.Path, expected: str) -> None:
+            assert f_path.is_file()
+            with open(f_path, "r") as f:
+                assert f.read() == expected
+
+        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        if cache_dir.is_dir():
+            shutil.rmtree(cache_dir)
+        history_path = TEST_ASSETS_DIR.joinpath(".test_history.json")
+        test_module.run(
+            template_dir=TEST_ASSETS_DIR.joinpath("run_case_1"),
+            output_dir=cache_dir,
+            history_path=history_path,
+        )
+        f_paths = list(cache_dir.glob("*"))
+        assert len(f_paths) == 1
+        project_dir = f_paths[0]
+        assert not project_dir.joinpath(".git").is_dir()
+        assert_content(
+            f_path=project_dir.joinpath("testing_module").joinpath("default"),
+            expected="test",
+        )
+        assert_content(
+            f_path=project_dir.joinpath("testing_module").joinpath("install"),
+            expected="Installing\n",
+        )
+        assert_content(
+            f_path=project_dir.joinpath("testing_module").joinpath("lint"),
+            expected="Linting\n",
+        )
+        assert_content(
+            f_path=project_dir.joinpath("testing_module").joinpath("check"),
+            expected="Checking\n",
+        )
+        assert_content(
+            f_path=project_dir.joinpath("testing_module").joinpath("test"),
+            expected="Testing\n",
+        )
+        history = run_history.load_history(history_path=history_path)
+        assert list(history) == [project_dir.name]
+        assert history[project_dir.name].success
+        assert sorted(history[project_dir.name].stages) == [
+            "check",
+            "install",
+            "lint",
+            "test",
+        ]
+        shutil.rmtree(cache_dir)
+        history_path.unlink()
+
+    def test_run_case_2_matrix(self) -> None:
+        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        if cache_dir.is_dir():
+            shutil.rmtree(cache_dir)
+        test_module.run(
+            template_dir=TEST_ASSETS_DIR.joinpath("run_case_2_matrix"),
+            output_dir=cache_dir,
+            jobs=2,
+            matrix=["flavour"],
+            link_mode="hardlink",
+        )
+        generation_dirs = sorted(cache_dir.glob("*"))
+        assert [f_path.name for f_path in generation_dirs] == [
+            "0000_flavour-app",
+            "0001_flavour-lib",
+            "0002_flavour-cli",
+        ]
+        for generation_dir, flavour in zip(generation_dirs, ["app", "lib", "cli"]):
+            with open(generation_dir.joinpath("testing", "version"), "r") as f:
+                assert f.read() == "3.7-{flavour}".format(flavour=flavour)
+        shutil.rmtree(cache_dir)
+
+    def test_run_shards(self) -> None:
+        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        if cache_dir.is_dir():
+            shutil.rmtree(cache_dir)
+        result_paths = [
+            cache_dir.joinpath("shard_{index}.json".format(index=index))
+            for index in range(2)
+        ]
+        history_path = cache_dir.joinpath("history.json")
+        for index, result_path in enumerate(result_paths):
+            test_module.run(
+                template_dir=TEST_ASSETS_DIR.joinpath("run_case_2_matrix"),
+                output_dir=cache_dir.joinpath("shard_{index}".format(index=index)),
+                matrix=["flavour"],
+                history_path=history_path,
+                shard_index=index,
+                shard_count=2,
+                shard_result_path=result_path,
+            )
+            # The next shards are partitioned from the same history
+            assert not history_path.exists()
+        assert [
+            sorted(f_path.name for f_path in cache_dir.joinpath(name).glob("*"))
+            for name in ["shard_0", "shard_1"]
+        ] == [["0000_flavour-app", "0002_flavour-cli"], ["0001_flavour-lib"]]
+
+        report_path = cache_dir.joinpath("report.json")
+        results = test_module.merge_shards(
+            result_paths=result_paths,
+            output_dir=cache_dir,
+            report_path=report_path,
+            history_path=history_path,
+        )
+        assert [result.project_dir for result in results] == [
+            cache_dir.joinpath(name, "testing")
+            for name in ["0000_flavour-app", "0001_flavour-lib", "0002_flavour-cli"]
+        ]
+        with open(report_path, "r") as f:
+            assert len(json.load(f)["projects"]) == 3
+        assert sorted(run_history.load_history(history_path=history_path)) == [
+            "0000_flavour-app/testing",
+            "0001_flavour-lib/testing",
+            "0002_flavour-cli/testing",
+        ]
+        with pytest.raises(ValueError):
+            test_module.merge_shards(
+                result_paths=result_paths[:1], output_dir=cache_dir
+            )
+        with pytest.raises(ValueError):
+            test_module.run(
+                template_dir=TEST_ASSETS_DIR.joinpath("run_case_2_matrix"),
+                output_dir=cache_dir,
+                shard_index=2,
+                shard_count=2,
+            )
+        shutil.rmtree(cache_dir)
+
+    def test_run_fail_fast(self) -> None:
+        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        if cache_dir.is_dir():
+            shutil.rmtree(cache_dir)
+        history_path = TEST_ASSETS_DIR.joinpath(".test_history.json")
+        if history_path.is_file():
+            history_path.unlink()
+        template_dir = TEST_ASSETS_DIR.joinpath("run_case_3_failing")
+        generation_dirs = [
+            cache_dir.joinpath(name)
+            for name in ["0000_flavour-app", "0001_flavour-lib", "0002_flavour-cli"]
+        ]
+
+        # All the projects are run and reported
+        with pytest.raises(RuntimeError) as e:
+            test_module.run(
+                template_dir=template_dir,
+                output_dir=cache_dir,
+                matrix=["flavour"],
+                history_path=history_path,
+            )
+        assert str(e.value).splitlines() == [
+            "2 passed, 1 failed",
+            "PASSED {project_dir}".format(
+                project_dir=generation_dirs[0].joinpath("testing")
+            ),
+            "FAILED {project_dir}".format(
+                project_dir=generation_dirs[1].joinpath("testing")
+            ),
+            "PASSED {project_dir}".format(
+                project_dir=generation_dirs[2].joinpath("testing")
+            ),
+        ]
+
+        # The project which failed runs first and stops the run
+        with pytest.raises(RuntimeError) as e:
+            test_module.run(
+                template_dir=template_dir,
+                output_dir=cache_dir,
+                matrix=["flavour"],
+                history_path=history_path,
+                fail_fast=True,
+            )
+        lines = str(e.value).splitlines()
+        assert lines[0].startswith("0 passed, 1 failed")
+        assert lines[1] == "FAILED {project_dir}".format(
+            project_dir=generation_dirs[1].joinpath("testing")
+        )
+        assert all(line.startswith("ABORTED") for line in lines[2:])
+        history = run_history.load_history(history_path=history_path)
+        assert [entry.success for _, entry in sorted(history.items())] == [
+            True,
+            False,
+            True,
+        ]
+        shutil.rmtree(cache_dir)
+        history_path.unlink()
+
+    def test_run_result_cache(self) -> None:
+        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        result_cache_dir = TEST_ASSETS_DIR.joinpath(".test_results")
+        for f_dir in [cache_dir, result_cache_dir]:
+            if f_dir.is_dir():
+                shutil.rmtree(f_dir)
+        template_dir = TEST_ASSETS_DIR.joinpath("run_case_1")
+        test_module.run(
+            template_dir=template_dir,
+            output_dir=cache_dir,
+            result_cache_dir=result_cache_dir,
+        )
+        assert len(list(result_cache_dir.glob("*.json"))) == 1
+
+        # The unchanged template is not generated again
+        shutil.rmtree(cache_dir)
+        test_module.run(
+            template_dir=template_dir,
+            output_dir=cache_dir,
+            result_cache_dir=result_cache_dir,
+        )
+        assert not cache_dir.is_dir()
+
+        # Unless forced
+        test_module.run(
+            template_dir=template_dir,
+            output_dir=cache_dir,
+            result_cache_dir=result_cache_dir,
+            force=True,
+        )
+        assert cache_dir.joinpath("testing").is_dir()
+        shutil.rmtree(cache_dir)
+        shutil.rmtree(result_cache_dir)
+
+    def test_run_reports(self) -> None:
+        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        reports_dir = TEST_ASSETS_DIR.joinpath(".test_reports")
+        for f_dir in [cache_dir, reports_dir]:
+            if f_dir.is_dir():
+                shutil.rmtree(f_dir)
+        test_module.run(
+            template_dir=TEST_ASSETS_DIR.joinpath("run_case_1"),
+            output_dir=cache_dir,
+            report_path=reports_dir.joinpath("report.json"),
+            junit_path=reports_dir.joinpath("junit.xml"),
+            trace_path=reports_dir.joinpath("trace.json"),
+        )
+        with open(reports_dir.joinpath("report.json"), "r") as f:
+            report = json.load(f)
+        assert [project["success"] for project in report["projects"]] == [True]
+        categories = set(phase["category"] for phase in report["phases"])
+        assert categories == {"phase", "create", "install", "project", "make-target"}
+        assert reports_dir.joinpath("junit.xml").is_file()
+        assert reports_dir.joinpath("trace.json").is_file()
+        shutil.rmtree(cache_dir)
+        shutil.rmtree(reports_dir)
+
+    def test_run_tmpfs_workspace(self) -> None:
+        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        log_dir = TEST_ASSETS_DIR.joinpath(".test_logs")
+        workspace_dir = TEST_ASSETS_DIR.joinpath(".test_workspace")
+        for f_dir in [cache_dir, log_dir, workspace_dir]:
+            if f_dir.is_dir():
+                shutil.rmtree(f_dir)
+        workspace_dir.mkdir()
+        template_dir = TEST_ASSETS_DIR.joinpath("run_case_1")
+        test_module.run(
+            template_dir=template_dir,
+            output_dir=cache_dir,
+            log_dir=log_dir,
+            workspace_mode="tmpfs",
+            workspace_dir=workspace_dir,
+        )
+        # Only the logs are copied out of the workspace, then it is removed
+        assert log_dir.joinpath("testing.log").is_file()
+        assert not cache_dir.joinpath("testing").exists()
+        assert list(workspace_dir.iterdir()) == []
+        for f_dir in [log_dir, workspace_dir]:
+            shutil.rmtree(f_dir)
+
+    def test_place_generation(self) -> None:
+        output_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        workspace_dir = TEST_ASSETS_DIR.joinpath(".test_workspace")
+        for f_dir in [output_dir, workspace_dir]:
+            if f_dir.is_dir():
+                shutil.rmtree(f_dir)
+        workspace_dir.mkdir()
+        ram_workspace = workspace.create_workspace(root=workspace_dir, budget=1024**2)
+        assert ram_workspace is not None
+        generation_dir = ram_workspace.output_dir.joinpath("generation")
+        generation_dir.joinpath("project").mkdir(parents=True)
+        generation_dir.joinpath("project", "README.md").write_text("r" * 1024)
+        placed = test_module.place_generation(
+            generation_dir=generation_dir,
+            projects_output_dir=ram_workspace.output_dir,
+            projects_log_dir=ram_workspace.log_dir,
+            output_dir=output_dir,
+            log_dir=None,
+            ram_workspace=ram_workspace,
+            reserved=0,
+            env_cache_dir=None,
+        )
+        assert placed == (
+            generation_dir,
+            ram_workspace.output_dir,
+            ram_workspace.log_dir,
+            1024,
+        )
+        # The generations being installed leave no room, it is moved to the disk
+        placed = test_module.place_generation(
+            generation_dir=generation_dir,
+            projects_output_dir=ram_workspace.output_dir,
+            projects_log_dir=ram_workspace.log_dir,
+            output_dir=output_dir,
+            log_dir=None,
+            ram_workspace=ram_workspace,
+            reserved=1024**2,
+            env_cache_dir=None,
+        )
+        assert placed == (output_dir.joinpath("generation"), output_dir, None, 0)
+        assert not generation_dir.exists()
+        assert output_dir.joinpath("generation", "project", "README.md").is_file()
+        workspace.remove_workspace(workspace=ram_workspace)
+        for f_dir in [output_dir, workspace_dir]:
+            shutil.rmtree(f_dir)
+
+    def test_run_incremental_render(self) -> None:
+        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        if cache_dir.is_dir():
+            shutil.rmtree(cache_dir)
+        template_dir = TEST_ASSETS_DIR.joinpath("run_case_1")
+        test_module.run(
+            template_dir=template_dir, output_dir=cache_dir, incremental=True
+        )
+        readme_path = cache_dir.joinpath("testing", "README.md")
+        mtime_ns = readme_path.stat().st_mtime_ns
+        test_module.run(
+            template_dir=template_dir, output_dir=cache_dir, incremental=True
+        )
+        assert readme_path.stat().st_mtime_ns == mtime_ns
+        shutil.rmtree(cache_dir)
+
+    def test_run_history(self) -> None:
+        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        if cache_dir.is_dir():
+            shutil.rmtree(cache_dir)
+        report_path = TEST_ASSETS_DIR.joinpath(".test_reports", "report.json")
+        template_dir = TEST_ASSETS_DIR.joinpath("run_case_1")
+        history: Dict[pathlib.Path, install_pool.InstallResult] = {}
+
+        def get_make_targets() -> List[str]:
+            with open(report_path, "r") as f:
+                report = json.load(f)
+            return sorted(
+                phase["name"]
+                for phase in report["phases"]
+                if phase["category"] == "make-target"
+            )
+
+        test_module.run(
+            template_dir=template_dir,
+            output_dir=cache_dir,
+            incremental=True,
+            history=history,
+            report_path=report_path,
+        )
+        assert list(history) == [cache_dir.absolute().joinpath("testing")]
+        assert "install" in get_make_targets()
+
+        # Nothing changed, the previous result is reused
+        test_module.run(
+            template_dir=template_dir,
+            output_dir=cache_dir,
+            incremental=True,
+            history=history,
+            report_path=report_path,
+        )
+        assert get_make_targets() == []
+
+        # A rendered file changed, the project is rerun without the install stage
+        cache_dir.joinpath("testing", "README.md").write_text("changed")
+        test_module.run(
+            template_dir=template_dir,
+            output_dir=cache_dir,
+            incremental=True,
+            history=history,
+            report_path=report_path,
+        )
+        assert get_make_targets() == ["check", "lint", "test"]
+        shutil.rmtree(cache_dir)
+        shutil.rmtree(report_path.parent)
+
+    def test_watch(self) -> None:
+        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        if cache_dir.is_dir():
+            shutil.rmtree(cache_dir)
+        template_dir = TEST_ASSETS_DIR.joinpath("run_case_1")
+        with pytest.raises(ValueError):
+            test_module.watch(
+                template_dir=template_dir,
+                output_dir=cache_dir,
+                max_runs=1,
+                workspace_mode="tmpfs",
+            )
+        test_module.watch(template_dir=template_dir, output_dir=cache_dir, max_runs=1)
+        assert cache_dir.joinpath("testing", "README.md").is_file()
+        shutil.rmtree(cache_dir)
+
+    def test_run_batch(self) -> None:
+        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
+        if cache_dir.is_dir():
+            shutil.rmtree(cache_dir)
+        log_dir = TEST_ASSETS_DIR.joinpath(".test_logs")
+        template_dirs = [
+            TEST_ASSETS_DIR.joinpath("run_case_1"),
+            TEST_ASSETS_DIR.joinpath("run_case_2_matrix"),
+        ]
+        results = test_module.run_batch(
+            template_dirs=template_dirs, output_dir=cache_dir, jobs=2, log_dir=log_dir
+        )
+        assert sorted(results) == ["run_case_1", "run_case_2_matrix"]
+        for name, template_results in results.items():
+            assert [result.project_dir for result in template_results] == [
+                cache_dir.joinpath(name, "testing").absolute()
+            ]
+            assert log_dir.joinpath(name, "testing.log").is_file()
+
+        # A failing template does not stop the others
+        with pytest.raises(RuntimeError) as e:
+            test_module.run_batch(
+                template_dirs=template_dirs[:1] + [TEST_ASSETS_DIR],
+                output_dir=cache_dir,
+            )
+        assert "1 templates passed, 1 failed" in str(e.value)
+        assert "runner_test_assets: ERROR Invalid template directory" in str(e.value)
+        with pytest.raises(ValueError):
+            test_module.run_batch(template_dirs=[], output_dir=cache_dir)
+        shutil.rmtree(cache_dir)
+        shutil.rmtree(log_dir)
@@ -0,0 +1,131 @@
+import logging
+import pathlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.core import run_history
+
+# Priorities of the projects, the lowest first
+FAILED_PRIORITY = 0
+CHANGED_PRIORITY = 1
+UNCHANGED_PRIORITY = 2
+
+
+def get_priority(
+    key: str,
+    history: Optional[Dict[str, run_history.ProjectHistory]],
+    changed: Optional[Set[str]],
+) -> int:
+    """Get the scheduling priority of a project
+
+    Args:
+        key (str): key of the project relative to its generation, see
+            run_history.get_project_key
+        history (Optional[Dict[str, run_history.ProjectHistory]]): history of the
+            projects of the generation, unknown if not specified
+        changed (Optional[Set[str]]): keys of the projects whose rendered files
+            changed, unknown if not specified
+
+    Returns:
+        int: FAILED_PRIORITY if the project failed in its last run, CHANGED_PRIORITY
+        if its rendered files changed or it never ran, UNCHANGED_PRIORITY otherwise
+    """
+    if history is not None:
+        previous = history.get(key)
+        if previous is not None and not previous.success:
+            return FAILED_PRIORITY
+        if previous is None:
+            return CHANGED_PRIORITY
+    if changed is not None and key in changed:
+        return CHANGED_PRIORITY
+    return UNCHANGED_PRIORITY
+
+
+def order_generations(
+    generations: List[Tuple[Dict[str, str], pathlib.Path]],
+    output_dir: pathlib.Path,
+    history: Optional[Dict[str, run_history.ProjectHistory]],
+) -> List[Tuple[Dict[str, str], pathlib.Path]]:
+    """Render first the generations having a project which failed in its last run
+
+    Args:
+        generations (List[Tuple[Dict[str, str], pathlib.Path]]): extra context and
+            output directory of each generation of the run
+        output_dir (pathlib.Path): output directory path containing the generations
+        history (Optional[Dict[str, run_history.ProjectHistory]]): history of the
+            projects of the run, the order is kept if not specified
+
+    Returns:
+        List[Tuple[Dict[str, str], pathlib.Path]]: the generations, the failing ones
+        first, in the run order otherwise
+    """
+    if not history:
+        return generations
+
+    def has_failed(generation_dir: pathlib.Path) -> bool:
+        return any(
+            not entry.success
+            for entry in run_history.get_sub_history(
+                history=history or {},
+                key=run_history.get_project_key(
+                    project_dir=generation_dir, output_dir=output_dir
+                ),
+            ).values()
+        )
+
+    return sorted(
+        generations, key=lambda generation: not has_failed(generation_dir=generation[1])
+    )
+
+
+def order_projects(
+    project_dirs: List[pathlib.Path],
+    generation_dir: pathlib.Path,
+    history: Optional[Dict[str, run_history.ProjectHistory]],
+    changed: Optional[List[str]],
+) -> List[pathlib.Path]:
+    """Order the projects of a generation, the projects which failed in their last
+    run first, then the projects whose rendered files changed or which never ran
+
+    The limiter of the run serves the projects in the order they are queued, so the
+    likely failures are reported without waiting for the passing projects.
+
+    Args:
+        project_dirs (List[pathlib.Path]): projects of the generation
+        generation_dir (pathlib.Path): generation directory path
+        history (Optional[Dict[str, run_history.ProjectHistory]]): history of the
+            projects of the generation, keyed relative to generation_dir (see
+            run_history.get_sub_history)
+        changed (Optional[List[str]]): output files written or removed by the
+            incremental rendering, relative to generation_dir
+
+    Returns:
+        List[pathlib.Path]: the projects by priority, in the given order otherwise
+    """
+    changed_projects = (
+        None if changed is None else set(f_path.partition("/")[0] for f_path in changed)
+    )
+    priorities = {
+        project_dir: get_priority(
+            key=run_history.get_project_key(
+                project_dir=project_dir, output_dir=generation_dir
+            ),
+            history=history,
+            changed=changed_projects,
+        )
+        for project_dir in project_dirs
+    }
+    ordered = sorted(project_dirs, key=lambda project_dir: priorities[project_dir])
+    n_failed = len(
+        [priority for priority in priorities.values() if priority == FAILED_PRIORITY]
+    )
+    n_changed = len(
+        [priority for priority in priorities.values() if priority == CHANGED_PRIORITY]
+    )
+    if ordered != project_dirs:
+        logging.info(
+            "Running first {n_failed} projects of {generation_dir} which failed in"
+            " their last run, then {n_changed} changed or new projects".format(
+                n_failed=n_failed, generation_dir=generation_dir, n_changed=n_changed
+            )
+        )
+    return ordered
@@ -0,0 +1,95 @@
+import pathlib
+
+from . import run_history
+from . import scheduling as test_module
+
+
+def get_history(success: bool) -> run_history.ProjectHistory:
+    return run_history.ProjectHistory(
+        success=success,
+        failure_kind="" if success else "failed",
+        finished_at=0.0,
+        wall_time=1.0,
+        stages={"install": 1.0},
+    )
+
+
+def test_get_priority() -> None:
+    history = {
+        "failed": get_history(success=False),
+        "passed": get_history(success=True),
+    }
+    assert [
+        test_module.get_priority(key=key, history=history, changed={"passed"})
+        for key in ["failed", "passed", "new"]
+    ] == [
+        test_module.FAILED_PRIORITY,
+        test_module.CHANGED_PRIORITY,
+        test_module.CHANGED_PRIORITY,
+    ]
+    assert test_module.get_priority(key="passed", history=history, changed=set()) == (
+        test_module.UNCHANGED_PRIORITY
+    )
+    # Unknown history and changes
+    assert test_module.get_priority(key="new", history=None, changed=None) == (
+        test_module.UNCHANGED_PRIORITY
+    )
+
+
+def test_order_projects() -> None:
+    generation_dir = pathlib.Path("output", "0000_flavour-app")
+    project_dirs = [generation_dir.joinpath(name) for name in ["a", "b", "c", "d", "e"]]
+    history = {
+        "a": get_history(success=True),
+        "b": get_history(success=True),
+        "c": get_history(success=True),
+        "d": get_history(success=False),
+    }
+    assert test_module.order_projects(
+        project_dirs=project_dirs,
+        generation_dir=generation_dir,
+        history=history,
+        changed=["c/setup.cfg", "c/src/main.py"],
+    ) == [project_dirs[i] for i in [3, 2, 4, 0, 1]]
+    assert test_module.order_projects(
+        project_dirs=project_dirs,
+        generation_dir=generation_dir,
+        history=None,
+        changed=["e/Makefile"],
+    ) == [project_dirs[i] for i in [4, 0, 1, 2, 3]]
+    assert (
+        test_module.order_projects(
+            project_dirs=project_dirs,
+            generation_dir=generation_dir,
+            history=None,
+            changed=None,
+        )
+        == project_dirs
+    )
+
+
+def test_order_generations() -> None:
+    output_dir = pathlib.Path("output")
+    generations = [
+        (
+            {"flavour": flavour},
+            output_dir.joinpath(
+                "{i:04d}_flavour-{flavour}".format(i=i, flavour=flavour)
+            ),
+        )
+        for i, flavour in enumerate(["app", "lib", "cli"])
+    ]
+    history = {
+        "0000_flavour-app/testing": get_history(success=True),
+        "0001_flavour-lib/testing": get_history(success=True),
+        "0002_flavour-cli/testing": get_history(success=False),
+    }
+    assert test_module.order_generations(
+        generations=generations, output_dir=output_dir, history=history
+    ) == [generations[i] for i in [2, 0, 1]]
+    assert (
+        test_module.order_generations(
+            generations=generations, output_dir=output_dir, history=None
+        )
+        == generations
+    )
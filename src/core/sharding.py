@@ -0,0 +1,463 @@
+import collections
+import hashlib
+import json
+import logging
+import os
+import pathlib
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from src.core import install_pool, instrumentation, run_history
+
+SHARD_RESULT_VERSION = 2
+
+
+class Shard(NamedTuple):
+    shard_index: int
+    shard_count: int
+    # History of the previous runs, the same one must be given to every shard, see
+    # create_shard
+    history: Optional[Dict[str, run_history.ProjectHistory]] = None
+
+
+class Partition(NamedTuple):
+    # Digest of the assignment of every generation of the run to its shard, the
+    # shards of one run must have the same one
+    digest: str
+    # Keys of the generations of the shard (see run_history.get_project_key)
+    generations: List[str]
+
+
+class ShardResult(NamedTuple):
+    shard_index: int
+    shard_count: int
+    # False if the shard stopped before all of its projects ran
+    complete: bool
+    partition: Partition
+    results: List[install_pool.InstallResult]
+    records: List[instrumentation.PhaseRecord]
+
+
+def create_shard(
+    index: int,
+    count: int,
+    history: Optional[Dict[str, run_history.ProjectHistory]] = None,
+) -> Shard:
+    """Create a shard of a run
+
+    Args:
+        index (int): index of the shard, from 0 to count - 1
+        count (int): number of shards
+        history (Optional[Dict[str, run_history.ProjectHistory]]): history of the
+            previous runs balancing the shards, see run_history.load_history
+
+    Raises:
+        ValueError: invalid shard index or count
+
+    Returns:
+        Shard: the shard
+    """
+    if count < 1:
+        raise ValueError("Invalid number of shards: {count}".format(count=count))
+    if not 0 <= index < count:
+        raise ValueError(
+            "Invalid shard index {index} of {count} shards".format(
+                index=index, count=count
+            )
+        )
+    return Shard(shard_index=index, shard_count=count, history=history or {})
+
+
+def get_generation_weights(
+    generation_dirs: List[pathlib.Path],
+    output_dir: pathlib.Path,
+    history: Dict[str, run_history.ProjectHistory],
+) -> List[float]:
+    """Estimate the duration of each generation from the make-target durations of
+    its projects in the history
+
+    Args:
+        generation_dirs (List[pathlib.Path]): generation directory paths
+        output_dir (pathlib.Path): output directory path containing the generations
+        history (Dict[str, run_history.ProjectHistory]): history of the previous
+            runs
+
+    Returns:
+        List[float]: estimated duration of each generation in seconds, the mean
+        duration of the known generations (1 if none) without history
+    """
+    durations: List[Optional[float]] = []
+    for generation_dir in generation_dirs:
+        projects = run_history.get_sub_history(
+            history=history,
+            key=run_history.get_project_key(
+                project_dir=generation_dir, output_dir=output_dir
+            ),
+        ).values()
+        durations.append(
+            sum(sum(entry.stages.values()) for entry in projects) if projects else None
+        )
+    known = [duration for duration in durations if duration is not None]
+    default = sum(known) / len(known) if known else 1.0
+    return [default if duration is None else duration for duration in durations]
+
+
+def partition(weights: List[float], count: int) -> List[int]:
+    """Assign weighted items to shards, balancing the total weight of the shards
+
+    The heaviest items are assigned first, each one to the least loaded shard (the
+    lowest index on ties, then the item order), so that the assignment only depends
+    on the weights.
+
+    Args:
+        weights (List[float]): weight of each item
+        count (int): number of shards
+
+    Returns:
+        List[int]: shard index of each item
+    """
+    loads = [0.0] * count
+    shards = [0] * len(weights)
+    for item in sorted(range(len(weights)), key=lambda i: (-weights[i], i)):
+        shard_index = min(range(count), key=lambda j: (loads[j], j))
+        shards[item] = shard_index
+        loads[shard_index] += weights[item]
+    return shards
+
+
+def partition_generations(
+    generations: List[Tuple[Dict[str, str], pathlib.Path]],
+    output_dir: pathlib.Path,
+    shard: Shard,
+) -> Partition:
+    """Assign the generations of a run to the shards
+
+    Args:
+        generations (List[Tuple[Dict[str, str], pathlib.Path]]): extra context and
+            output directory of each generation of the run
+        output_dir (pathlib.Path): output directory path
+        shard (Shard): shard of the run
+
+    Returns:
+        Partition: generations of the shard and digest of the whole assignment
+    """
+    keys = [
+        run_history.get_project_key(project_dir=generation_dir, output_dir=output_dir)
+        for _, generation_dir in generations
+    ]
+    shards = partition(
+        weights=get_generation_weights(
+            generation_dirs=[generation_dir for _, generation_dir in generations],
+            output_dir=output_dir,
+            history=shard.history or {},
+        ),
+        count=shard.shard_count,
+    )
+    selected = [
+        key
+        for key, shard_index in zip(keys, shards)
+        if shard_index == shard.shard_index
+    ]
+    logging.info(
+        "Shard {index} of {count}: {n} of {total} generations".format(
+            index=shard.shard_index,
+            count=shard.shard_count,
+            n=len(selected),
+            total=len(shards),
+        )
+    )
+    assignment = json.dumps([shard.shard_count, list(zip(keys, shards))])
+    return Partition(
+        digest=hashlib.sha256(assignment.encode("utf-8")).hexdigest(),
+        generations=selected,
+    )
+
+
+def select_generations(
+    generations: List[Tuple[Dict[str, str], pathlib.Path]],
+    output_dir: pathlib.Path,
+    partition: Partition,
+) -> List[Tuple[Dict[str, str], pathlib.Path]]:
+    """Select the generations run by a shard
+
+    Args:
+        generations (List[Tuple[Dict[str, str], pathlib.Path]]): extra context and
+            output directory of each generation of the run
+        output_dir (pathlib.Path): output directory path
+        partition (Partition): partition of the shard, see partition_generations
+
+    Returns:
+        List[Tuple[Dict[str, str], pathlib.Path]]: generations of the shard, in the
+        run order
+    """
+    keys = set(partition.generations)
+    return [
+        (extra_context, generation_dir)
+        for extra_context, generation_dir in generations
+        if run_history.get_project_key(
+            project_dir=generation_dir, output_dir=output_dir
+        )
+        in keys
+    ]
+
+
+def write_shard_result(
+    result_path: pathlib.Path,
+    index: int,
+    count: int,
+    partition: Partition,
+    output_dir: pathlib.Path,
+    results: List[install_pool.InstallResult],
+    records: List[instrumentation.PhaseRecord],
+    complete: bool,
+) -> None:
+    """Atomically write the partial result of a shard
+
+    Args:
+        result_path (pathlib.Path): partial result file path
+        index (int): index of the shard
+        count (int): number of shards
+        partition (Partition): generations of the shard
+        output_dir (pathlib.Path): output directory path containing the projects
+        results (List[install_pool.InstallResult]): results of the projects of the
+            shard
+        records (List[instrumentation.PhaseRecord]): recorded phases of the shard
+        complete (bool): whether the shard ran all of its projects
+    """
+    data: Dict[str, Any] = {
+        "version": SHARD_RESULT_VERSION,
+        "index": index,
+        "count": count,
+        "complete": complete,
+        "partition": partition.digest,
+        "generations": partition.generations,
+        "projects": [
+            {
+                "project": run_history.get_project_key(
+                    project_dir=result.project_dir, output_dir=output_dir
+                ),
+                "success": result.success,
+                "message": result.message,
+                "log_path": str(result.log_path) if result.log_path else None,
+                "cached": result.cached,
+                "failure_kind": result.failure_kind,
+                "phases": [record._asdict() for record in result.phases],
+            }
+            for result in results
+        ],
+        "phases": [record._asdict() for record in records],
+    }
+    os.makedirs(result_path.absolute().parent, exist_ok=True)
+    tmp_path = result_path.with_name(result_path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, result_path)
+
+
+def load_shard_result(
+    result_path: pathlib.Path, output_dir: pathlib.Path
+) -> ShardResult:
+    """Load the partial result of a shard
+
+    Args:
+        result_path (pathlib.Path): partial result file path
+        output_dir (pathlib.Path): output directory path the projects are reported
+            in, such as the output directory of the shard on another machine
+
+    Raises:
+        ValueError: unreadable or outdated partial result
+
+    Returns:
+        ShardResult: the partial result
+    """
+    try:
+        with open(result_path, "r") as f:
+            data = json.load(f)
+        if data.get("version") != SHARD_RESULT_VERSION:
+            raise ValueError("outdated version")
+        return ShardResult(
+            shard_index=data["index"],
+            shard_count=data["count"],
+            complete=data["complete"],
+            partition=Partition(
+                digest=data["partition"], generations=list(data["generations"])
+            ),
+            results=[
+                install_pool.InstallResult(
+                    project_dir=output_dir.joinpath(project["project"]),
+                    success=project["success"],
+                    message=project["message"],
+                    log_path=(
+                        pathlib.Path(project["log_path"])
+                        if project["log_path"]
+                        else None
+                    ),
+                    cached=project["cached"],
+                    phases=tuple(
+                        instrumentation.PhaseRecord(**record)
+                        for record in project["phases"]
+                    ),
+                    failure_kind=project["failure_kind"],
+                )
+                for project in data["projects"]
+            ],
+            records=[
+                instrumentation.PhaseRecord(**record) for record in data["phases"]
+            ],
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(
+            "Invalid shard result {result_path}: {e}".format(
+                result_path=result_path, e=e
+            )
+        )
+
+
+def check_shard_projects(
+    shard_result: ShardResult, output_dir: pathlib.Path
+) -> List[str]:
+    """Check that a shard ran the projects of its generations only
+
+    Args:
+        shard_result (ShardResult): partial result of the shard
+        output_dir (pathlib.Path): output directory path the projects are reported in
+
+    Raises:
+        ValueError: a project is outside the generations of the shard, or a generation
+            of a complete shard has no project
+
+    Returns:
+        List[str]: keys of the projects of the shard
+    """
+    keys = [
+        run_history.get_project_key(
+            project_dir=result.project_dir, output_dir=output_dir
+        )
+        for result in shard_result.results
+    ]
+    for key in keys:
+        if not any(
+            run_history.is_sub_key(key=key, parent=generation)
+            for generation in shard_result.partition.generations
+        ):
+            raise ValueError(
+                "Shard {index} ran the project {key} outside of its generations".format(
+                    index=shard_result.shard_index, key=key
+                )
+            )
+    if shard_result.complete:
+        for generation in shard_result.partition.generations:
+            if not any(
+                run_history.is_sub_key(key=key, parent=generation) for key in keys
+            ):
+                raise ValueError(
+                    "Shard {index} has no project of the generation {generation}".format(
+                        index=shard_result.shard_index, generation=generation
+                    )
+                )
+    return keys
+
+
+def check_duplicates(name: str, keys: List[str]) -> None:
+    """Check that the shards did not run a generation or a project twice
+
+    Args:
+        name (str): name of the keys in the error message
+        keys (List[str]): keys of all the shards
+
+    Raises:
+        ValueError: duplicated keys
+    """
+    duplicates = sorted(
+        key for key, count in collections.Counter(keys).items() if count > 1
+    )
+    if duplicates:
+        raise ValueError(
+            "Duplicated {name} in the shards: {keys}".format(
+                name=name, keys=", ".join(duplicates)
+            )
+        )
+
+
+def merge_shard_results(
+    result_paths: List[pathlib.Path], output_dir: pathlib.Path
+) -> Tuple[
+    List[install_pool.InstallResult], List[instrumentation.PhaseRecord], List[int]
+]:
+    """Merge the partial results of the shards of a run
+
+    Args:
+        result_paths (List[pathlib.Path]): partial result file paths, one per shard
+        output_dir (pathlib.Path): output directory path the projects are reported in
+
+    Raises:
+        ValueError: invalid partial result, the shards are not those of one run (such
+            as shards partitioned from different histories), a shard is missing, or a
+            project is missing or duplicated
+
+    Returns:
+        Tuple[List[install_pool.InstallResult], List[instrumentation.PhaseRecord],
+        List[int]]:
+        - results of the projects of all the shards, sorted by project
+        - recorded phases of all the shards
+        - indexes of the shards which did not run all of their projects
+    """
+    shard_results = sorted(
+        (
+            load_shard_result(result_path=result_path, output_dir=output_dir)
+            for result_path in result_paths
+        ),
+        key=lambda shard_result: shard_result.shard_index,
+    )
+    counts = set(shard_result.shard_count for shard_result in shard_results)
+    if len(counts) != 1:
+        raise ValueError(
+            "The shard results have different shard counts: {counts}".format(
+                counts=", ".join(str(count) for count in sorted(counts))
+            )
+        )
+    count = counts.pop()
+    indexes = [shard_result.shard_index for shard_result in shard_results]
+    if indexes != list(range(count)):
+        raise ValueError(
+            "Expected one result of each of the {count} shards, got shards"
+            " {indexes}".format(
+                count=count, indexes=", ".join(str(index) for index in indexes)
+            )
+        )
+    digests = set(shard_result.partition.digest for shard_result in shard_results)
+    if len(digests) != 1:
+        raise ValueError(
+            "The shards were partitioned differently, such as from different histories"
+        )
+    generations = [
+        generation
+        for shard_result in shard_results
+        for generation in shard_result.partition.generations
+    ]
+    check_duplicates(name="generations", keys=generations)
+    check_duplicates(
+        name="projects",
+        keys=[
+            key
+            for shard_result in shard_results
+            for key in check_shard_projects(
+                shard_result=shard_result, output_dir=output_dir
+            )
+        ],
+    )
+    return (
+        sorted(
+            (
+                result
+                for shard_result in shard_results
+                for result in shard_result.results
+            ),
+            key=lambda result: result.project_dir,
+        ),
+        [record for shard_result in shard_results for record in shard_result.records],
+        [
+            shard_result.shard_index
+            for shard_result in shard_results
+            if not shard_result.complete
+        ],
+    )
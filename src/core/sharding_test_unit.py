@@ -0,0 +1,267 @@
+import pathlib
+import shutil
+
+import pytest
+
+from . import install_pool, instrumentation, run_history
+from . import sharding as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "sharding_test_assets"
+)
+
+
+def get_record(
+    name: str, category: str, wall_time: float
+) -> instrumentation.PhaseRecord:
+    return instrumentation.PhaseRecord(
+        name=name,
+        category=category,
+        start=0.0,
+        wall_time=wall_time,
+        cpu_time=0.0,
+        peak_rss_kb=0,
+        pid=0,
+        success=True,
+    )
+
+
+def get_history(stages: float) -> run_history.ProjectHistory:
+    return run_history.ProjectHistory(
+        success=True,
+        failure_kind="",
+        finished_at=0.0,
+        wall_time=stages,
+        stages={"install": stages},
+    )
+
+
+def test_create_shard() -> None:
+    shard = test_module.create_shard(index=1, count=2)
+    assert (shard.shard_index, shard.shard_count, shard.history) == (1, 2, {})
+    with pytest.raises(ValueError):
+        test_module.create_shard(index=0, count=0)
+    with pytest.raises(ValueError):
+        test_module.create_shard(index=2, count=2)
+    with pytest.raises(ValueError):
+        test_module.create_shard(index=-1, count=2)
+
+
+def test_partition() -> None:
+    weights = [1.0, 8.0, 2.0, 5.0, 4.0, 3.0]
+    shards = test_module.partition(weights=weights, count=2)
+    assert shards == test_module.partition(weights=weights, count=2)
+    loads = [
+        sum(weight for weight, index in zip(weights, shards) if index == shard)
+        for shard in range(2)
+    ]
+    assert loads == [12.0, 11.0]
+
+    # Equal weights are spread in order
+    assert test_module.partition(weights=[1.0] * 5, count=2) == [0, 1, 0, 1, 0]
+    assert test_module.partition(weights=[1.0], count=3) == [0]
+    assert test_module.partition(weights=[], count=2) == []
+
+
+def test_get_generation_weights() -> None:
+    output_dir = pathlib.Path("output")
+    generation_dirs = [
+        output_dir.joinpath("0000_python-3.8"),
+        output_dir.joinpath("0001_python-3.9"),
+        output_dir.joinpath("0002_python-3.10"),
+    ]
+    history = {
+        "0000_python-3.8/testing": get_history(stages=3.0),
+        "0000_python-3.8/other": get_history(stages=2.0),
+        "0001_python-3.9/testing": get_history(stages=1.0),
+    }
+    assert test_module.get_generation_weights(
+        generation_dirs=generation_dirs, output_dir=output_dir, history=history
+    ) == [5.0, 1.0, 3.0]
+    assert test_module.get_generation_weights(
+        generation_dirs=generation_dirs, output_dir=output_dir, history={}
+    ) == [1.0, 1.0, 1.0]
+    assert test_module.get_generation_weights(
+        generation_dirs=[output_dir], output_dir=output_dir, history=history
+    ) == [6.0]
+
+
+def test_select_generations() -> None:
+    output_dir = pathlib.Path("output")
+    generations = [
+        (
+            {"python": version},
+            output_dir.joinpath(
+                "{i:04d}_python-{version}".format(i=i, version=version)
+            ),
+        )
+        for i, version in enumerate(["3.8", "3.9", "3.10", "3.11"])
+    ]
+    history = {
+        "0000_python-3.8/testing": get_history(stages=10.0),
+        "0001_python-3.9/testing": get_history(stages=1.0),
+        "0002_python-3.10/testing": get_history(stages=2.0),
+        "0003_python-3.11/testing": get_history(stages=3.0),
+    }
+    partitions = [
+        test_module.partition_generations(
+            generations=generations,
+            output_dir=output_dir,
+            shard=test_module.create_shard(index=index, count=2, history=history),
+        )
+        for index in range(2)
+    ]
+    assert partitions[0].digest == partitions[1].digest
+    assert [
+        test_module.select_generations(
+            generations=generations, output_dir=output_dir, partition=partition
+        )
+        for partition in partitions
+    ] == [[generations[0]], generations[1:]]
+
+    # Without history each shard runs every other generation, the partition differs
+    other_partitions = [
+        test_module.partition_generations(
+            generations=generations,
+            output_dir=output_dir,
+            shard=test_module.create_shard(index=index, count=2),
+        )
+        for index in range(2)
+    ]
+    assert [partition.generations for partition in other_partitions] == [
+        ["0000_python-3.8", "0002_python-3.10"],
+        ["0001_python-3.9", "0003_python-3.11"],
+    ]
+    assert other_partitions[0].digest != partitions[0].digest
+
+
+def test_merge_shard_results() -> None:
+    test_dir = TEST_ASSETS_DIR.joinpath("merge_shard_results_cached")
+    if test_dir.is_dir():
+        shutil.rmtree(test_dir)
+    output_dir = test_dir.joinpath("output")
+    results = [
+        install_pool.InstallResult(
+            project_dir=output_dir.joinpath(name, "testing"),
+            success=success,
+            message="" if success else "make test failed",
+            log_path=test_dir.joinpath("{name}.log".format(name=name)),
+            phases=(get_record(name="test", category="make-target", wall_time=1.0),),
+            failure_kind="" if success else "failed",
+        )
+        for name, success in [("0001_b", True), ("0000_a", False)]
+    ]
+    records = [get_record(name="isolate", category="phase", wall_time=0.5)]
+    partitions = [
+        test_module.Partition(digest="digest", generations=["0000_a"]),
+        test_module.Partition(digest="digest", generations=["0001_b"]),
+    ]
+    result_paths = [
+        test_dir.joinpath("shard_{index}.json".format(index=index))
+        for index in range(2)
+    ]
+    test_module.write_shard_result(
+        result_path=result_paths[1],
+        index=1,
+        count=2,
+        partition=partitions[1],
+        output_dir=output_dir,
+        results=results[:1],
+        records=records,
+        complete=True,
+    )
+    with pytest.raises(ValueError, match="shards 1"):
+        test_module.merge_shard_results(
+            result_paths=result_paths[1:], output_dir=output_dir
+        )
+    test_module.write_shard_result(
+        result_path=result_paths[0],
+        index=0,
+        count=2,
+        partition=partitions[0],
+        output_dir=output_dir,
+        results=results[1:],
+        records=records,
+        complete=False,
+    )
+
+    # The projects are reported in the output directory of the merge
+    merge_dir = test_dir.joinpath("merged")
+    merged, merged_records, incomplete = test_module.merge_shard_results(
+        result_paths=result_paths, output_dir=merge_dir
+    )
+    assert merged == [
+        result._replace(
+            project_dir=merge_dir.joinpath(result.project_dir.relative_to(output_dir))
+        )
+        for result in [results[1], results[0]]
+    ]
+    assert merged_records == records + records
+    assert incomplete == [0]
+
+    # Shards partitioned from different histories, a generation run twice or a
+    # generation without project are rejected
+    invalid_results = [
+        (partitions[1]._replace(digest="other"), results[:1], True, "differently"),
+        (
+            partitions[1]._replace(generations=["0000_a", "0001_b"]),
+            results[:1],
+            True,
+            "Duplicated generations",
+        ),
+        (partitions[1], results, True, "outside of its generations"),
+        (partitions[1], [], True, "no project of the generation 0001_b"),
+    ]
+    for partition, shard_results, complete, match in invalid_results:
+        test_module.write_shard_result(
+            result_path=result_paths[1],
+            index=1,
+            count=2,
+            partition=partition,
+            output_dir=output_dir,
+            results=shard_results,
+            records=[],
+            complete=complete,
+        )
+        with pytest.raises(ValueError, match=match):
+            test_module.merge_shard_results(
+                result_paths=result_paths, output_dir=output_dir
+            )
+    test_module.write_shard_result(
+        result_path=result_paths[1],
+        index=1,
+        count=2,
+        partition=partitions[1]._replace(generations=["0001_b", "."]),
+        output_dir=output_dir,
+        results=results,
+        records=[],
+        complete=True,
+    )
+    with pytest.raises(ValueError, match="Duplicated projects"):
+        test_module.merge_shard_results(
+            result_paths=result_paths, output_dir=output_dir
+        )
+
+    with pytest.raises(ValueError, match="shards 0, 0"):
+        test_module.merge_shard_results(
+            result_paths=[result_paths[0], result_paths[0]], output_dir=output_dir
+        )
+    test_module.write_shard_result(
+        result_path=result_paths[1],
+        index=0,
+        count=3,
+        partition=partitions[0],
+        output_dir=output_dir,
+        results=[],
+        records=[],
+        complete=True,
+    )
+    with pytest.raises(ValueError, match="different shard counts"):
+        test_module.merge_shard_results(
+            result_paths=result_paths, output_dir=output_dir
+        )
+    result_paths[1].write_text("{}")
+    with pytest.raises(ValueError, match="Invalid shard result"):
+        test_module.load_shard_result(
+            result_path=result_paths[1], output_dir=output_dir
+        )
@@ -0,0 +1,103 @@
+import json
+import math
+import os
+import pathlib
+import random
+import shutil
+from typing import List, NamedTuple
+
+PROJECT_DIR_NAME = "{{cookiecutter.project_name}}"
+# Text line rendered by cookiecutter in each text file
+TEXT_LINE = "# {{ cookiecutter.project_name }} generated line\n"
+
+
+class TemplateSpec(NamedTuple):
+    files: int = 1000
+    depth: int = 3
+    files_per_dir: int = 20
+    ignored_ratio: float = 0.2
+    text_size: int = 1024
+    binary_files: int = 0
+    binary_size: int = 64 * 1024
+    seed: int = 0
+
+
+def get_dir_paths(spec: TemplateSpec) -> List[str]:
+    """Get the directories of a synthetic template, all of them at the spec depth
+
+    Args:
+        spec (TemplateSpec): shape of the template
+
+    Returns:
+        List[str]: relative directory paths, empty if the depth is 0
+    """
+    if spec.depth < 1:
+        return []
+    n_dirs = max(1, math.ceil(spec.files / max(1, spec.files_per_dir)))
+    fanout = max(2, math.ceil(n_dirs ** (1.0 / spec.depth)))
+    return [
+        "/".join(
+            "dir{level}_{index}".format(
+                level=level, index=(dir_index // fanout**level) % fanout
+            )
+            for level in range(spec.depth)
+        )
+        for dir_index in range(n_dirs)
+    ]
+
+
+def synthesize_template(template_dir: pathlib.Path, spec: TemplateSpec) -> int:
+    """Write a synthetic template, replacing the existing directory
+
+    The files are spread over the directories, the ignored directories are listed
+    in the .gitignore of the project. Each text file contains a cookiecutter
+    variable, the binary files contain random bytes and are copied as-is by
+    cookiecutter.
+
+    Args:
+        template_dir (pathlib.Path): template directory path
+        spec (TemplateSpec): shape of the template
+
+    Returns:
+        int: number of files not ignored by git (the ignored files are not isolated)
+    """
+    if template_dir.is_dir():
+        shutil.rmtree(template_dir)
+    project_dir = template_dir.joinpath(PROJECT_DIR_NAME)
+    os.makedirs(project_dir)
+    with open(template_dir.joinpath("cookiecutter.json"), "w") as f:
+        json.dump({"project_name": "benchmark"}, f, indent=2)
+
+    rng = random.Random(spec.seed)
+    dir_paths = get_dir_paths(spec=spec)
+    ignored_dirs = set(
+        rng.sample(dir_paths, k=int(round(len(dir_paths) * spec.ignored_ratio)))
+    )
+    with open(project_dir.joinpath(".gitignore"), "w") as f:
+        f.writelines("/{dir_path}/\n".format(dir_path=d) for d in sorted(ignored_dirs))
+    for dir_path in dir_paths:
+        os.makedirs(project_dir.joinpath(dir_path), exist_ok=True)
+
+    text = TEXT_LINE * max(1, spec.text_size // len(TEXT_LINE))
+    n_valid = 2  # cookiecutter.json and .gitignore
+    for file_index in range(spec.files + spec.binary_files):
+        dir_path = dir_paths[file_index % len(dir_paths)] if dir_paths else ""
+        if file_index < spec.files:
+            f_path = project_dir.joinpath(
+                dir_path, "file_{index}.txt".format(index=file_index)
+            )
+            f_path.write_text(text)
+        else:
+            f_path = project_dir.joinpath(
+                dir_path, "asset_{index}.bin".format(index=file_index)
+            )
+            f_path.write_bytes(
+                rng.getrandbits(spec.binary_size * 8).to_bytes(
+                    spec.binary_size, "little"
+                )
+                if spec.binary_size > 0
+                else b""
+            )
+        if dir_path not in ignored_dirs:
+            n_valid += 1
+    return n_valid
@@ -0,0 +1,45 @@
+import pathlib
+import shutil
+
+from . import isolate_temp_template
+from . import synthetic_template as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "synthetic_template_test_assets"
+)
+
+
+def test_get_dir_paths() -> None:
+    dir_paths = test_module.get_dir_paths(
+        spec=test_module.TemplateSpec(files=100, depth=2, files_per_dir=10)
+    )
+    assert len(dir_paths) == 10
+    assert len(set(dir_paths)) == 10
+    assert all(dir_path.count("/") == 1 for dir_path in dir_paths)
+    assert test_module.get_dir_paths(spec=test_module.TemplateSpec(depth=0)) == []
+
+
+def test_synthesize_template() -> None:
+    template_dir = TEST_ASSETS_DIR.joinpath("template_cached")
+    spec = test_module.TemplateSpec(
+        files=100,
+        depth=3,
+        files_per_dir=5,
+        ignored_ratio=0.5,
+        binary_files=4,
+        binary_size=1024,
+    )
+    n_valid = test_module.synthesize_template(template_dir=template_dir, spec=spec)
+    assert isolate_temp_template.is_valid_template_directory(cur_dir=template_dir)
+    valid_paths = isolate_temp_template.get_valid_paths(cur_dir=template_dir)
+    assert len(valid_paths) == n_valid
+    # About half of the 104 files are in the ignored directories
+    assert 2 + 40 < n_valid < 2 + 64
+    assert len(list(template_dir.rglob("*.bin"))) == 4
+    assert all(f_path.stat().st_size == 1024 for f_path in template_dir.rglob("*.bin"))
+
+    # The same spec synthesizes the same template
+    assert test_module.synthesize_template(template_dir=template_dir, spec=spec) == (
+        n_valid
+    )
+    shutil.rmtree(template_dir)
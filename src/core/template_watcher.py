@@ -0,0 +1,340 @@
+import abc
+import ctypes
+import ctypes.util
+import logging
+import os
+import pathlib
+import select
+import struct
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core import defaults, install_pool, isolate_temp_template, pipeline
+
+# Seconds between two snapshots of the polling watcher
+POLL_INTERVAL = 0.5
+# Stage skipped when no dependency file of an installed project changed
+INSTALL_STAGE = pipeline.INSTALL_STAGE
+DEPENDENCY_FILES = [
+    "pyproject.toml",
+    "poetry.lock",
+    "setup.py",
+    "setup.cfg",
+    "requirements.txt",
+    "Makefile",
+]
+
+# See inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+Snapshot = Dict[str, Tuple[int, int]]
+
+
+def get_snapshot(template_dir: pathlib.Path) -> Snapshot:
+    """Get the modification time and size of the files isolated from the template
+
+    Args:
+        template_dir (pathlib.Path): template directory path
+
+    Returns:
+        Snapshot: modification time (ns) and size of each path relative to
+        template_dir, empty if the template directory is not valid (such as while
+        it is being edited)
+    """
+    if not isolate_temp_template.is_valid_template_directory(cur_dir=template_dir):
+        return {}
+    try:
+        return {
+            entry.rel_path: (entry.stat.st_mtime_ns, entry.stat.st_size)
+            for entry in isolate_temp_template.scan_template(cur_dir=template_dir)
+        }
+    except OSError:
+        # A file has been removed during the scan, the next event rescans
+        return {}
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot) -> List[str]:
+    """Get the paths added, changed or removed between two snapshots
+
+    Args:
+        old (Snapshot): previous snapshot
+        new (Snapshot): current snapshot
+
+    Returns:
+        List[str]: sorted relative paths
+    """
+    return sorted(
+        rel_path
+        for rel_path in set(old) | set(new)
+        if old.get(rel_path) != new.get(rel_path)
+    )
+
+
+def is_template_entry(template_dir: pathlib.Path, path: str) -> bool:
+    """Check whether a path of the template root is read by get_valid_paths
+
+    Args:
+        template_dir (pathlib.Path): template directory path
+        path (str): path of a directory created in the template
+
+    Returns:
+        bool: False for the other entries of the template root, such as the
+        isolated template cache
+    """
+    if os.path.dirname(path) != str(template_dir):
+        return True
+    name = os.path.basename(path)
+    return name == "hooks" or name.startswith("{{cookiecutter.")
+
+
+class Watcher(abc.ABC):
+    """Wait for the changes of a template directory"""
+
+    def __init__(self, template_dir: pathlib.Path) -> None:
+        self.template_dir = template_dir.absolute()
+
+    @abc.abstractmethod
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a change
+
+        Args:
+            timeout (Optional[float]): maximum number of seconds to wait, no limit if
+                not specified
+
+        Returns:
+            bool: True if a change may have happened, False on timeout
+        """
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "Watcher":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
+class InotifyWatcher(Watcher):
+    """Watch the directories containing the template files with inotify
+
+    The ignored directories are not watched, the directories created later are.
+    """
+
+    def __init__(self, template_dir: pathlib.Path) -> None:
+        super().__init__(template_dir=template_dir)
+        self.libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True
+        )
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.watches: Dict[int, str] = {}
+        dir_paths = {str(self.template_dir)}
+        if isolate_temp_template.is_valid_template_directory(cur_dir=self.template_dir):
+            for entry in isolate_temp_template.scan_template(cur_dir=self.template_dir):
+                dir_path = os.path.dirname(entry.path)
+                while dir_path not in dir_paths:
+                    dir_paths.add(dir_path)
+                    dir_path = os.path.dirname(dir_path)
+        for dir_path in sorted(dir_paths):
+            self.add_watch(dir_path=dir_path)
+
+    def add_watch(self, dir_path: str) -> None:
+        """Watch a directory, skipped if it has already been removed
+
+        Args:
+            dir_path (str): directory path
+        """
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd >= 0:
+            self.watches[wd] = dir_path
+
+    def add_tree(self, dir_path: str) -> None:
+        """Watch a directory created or moved into the template, with its
+        sub-directories
+
+        Args:
+            dir_path (str): directory path
+        """
+        if not is_template_entry(template_dir=self.template_dir, path=dir_path):
+            return
+        self.add_watch(dir_path=dir_path)
+        for cur_dir, dir_names, _ in os.walk(dir_path):
+            for dir_name in dir_names:
+                self.add_watch(dir_path=os.path.join(cur_dir, dir_name))
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            name = data[
+                offset + EVENT_HEADER.size : offset + EVENT_HEADER.size + name_len
+            ].rstrip(b"\0")
+            offset += EVENT_HEADER.size + name_len
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+            elif mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                if wd in self.watches:
+                    self.add_tree(
+                        dir_path=os.path.join(self.watches[wd], os.fsdecode(name))
+                    )
+        return True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher(Watcher):
+    """Compare snapshots of the template files periodically, used where inotify is
+    not available"""
+
+    def __init__(
+        self, template_dir: pathlib.Path, interval: float = POLL_INTERVAL
+    ) -> None:
+        super().__init__(template_dir=template_dir)
+        self.interval = interval
+        self.snapshot = get_snapshot(template_dir=self.template_dir)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = max(0.0, min(delay, deadline - time.monotonic()))
+            time.sleep(delay)
+            snapshot = get_snapshot(template_dir=self.template_dir)
+            if snapshot != self.snapshot:
+                self.snapshot = snapshot
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+
+def create_watcher(template_dir: pathlib.Path, polling: bool = False) -> Watcher:
+    """Create the watcher of a template directory
+
+    Args:
+        template_dir (pathlib.Path): template directory path
+        polling (bool): compare snapshots instead of using inotify
+
+    Returns:
+        Watcher: inotify watcher, polling watcher if inotify is not available
+    """
+    if not polling:
+        try:
+            return InotifyWatcher(template_dir=template_dir)
+        except (AttributeError, OSError) as e:
+            logging.warning(
+                "inotify is not available ({e}), polling the template".format(e=e)
+            )
+    return PollingWatcher(template_dir=template_dir)
+
+
+def wait_for_change(
+    watcher: Watcher, snapshot: Snapshot, debounce: float = defaults.DEFAULT_DEBOUNCE
+) -> Tuple[Snapshot, List[str]]:
+    """Wait until the template files change, then until no event is received for
+    the debounce period
+
+    The events of the files ignored by git (or rewritten with the same modification
+    time and size) do not count as a change.
+
+    Args:
+        watcher (Watcher): watcher of the template directory
+        snapshot (Snapshot): snapshot of the template files already handled
+        debounce (float): seconds without any event before the change is handled
+
+    Returns:
+        Tuple[Snapshot, List[str]]:
+        - the new snapshot
+        - relative paths of the changed template files
+    """
+    while True:
+        watcher.wait()
+        while watcher.wait(timeout=debounce):
+            pass
+        new_snapshot = get_snapshot(template_dir=watcher.template_dir)
+        changed = diff_snapshots(old=snapshot, new=new_snapshot)
+        if changed:
+            return new_snapshot, changed
+
+
+def plan_reruns(
+    generation_dir: pathlib.Path,
+    project_dirs: List[pathlib.Path],
+    changed: List[str],
+    history: Dict[pathlib.Path, install_pool.InstallResult],
+) -> Tuple[List[install_pool.InstallResult], List[pathlib.Path], List[pathlib.Path]]:
+    """Select the stages to be rerun for each project of a re-rendered generation
+
+    Args:
+        generation_dir (pathlib.Path): generation directory path
+        project_dirs (List[pathlib.Path]): projects of the generation
+        changed (List[str]): output files written or removed by the rendering,
+            relative to generation_dir
+        history (Dict[pathlib.Path, install_pool.InstallResult]): result of the last
+            run of each project
+
+    Returns:
+        Tuple[List[install_pool.InstallResult], List[pathlib.Path], List[pathlib.Path]]:
+        - results reused for the projects without any changed file
+        - projects to be run with all the stages
+        - projects already installed, without any changed dependency file, to be run
+          without the install stage
+    """
+    changed_files: Dict[str, List[str]] = {}
+    for rel_path in changed:
+        name, _, f_path = rel_path.partition("/")
+        changed_files.setdefault(name, []).append(f_path)
+    reused, full, without_install = [], [], []
+    for project_dir in project_dirs:
+        previous = history.get(project_dir)
+        project_changed = changed_files.get(
+            project_dir.relative_to(generation_dir).as_posix()
+        )
+        if previous is not None and project_changed is None:
+            reused.append(previous)
+        elif (
+            previous is not None
+            and previous.success
+            and not any(
+                os.path.basename(f_path) in DEPENDENCY_FILES
+                for f_path in project_changed or []
+            )
+        ):
+            without_install.append(project_dir)
+        else:
+            full.append(project_dir)
+    return reused, full, without_install
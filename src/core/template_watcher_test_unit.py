@@ -0,0 +1,127 @@
+import json
+import pathlib
+import shutil
+from typing import Type
+
+import pytest
+
+from . import install_pool
+from . import template_watcher as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "template_watcher_test_assets"
+)
+PROJECT_DIR_NAME = "{{cookiecutter.project_name}}"
+
+
+def get_template_directory(name: str) -> pathlib.Path:
+    template_dir = TEST_ASSETS_DIR.joinpath(name)
+    if template_dir.is_dir():
+        shutil.rmtree(template_dir)
+    project_dir = template_dir.joinpath(PROJECT_DIR_NAME)
+    project_dir.mkdir(parents=True)
+    with open(template_dir.joinpath("cookiecutter.json"), "w") as f:
+        json.dump({"project_name": "testing"}, f)
+    project_dir.joinpath(".gitignore").write_text("*.log\n")
+    project_dir.joinpath("main.py").write_text("")
+    return template_dir
+
+
+def test_get_snapshot_and_diff() -> None:
+    template_dir = get_template_directory(name="snapshot_cached")
+    snapshot = test_module.get_snapshot(template_dir=template_dir)
+    assert sorted(snapshot) == [
+        "cookiecutter.json",
+        PROJECT_DIR_NAME + "/.gitignore",
+        PROJECT_DIR_NAME + "/main.py",
+    ]
+    template_dir.joinpath(PROJECT_DIR_NAME, "output.log").write_text("ignored")
+    template_dir.joinpath(PROJECT_DIR_NAME, "main.py").write_text("changed")
+    template_dir.joinpath(PROJECT_DIR_NAME, "other.py").write_text("added")
+    assert test_module.diff_snapshots(
+        old=snapshot, new=test_module.get_snapshot(template_dir=template_dir)
+    ) == [PROJECT_DIR_NAME + "/main.py", PROJECT_DIR_NAME + "/other.py"]
+
+    template_dir.joinpath("cookiecutter.json").unlink()
+    assert test_module.get_snapshot(template_dir=template_dir) == {}
+    shutil.rmtree(template_dir)
+
+
+@pytest.mark.parametrize(
+    "watcher_class", [test_module.InotifyWatcher, test_module.PollingWatcher]
+)
+def test_wait_for_change(watcher_class: Type[test_module.Watcher]) -> None:
+    template_dir = get_template_directory(name="watch_cached")
+    project_dir = template_dir.joinpath(PROJECT_DIR_NAME)
+    snapshot = test_module.get_snapshot(template_dir=template_dir)
+    with watcher_class(template_dir=template_dir) as watcher:
+        assert not watcher.wait(timeout=0.1)
+
+        # The ignored files and the isolated template do not count as a change
+        project_dir.joinpath("output.log").write_text("ignored")
+        template_dir.joinpath(".template_cache").mkdir()
+        template_dir.joinpath(".template_cache", "main.py").write_text("ignored")
+        project_dir.joinpath("main.py").write_text("changed")
+        snapshot, changed = test_module.wait_for_change(
+            watcher=watcher, snapshot=snapshot, debounce=0.1
+        )
+        assert changed == [PROJECT_DIR_NAME + "/main.py"]
+
+        # The files of the directories created after the start are watched
+        project_dir.joinpath("sub").mkdir()
+        project_dir.joinpath("sub", "module.py").write_text("added")
+        snapshot, changed = test_module.wait_for_change(
+            watcher=watcher, snapshot=snapshot, debounce=0.1
+        )
+        assert changed == [PROJECT_DIR_NAME + "/sub/module.py"]
+        project_dir.joinpath("sub", "module.py").write_text("changed")
+        snapshot, changed = test_module.wait_for_change(
+            watcher=watcher, snapshot=snapshot, debounce=0.1
+        )
+        assert changed == [PROJECT_DIR_NAME + "/sub/module.py"]
+    shutil.rmtree(template_dir)
+
+
+def test_create_watcher() -> None:
+    template_dir = get_template_directory(name="create_cached")
+    with test_module.create_watcher(template_dir=template_dir, polling=True) as watcher:
+        assert isinstance(watcher, test_module.PollingWatcher)
+
+    class IncompleteWatcher(test_module.Watcher):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteWatcher(template_dir=template_dir)  # type: ignore[abstract]
+    shutil.rmtree(template_dir)
+
+
+def test_plan_reruns() -> None:
+    generation_dir = pathlib.Path("generation")
+    project_dirs = [generation_dir.joinpath(name) for name in ["a", "b", "c", "d"]]
+    history = {
+        project_dir: install_pool.InstallResult(
+            project_dir=project_dir,
+            success=project_dir.name != "c",
+            message="",
+            log_path=None,
+        )
+        for project_dir in project_dirs[:3]
+    }
+    reused, full, without_install = test_module.plan_reruns(
+        generation_dir=generation_dir,
+        project_dirs=project_dirs,
+        changed=["b/README.md", "c/README.md", "d/README.md"],
+        history=history,
+    )
+    assert reused == [history[project_dirs[0]]]
+    assert without_install == [project_dirs[1]]
+    assert full == [project_dirs[2], project_dirs[3]]
+
+    _, full, without_install = test_module.plan_reruns(
+        generation_dir=generation_dir,
+        project_dirs=project_dirs[:2],
+        changed=["a/pyproject.toml", "b/src/poetry.lock"],
+        history=history,
+    )
+    assert full == project_dirs[:2]
+    assert without_install == []
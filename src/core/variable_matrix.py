@@ -0,0 +1,100 @@
+import itertools
+import json
+import pathlib
+import random
+import re
+from typing import Any, Dict, List, Optional
+
+
+def load_context(template_dir: pathlib.Path) -> Dict[str, Any]:
+    """Load the cookiecutter.json of a template
+
+    Args:
+        template_dir (pathlib.Path): template directory path
+
+    Returns:
+        Dict[str, Any]: variables declared by the template
+    """
+    with open(template_dir.joinpath("cookiecutter.json"), "r") as f:
+        context: Dict[str, Any] = json.load(f)
+    return context
+
+
+def get_choice_variables(context: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Get the choice variables (declared as a list of values) of a context
+
+    Args:
+        context (Dict[str, Any]): variables declared by the template
+
+    Returns:
+        Dict[str, List[str]]: choices of each choice variable
+    """
+    return {
+        name: [str(choice) for choice in value]
+        for name, value in context.items()
+        if isinstance(value, list) and not name.startswith("_")
+    }
+
+
+def expand_matrix(
+    context: Dict[str, Any],
+    variables: Optional[List[str]] = None,
+    sample: Optional[int] = None,
+    seed: int = 0,
+) -> List[Dict[str, str]]:
+    """Expand the cross product of the selected choice variables
+
+    Args:
+        context (Dict[str, Any]): variables declared by the template
+        variables (Optional[List[str]]): choice variables to be expanded,
+            all choice variables if not specified or empty
+        sample (Optional[int]): number of combinations randomly sampled from the
+            cross product, all combinations if not specified
+        seed (int): seed of the sampling
+
+    Raises:
+        ValueError: a selected variable is not a choice variable, or invalid sample
+
+    Returns:
+        List[Dict[str, str]]: the combinations, each one maps the variable to its value
+    """
+    choices = get_choice_variables(context=context)
+    if not variables:
+        variables = list(choices.keys())
+    for name in variables:
+        if name not in choices:
+            raise ValueError(
+                "Not a choice variable of cookiecutter.json: {name}".format(name=name)
+            )
+    combinations = [
+        dict(zip(variables, values))
+        for values in itertools.product(*[choices[name] for name in variables])
+    ]
+    if sample is None or sample >= len(combinations):
+        return combinations
+    if sample < 1:
+        raise ValueError("Invalid sample size: {sample}".format(sample=sample))
+    indexes = sorted(random.Random(seed).sample(range(len(combinations)), sample))
+    return [combinations[index] for index in indexes]
+
+
+def get_combination_name(index: int, combination: Dict[str, str]) -> str:
+    """Get the directory name of a combination
+
+    Args:
+        index (int): index of the combination in the matrix
+        combination (Dict[str, str]): value of each expanded variable
+
+    Returns:
+        str: a file system friendly name such as 0003_python_version-3.8
+    """
+    parts = ["{index:04d}".format(index=index)]
+    for name, value in combination.items():
+        parts.append(
+            re.sub(
+                r"[^A-Za-z0-9._-]+",
+                "-",
+                "{name}-{value}".format(name=name, value=value),
+            )
+        )
+    return "_".join(parts)
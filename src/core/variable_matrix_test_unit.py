@@ -0,0 +1,83 @@
+import pathlib
+from typing import Dict, List
+
+import pytest
+
+from . import variable_matrix as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "variable_matrix_test_assets"
+)
+
+
+def test_get_choice_variables() -> None:
+    context = test_module.load_context(
+        template_dir=TEST_ASSETS_DIR.joinpath("template")
+    )
+    assert test_module.get_choice_variables(context=context) == {
+        "python_version": ["3.7", "3.6", "3.8"],
+        "license": ["MIT", "BSD"],
+    }
+
+
+class Test_expand_matrix:
+    @pytest.mark.parametrize(
+        "variables, expected",
+        [
+            (
+                ["license"],
+                [{"license": "MIT"}, {"license": "BSD"}],
+            ),
+            (
+                [],
+                [
+                    {"python_version": "3.7", "license": "MIT"},
+                    {"python_version": "3.7", "license": "BSD"},
+                    {"python_version": "3.6", "license": "MIT"},
+                    {"python_version": "3.6", "license": "BSD"},
+                    {"python_version": "3.8", "license": "MIT"},
+                    {"python_version": "3.8", "license": "BSD"},
+                ],
+            ),
+        ],
+    )
+    def test_normal_case(
+        self, variables: List[str], expected: List[Dict[str, str]]
+    ) -> None:
+        context = test_module.load_context(
+            template_dir=TEST_ASSETS_DIR.joinpath("template")
+        )
+        res = test_module.expand_matrix(context=context, variables=variables)
+        assert res == expected
+
+    def test_sample(self) -> None:
+        context = test_module.load_context(
+            template_dir=TEST_ASSETS_DIR.joinpath("template")
+        )
+        full = test_module.expand_matrix(context=context)
+        res = test_module.expand_matrix(context=context, sample=4, seed=1)
+        assert len(res) == 4
+        assert all(combination in full for combination in res)
+        assert res == test_module.expand_matrix(context=context, sample=4, seed=1)
+
+    @pytest.mark.parametrize(
+        "variables, sample",
+        [(["project_name"], None), (["_private"], None), (["license"], 0)],
+    )
+    def test_error_case(self, variables: List[str], sample: int) -> None:
+        context = test_module.load_context(
+            template_dir=TEST_ASSETS_DIR.joinpath("template")
+        )
+        with pytest.raises(ValueError):
+            test_module.expand_matrix(
+                context=context, variables=variables, sample=sample
+            )
+
+
+def test_get_combination_name() -> None:
+    assert (
+        test_module.get_combination_name(
+            index=3, combination={"python_version": "3.8", "license": "MIT / BSD"}
+        )
+        == "0003_python_version-3.8_license-MIT-BSD"
+    )
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+from typing import List, NamedTuple, Optional
+
+from src.core import defaults, env_cache, install_pool
+
+
+class Workspace(NamedTuple):
+    path: pathlib.Path
+    budget: int
+    start_used: int
+
+    @property
+    def output_dir(self) -> pathlib.Path:
+        return self.path.joinpath("output")
+
+    @property
+    def log_dir(self) -> pathlib.Path:
+        return self.path.joinpath("logs")
+
+    @property
+    def template_dir(self) -> pathlib.Path:
+        return self.path.joinpath("template")
+
+
+class Reservations:
+    """Bytes the generations being installed are expected to write into a workspace,
+    not counted by its usage yet"""
+
+    def __init__(self) -> None:
+        self.size = 0
+        # Held while a generation is placed, so that the next one sees its size
+        self.lock = asyncio.Lock()
+
+
+def create_workspace(
+    root: pathlib.Path = defaults.DEFAULT_TMPFS_DIR,
+    budget: int = defaults.DEFAULT_BUDGET,
+) -> Optional[Workspace]:
+    """Create an ephemeral workspace in a RAM-backed directory
+
+    Args:
+        root (pathlib.Path): RAM-backed directory such as /dev/shm
+        budget (int): maximum number of bytes written into the workspace
+
+    Returns:
+        Optional[Workspace]: the workspace, None if the directory is not usable or
+        has less free space than the budget (the caller falls back to the disk)
+    """
+    if not root.is_dir() or not os.access(str(root), os.W_OK):
+        logging.warning(
+            "{root} is not a writable directory, using the disk".format(root=root)
+        )
+        return None
+    usage = shutil.disk_usage(str(root))
+    if usage.free < budget:
+        logging.warning(
+            "{root} has {free} bytes free, less than the {budget} bytes budget,"
+            " using the disk".format(root=root, free=usage.free, budget=budget)
+        )
+        return None
+    path = pathlib.Path(tempfile.mkdtemp(prefix="cookiecutter-runner_", dir=str(root)))
+    logging.info("Using the workspace {path}".format(path=path))
+    return Workspace(path=path, budget=budget, start_used=usage.used)
+
+
+def has_room(workspace: Workspace, size: int = 0) -> bool:
+    """Check whether the workspace can receive more files within its budget
+
+    The usage is measured on the whole file system (statvfs), it is cheap to check
+    but counts the files written by other processes.
+
+    Args:
+        workspace (Workspace): workspace
+        size (int): number of bytes about to be written
+
+    Returns:
+        bool: True if the budget is not exhausted
+    """
+    usage = shutil.disk_usage(str(workspace.path))
+    return (
+        usage.used - workspace.start_used + size < workspace.budget
+        and size < usage.free
+    )
+
+
+def get_tree_size(root: pathlib.Path) -> int:
+    """Get the total size of the files of a directory tree
+
+    Args:
+        root (pathlib.Path): directory path
+
+    Returns:
+        int: number of bytes, symbolic links are not followed
+    """
+    size = 0
+    stack = [str(root)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    size += entry.stat(follow_symlinks=False).st_size
+    return size
+
+
+def copy_tree(src_dir: pathlib.Path, dest_dir: pathlib.Path) -> None:
+    """Copy a directory tree, merging it into the existing destination
+
+    Args:
+        src_dir (pathlib.Path): source directory path
+        dest_dir (pathlib.Path): destination directory path
+    """
+    for cur_dir, _, f_names in os.walk(str(src_dir)):
+        rel_dir = pathlib.Path(cur_dir).relative_to(src_dir)
+        os.makedirs(dest_dir.joinpath(rel_dir), exist_ok=True)
+        for f_name in f_names:
+            shutil.copy2(
+                os.path.join(cur_dir, f_name),
+                str(dest_dir.joinpath(rel_dir, f_name)),
+                follow_symlinks=False,
+            )
+
+
+def estimate_install_size(
+    project_dirs: List[pathlib.Path], env_cache_dir: Optional[pathlib.Path] = None
+) -> int:
+    """Estimate the number of bytes written by installing and testing projects
+
+    Each project counts its rendered size again, for the build outputs and the caches
+    of its make-targets, plus the size of its cached environment, restored into the
+    project.
+
+    Args:
+        project_dirs (List[pathlib.Path]): rendered projects
+        env_cache_dir (Optional[pathlib.Path]): virtual environment cache directory
+
+    Returns:
+        int: estimated number of bytes
+    """
+    size = 0
+    for project_dir in project_dirs:
+        size += get_tree_size(root=project_dir)
+        if env_cache_dir is None:
+            continue
+        key = env_cache.compute_env_key(project_dir=project_dir)
+        cached_env_dir = (
+            None
+            if key is None
+            else env_cache_dir.joinpath(key, env_cache.VENV_DIR_NAME)
+        )
+        if cached_env_dir is not None and cached_env_dir.is_dir():
+            size += get_tree_size(root=cached_env_dir)
+    return size
+
+
+def move_tree(src_dir: pathlib.Path, dest_dir: pathlib.Path) -> None:
+    """Move a directory tree out of the workspace, merging it into the existing
+    destination
+
+    Args:
+        src_dir (pathlib.Path): source directory path
+        dest_dir (pathlib.Path): destination directory path
+    """
+    copy_tree(src_dir=src_dir, dest_dir=dest_dir)
+    shutil.rmtree(src_dir)
+
+
+def copy_out(
+    workspace: Workspace,
+    results: List[install_pool.InstallResult],
+    output_dir: pathlib.Path,
+    log_dir: Optional[pathlib.Path] = None,
+) -> List[install_pool.InstallResult]:
+    """Copy the logs and the failing projects out of the workspace
+
+    The passing projects are discarded with the workspace. The virtual environment
+    of the failing projects is not copied, it only works at its original path.
+
+    Args:
+        workspace (Workspace): workspace
+        results (List[install_pool.InstallResult]): results of the run
+        output_dir (pathlib.Path): output directory on the disk
+        log_dir (Optional[pathlib.Path]): log directory on the disk
+
+    Returns:
+        List[install_pool.InstallResult]: results referring to the disk paths
+    """
+    if log_dir is not None and workspace.log_dir.is_dir():
+        copy_tree(src_dir=workspace.log_dir, dest_dir=log_dir)
+    disk_results = []
+    for result in results:
+        project_dir, log_path = result.project_dir, result.log_path
+        if workspace.output_dir in project_dir.parents:
+            project_dir = output_dir.joinpath(
+                result.project_dir.relative_to(workspace.output_dir)
+            )
+            if not result.success and result.project_dir.is_dir():
+                if project_dir.is_dir():
+                    shutil.rmtree(project_dir)
+                shutil.copytree(
+                    result.project_dir,
+                    project_dir,
+                    symlinks=True,
+                    ignore=shutil.ignore_patterns(env_cache.VENV_DIR_NAME),
+                )
+        if (
+            log_dir is not None
+            and log_path is not None
+            and workspace.log_dir in log_path.parents
+        ):
+            log_path = log_dir.joinpath(log_path.relative_to(workspace.log_dir))
+        disk_results.append(result._replace(project_dir=project_dir, log_path=log_path))
+    return disk_results
+
+
+def remove_workspace(workspace: Workspace) -> None:
+    """Remove the workspace and everything it contains
+
+    Args:
+        workspace (Workspace): workspace
+    """
+    shutil.rmtree(workspace.path, ignore_errors=True)
@@ -0,0 +1,118 @@
+import pathlib
+import shutil
+
+from . import env_cache, install_pool
+from . import workspace as test_module
+
+TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
+    "workspace_test_assets"
+)
+
+
+def get_test_directory(name: str) -> pathlib.Path:
+    test_dir = TEST_ASSETS_DIR.joinpath(name)
+    if test_dir.is_dir():
+        shutil.rmtree(test_dir)
+    test_dir.mkdir(parents=True)
+    return test_dir
+
+
+def test_create_workspace() -> None:
+    root = get_test_directory(name="root_cached")
+    assert test_module.create_workspace(root=root.joinpath("missing")) is None
+    assert test_module.create_workspace(root=root, budget=2**62) is None
+
+    workspace = test_module.create_workspace(root=root, budget=1024**2)
+    assert workspace is not None
+    assert workspace.path.parent == root
+    assert test_module.has_room(workspace=workspace)
+    assert not test_module.has_room(workspace=workspace, size=1024**2)
+    test_module.remove_workspace(workspace=workspace)
+    assert not workspace.path.exists()
+    shutil.rmtree(root)
+
+
+def test_get_tree_size_and_copy_tree() -> None:
+    src_dir = get_test_directory(name="src_cached")
+    src_dir.joinpath("sub").mkdir()
+    src_dir.joinpath("a.txt").write_text("a" * 10)
+    src_dir.joinpath("sub", "b.txt").write_text("b" * 5)
+    assert test_module.get_tree_size(root=src_dir) == 15
+
+    dest_dir = get_test_directory(name="dest_cached")
+    dest_dir.joinpath("other.txt").write_text("other")
+    test_module.copy_tree(src_dir=src_dir, dest_dir=dest_dir)
+    assert sorted(
+        str(f_path.relative_to(dest_dir)) for f_path in dest_dir.rglob("*.txt")
+    ) == ["a.txt", "other.txt", "sub/b.txt"]
+    test_module.move_tree(src_dir=src_dir, dest_dir=dest_dir.joinpath("moved"))
+    assert not src_dir.exists()
+    assert test_module.get_tree_size(root=dest_dir.joinpath("moved")) == 15
+    shutil.rmtree(dest_dir)
+
+
+def test_estimate_install_size() -> None:
+    project_dir = get_test_directory(name="project_cached")
+    project_dir.joinpath("pyproject.toml").write_text("p" * 10)
+    env_cache_dir = get_test_directory(name="env_cache_cached")
+    assert (
+        test_module.estimate_install_size(
+            project_dirs=[project_dir], env_cache_dir=env_cache_dir
+        )
+        == 10
+    )
+    key = env_cache.compute_env_key(project_dir=project_dir)
+    assert key is not None
+    cached_env_dir = env_cache_dir.joinpath(key, env_cache.VENV_DIR_NAME)
+    cached_env_dir.mkdir(parents=True)
+    cached_env_dir.joinpath("python").write_text("e" * 100)
+    assert (
+        test_module.estimate_install_size(
+            project_dirs=[project_dir], env_cache_dir=env_cache_dir
+        )
+        == 110
+    )
+    assert test_module.estimate_install_size(project_dirs=[project_dir]) == 10
+    shutil.rmtree(project_dir)
+    shutil.rmtree(env_cache_dir)
+
+
+def test_copy_out() -> None:
+    root = get_test_directory(name="root_cached")
+    workspace = test_module.create_workspace(root=root, budget=1024**2)
+    assert workspace is not None
+    results = []
+    for name, success in [("passing", True), ("failing", False)]:
+        project_dir = workspace.output_dir.joinpath("generation", name)
+        project_dir.joinpath(".venv").mkdir(parents=True)
+        project_dir.joinpath("Makefile").write_text("")
+        log_path = workspace.log_dir.joinpath("generation", name + ".log")
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        log_path.write_text(name)
+        results.append(
+            install_pool.InstallResult(
+                project_dir=project_dir,
+                success=success,
+                message="",
+                log_path=log_path,
+            )
+        )
+
+    output_dir = root.joinpath("output")
+    log_dir = root.joinpath("logs")
+    disk_results = test_module.copy_out(
+        workspace=workspace, results=results, output_dir=output_dir, log_dir=log_dir
+    )
+    assert [result.project_dir for result in disk_results] == [
+        output_dir.joinpath("generation", "passing"),
+        output_dir.joinpath("generation", "failing"),
+    ]
+    assert not disk_results[0].project_dir.exists()
+    assert disk_results[1].project_dir.joinpath("Makefile").is_file()
+    assert not disk_results[1].project_dir.joinpath(".venv").exists()
+    for result in disk_results:
+        assert result.log_path is not None
+        assert result.log_path.parent == log_dir.joinpath("generation")
+        assert result.log_path.is_file()
+    test_module.remove_workspace(workspace=workspace)
+    shutil.rmtree(root)
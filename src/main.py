@@ -1,55 +1,391 @@
 import argparse
 import logging
 import pathlib
-import shutil
+from typing import Any, Dict
 
-from src.core import initialize_project, isolate_temp_template
-
-logging.basicConfig(level=logging.INFO)
-
-
-def run(template_dir: pathlib.Path, output_dir: pathlib.Path) -> None:
-    """Create, install and test the project from a template
-
-    Args:
-        template_dir (pathlib.Path): template directory path
-        output_dir (pathlib.Path): output directory path
-    """
-    isolated_template_dir = template_dir.joinpath(".template_cache")
-    isolate_temp_template.run(
-        template_dir=template_dir, cache_dir=isolated_template_dir
-    )
-    initialize_project.create_project(
-        template_dir=isolated_template_dir, output_dir=output_dir
-    )
-    logging.info(
-        "Removing isolated template directory cache at {isolated_template_dir}".format(
-            isolated_template_dir=isolated_template_dir
-        )
-    )
-    shutil.rmtree(isolated_template_dir)
-    for f_path in output_dir.glob("*"):
-        logging.info("Installing and testing {f_path}".format(f_path=f_path))
-        initialize_project.install_project(project_dir=f_path)
+# The subsystems are imported once the arguments are parsed, so that --help and
+# invalid arguments do not pay for their import
+from src.core import defaults, pipeline
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
-    parser.add_argument(
-        "--template", help="Cookiecutter template directory", required=True
+    template_group = parser.add_mutually_exclusive_group(required=True)
+    template_group.add_argument("--template", help="Cookiecutter template directory")
+    template_group.add_argument(
+        "--templates",
+        help="Cookiecutter template directories run as a batch sharing the jobs"
+        " workers, each one is generated into its own sub-directory of the cache",
+        nargs="+",
+        default=None,
+    )
+    template_group.add_argument(
+        "--discover",
+        help="Run the cookiecutter template directories found under this directory as"
+        " a batch, see --templates",
+        default=None,
+    )
+    template_group.add_argument(
+        "--merge",
+        help="Merge the partial result files written by the shards of a run into one"
+        " report (see --report, --junit and --trace), failing if a project failed or a"
+        " shard did not complete",
+        nargs="+",
+        default=None,
     )
     parser.add_argument(
         "--cache",
         help="Cache directory",
         default=pathlib.Path(".", ".cookiecutter-runner_cache"),
     )
+    parser.add_argument(
+        "--jobs",
+        help="Number of projects installed and tested at the same time",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--logs",
+        help="Directory receiving one log file per project",
+        default=pathlib.Path(".", ".cookiecutter-runner_logs"),
+    )
+    parser.add_argument(
+        "--matrix",
+        help="Generate every combination of these choice variables of cookiecutter.json"
+        " (all choice variables if no variable is given)",
+        nargs="*",
+        default=None,
+    )
+    parser.add_argument(
+        "--matrix-sample",
+        help="Only generate this number of randomly sampled matrix combinations",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--matrix-seed", help="Seed of the matrix sampling", type=int, default=0
+    )
+    parser.add_argument(
+        "--render-backend",
+        help="Render in-process with the cookiecutter API or spawn the cookiecutter CLI",
+        choices=defaults.RENDER_BACKENDS,
+        default="auto",
+    )
+    parser.add_argument(
+        "--link-mode",
+        help="How the template files are isolated, falling back to copy if the file"
+        " system does not support the link mode",
+        choices=defaults.LINK_MODES,
+        default="copy",
+    )
+    parser.add_argument(
+        "--copy-workers",
+        help="Number of threads copying the template files (use more threads on high"
+        " latency storage such as NFS)",
+        type=int,
+        default=defaults.DEFAULT_WORKERS,
+    )
+    parser.add_argument(
+        "--env-cache",
+        help="Virtual environment cache shared by the projects having the same"
+        " pyproject.toml and poetry.lock (disabled if not specified)",
+        default=None,
+    )
+    parser.add_argument(
+        "--results",
+        help="Result cache skipping the generations which already succeeded with the"
+        " same template contents, context and make-targets (disabled if not specified)",
+        default=None,
+    )
+    parser.add_argument(
+        "--force",
+        help="Run the generations already succeeded in the result cache",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--report",
+        help="Write a JSON report with the timings of each phase and make-target",
+        default=None,
+    )
+    parser.add_argument(
+        "--junit", help="Write a JUnit XML report of the make-targets", default=None
+    )
+    parser.add_argument(
+        "--trace", help="Write a Chrome trace-event file of the phases", default=None
+    )
+    parser.add_argument(
+        "--history",
+        help="File recording the outcome and the make-target durations of the last run"
+        " of each project, used to plan the next runs and to run first the projects"
+        " which failed (default:"
+        " .cookiecutter-runner_history.json in the cache directory)",
+        default=None,
+    )
+    failure_group = parser.add_mutually_exclusive_group()
+    failure_group.add_argument(
+        "--fail-fast",
+        help="Stop at the first failing project: the running projects are cancelled"
+        " and the next ones are not run",
+        action="store_true",
+    )
+    failure_group.add_argument(
+        "--keep-going",
+        help="Run all the projects whatever the failures, then report all of them"
+        " (default)",
+        dest="fail_fast",
+        action="store_false",
+        default=argparse.SUPPRESS,
+    )
+    parser.add_argument(
+        "--shard-index",
+        help="Index of the shard run by this process, from 0 to --shard-count - 1",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--shard-count",
+        help="Number of shards the generations of the run are deterministically"
+        " partitioned into, balanced by the make-target durations of the history (give"
+        " the same --history to every shard)",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--shard-result",
+        help="Partial result file written by the shard, see --merge (default:"
+        " .cookiecutter-runner_shard_<index>.json in the cache directory when sharded)",
+        default=None,
+    )
+    parser.add_argument(
+        "--stages",
+        help="Make-targets run in each project, each one optionally followed by the"
+        " stages it needs and its resource limits (such as"
+        " test:install,lint@timeout=1800,cpu=600,memory=4G), the independent stages"
+        " run concurrently (default: install lint:install check:lint test:check, run"
+        " one after the other)",
+        type=pipeline.parse_stage,
+        nargs="+",
+        default=None,
+    )
+    parser.add_argument(
+        "--stage-jobs",
+        help="Maximum number of concurrent make-targets of a project (no limit if not"
+        " specified)",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--console",
+        help="Print the output of cookiecutter and of the make-targets live, each line"
+        " is prefixed by its project and its make-target",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--stage-timeout",
+        help="Maximum duration of each make-target in seconds, its process group is"
+        " killed after it (no limit if not specified)",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--stage-cpu-limit",
+        help="Maximum CPU time in seconds of each process of a make-target (no limit if"
+        " not specified)",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--stage-memory-limit",
+        help="Maximum address space of each process of a make-target, such as 2G (no"
+        " limit if not specified)",
+        type=defaults.parse_size,
+        default=None,
+    )
+    parser.add_argument(
+        "--workspace",
+        help="Generate and test the projects on the disk, or in a RAM-backed workspace"
+        " (only the logs and the failing projects are copied out)",
+        choices=defaults.WORKSPACES,
+        default="disk",
+    )
+    parser.add_argument(
+        "--workspace-dir",
+        help="RAM-backed directory of the tmpfs workspace",
+        default=defaults.DEFAULT_TMPFS_DIR,
+    )
+    parser.add_argument(
+        "--workspace-budget",
+        help="Maximum size written into the tmpfs workspace, such as 2G, the next"
+        " generations are written on the disk once exhausted",
+        type=defaults.parse_size,
+        default=defaults.DEFAULT_BUDGET,
+    )
+    parser.add_argument(
+        "--incremental-render",
+        help="Only write the generated files whose content changed, the other files"
+        " keep their modification time",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch",
+        help="Rerun on each change of the template files (ignoring the files ignored"
+        " by git), only the projects whose rendered files changed are rerun, without"
+        " the install stage if their dependency files did not change",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch-debounce",
+        help="Seconds without any change before rerunning",
+        type=float,
+        default=defaults.DEFAULT_DEBOUNCE,
+    )
+    parser.add_argument(
+        "--watch-polling",
+        help="Poll the template files instead of using inotify",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--plan",
+        help="Only plan the run: log the files to be isolated, the generations to be"
+        " rendered and the stages to be run or skipped with their estimated sizes and"
+        " historical durations, then write this work graph as JSON into this file"
+        " (- for the standard output)",
+        nargs="?",
+        const="-",
+        default=None,
+    )
     args = parser.parse_args()
-    template_dir: pathlib.Path = pathlib.Path(args.template)
+    logging.basicConfig(level=logging.INFO)
+    if args.watch and args.template is None:
+        parser.error("--watch only supports a single --template")
+    if args.plan is not None and args.template is None:
+        parser.error("--plan only supports a single --template")
+    sharded = args.shard_count != 1 or args.shard_index != 0
+    if sharded and (args.template is None or args.watch):
+        parser.error("--shard-index and --shard-count only support a single --template")
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error("--shard-index must be between 0 and --shard-count - 1")
     cache_dir: pathlib.Path = pathlib.Path(args.cache)
+    log_dir: pathlib.Path = pathlib.Path(args.logs)
 
-    run(template_dir=template_dir, output_dir=cache_dir)
+    from src.core import resource_limits
+
+    run_kwargs: Dict[str, Any] = dict(
+        jobs=args.jobs,
+        log_dir=log_dir,
+        matrix=args.matrix,
+        matrix_sample=args.matrix_sample,
+        matrix_seed=args.matrix_seed,
+        render_backend=args.render_backend,
+        link_mode=args.link_mode,
+        copy_workers=args.copy_workers,
+        env_cache_dir=pathlib.Path(args.env_cache) if args.env_cache else None,
+        result_cache_dir=pathlib.Path(args.results) if args.results else None,
+        force=args.force,
+        report_path=pathlib.Path(args.report) if args.report else None,
+        junit_path=pathlib.Path(args.junit) if args.junit else None,
+        trace_path=pathlib.Path(args.trace) if args.trace else None,
+        history_path=(
+            pathlib.Path(args.history)
+            if args.history
+            else cache_dir.joinpath(".cookiecutter-runner_history.json")
+        ),
+        stages=args.stages,
+        stage_jobs=args.stage_jobs,
+        console=args.console,
+        stage_limits=resource_limits.ResourceLimits(
+            timeout=args.stage_timeout,
+            cpu_time=args.stage_cpu_limit,
+            memory=args.stage_memory_limit,
+        ),
+        workspace_mode=args.workspace,
+        workspace_dir=pathlib.Path(args.workspace_dir),
+        workspace_budget=args.workspace_budget,
+        incremental=args.incremental_render,
+        fail_fast=args.fail_fast,
+    )
+    if args.merge is not None:
+        from src.core import runner
+
+        runner.merge_shards(
+            result_paths=[pathlib.Path(result_path) for result_path in args.merge],
+            output_dir=cache_dir,
+            report_path=run_kwargs["report_path"],
+            junit_path=run_kwargs["junit_path"],
+            trace_path=run_kwargs["trace_path"],
+            history_path=run_kwargs["history_path"],
+        )
+        return
+    if args.plan is not None:
+        from src.core import run_history, run_plan, sharding
+
+        plan = run_plan.plan_run(
+            template_dir=pathlib.Path(args.template),
+            output_dir=cache_dir,
+            matrix=args.matrix,
+            matrix_sample=args.matrix_sample,
+            matrix_seed=args.matrix_seed,
+            link_mode=args.link_mode,
+            result_cache_dir=run_kwargs["result_cache_dir"],
+            force=args.force,
+            stages=args.stages,
+            history_path=run_kwargs["history_path"],
+            shard=(
+                sharding.create_shard(
+                    index=args.shard_index,
+                    count=args.shard_count,
+                    history=run_history.load_history(
+                        history_path=run_kwargs["history_path"]
+                    ),
+                )
+                if sharded
+                else None
+            ),
+        )
+        logging.info("Run plan:\n{plan}".format(plan=run_plan.format_plan(plan=plan)))
+        run_plan.write_plan(
+            plan=plan, plan_path=None if args.plan == "-" else pathlib.Path(args.plan)
+        )
+        return
+    from src.core import isolate_temp_template, runner
+
+    if args.template is None:
+        template_dirs = [
+            pathlib.Path(template_dir) for template_dir in args.templates or []
+        ]
+        if args.discover is not None:
+            template_dirs = isolate_temp_template.find_template_directories(
+                root=pathlib.Path(args.discover)
+            )
+        runner.run_batch(
+            template_dirs=template_dirs, output_dir=cache_dir, **run_kwargs
+        )
+    elif args.watch:
+        runner.watch(
+            template_dir=pathlib.Path(args.template),
+            output_dir=cache_dir,
+            debounce=args.watch_debounce,
+            polling=args.watch_polling,
+            **run_kwargs,
+        )
+    else:
+        shard_result_path = None
+        if args.shard_result:
+            shard_result_path = pathlib.Path(args.shard_result)
+        elif sharded:
+            shard_result_path = cache_dir.joinpath(
+                ".cookiecutter-runner_shard_{index}.json".format(index=args.shard_index)
+            )
+        runner.run(
+            template_dir=pathlib.Path(args.template),
+            output_dir=cache_dir,
+            shard_index=args.shard_index,
+            shard_count=args.shard_count,
+            shard_result_path=shard_result_path,
+            **run_kwargs,
+        )
 
 
 if __name__ == "__main__":
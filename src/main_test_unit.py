@@ -1,73 +1,118 @@
-import logging
+import os
 import pathlib
 import shutil
 import subprocess
-
-from . import main as test_module
-
-logging.basicConfig(level=logging.INFO)
+import sys
+from typing import List, Tuple
 
 TEST_ASSETS_DIR = pathlib.Path(pathlib.Path(__file__).parent).joinpath(
     "main_test_assets"
 )
+ROOT_DIR = pathlib.Path(__file__).absolute().parent.parent
 
+# Cumulative import time of the command line module, in microseconds as reported by
+# python -X importtime (importing every subsystem took about 130ms)
+IMPORT_TIME_BUDGET = 60000
+# Subsystems only needed once the arguments are parsed
+LAZY_MODULES = [
+    "asyncio",
+    "concurrent.futures",
+    "subprocess",
+    "cookiecutter",
+    "src.core.runner",
+    "src.core.initialize_project",
+    "src.core.isolate_temp_template",
+    "src.core.install_pool",
+    "src.core.link_files",
+]
 
-class Test_run:
-    def test_run_case_1(self) -> None:
-        def assert_content(f_path: pathlib.Path, expected: str) -> None:
-            assert f_path.is_file()
-            with open(f_path, "r") as f:
-                assert f.read() == expected
 
-        cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
-        if cache_dir.is_dir():
-            shutil.rmtree(cache_dir)
-        test_module.run(
-            template_dir=TEST_ASSETS_DIR.joinpath("run_case_1"), output_dir=cache_dir
-        )
-        f_paths = list(cache_dir.glob("*"))
-        assert len(f_paths) == 1
-        project_dir = f_paths[0]
-        assert not project_dir.joinpath(".git").is_dir()
-        assert_content(
-            f_path=project_dir.joinpath("testing_module").joinpath("default"),
-            expected="test",
-        )
-        assert_content(
-            f_path=project_dir.joinpath("testing_module").joinpath("install"),
-            expected="Installing\n",
-        )
-        assert_content(
-            f_path=project_dir.joinpath("testing_module").joinpath("lint"),
-            expected="Linting\n",
-        )
-        assert_content(
-            f_path=project_dir.joinpath("testing_module").joinpath("check"),
-            expected="Checking\n",
+def import_main(
+    args: List[str],
+) -> Tuple["subprocess.CompletedProcess[bytes]", List[str], int]:
+    """Run python -X importtime, the src package being importable
+
+    Args:
+        args (List[str]): arguments of python after -X importtime
+
+    Returns:
+        Tuple[subprocess.CompletedProcess[bytes], List[str], int]:
+        - the completed process
+        - modules imported after the interpreter startup (site)
+        - cumulative import time of src.main in microseconds, 0 if not imported
+    """
+    env = dict(os.environ, PYTHONPATH=str(ROOT_DIR))
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime"] + args,
+        cwd=ROOT_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=False,
+    )
+    modules: List[str] = []
+    main_time = 0
+    for line in process.stderr.decode("utf-8").splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == "site":
+            # Imported by the interpreter startup, whatever the command
+            modules = []
+            continue
+        modules.append(name.strip())
+        if name.strip() == "src.main":
+            main_time = int(cumulative)
+    return process, modules, main_time
+
+
+class Test_main:
+    def test_import_time(self) -> None:
+        process, modules, main_time = import_main(args=["-c", "import src.main"])
+        assert process.returncode == 0, process.stderr.decode("utf-8")
+        assert "src.main" in modules
+        assert [module for module in LAZY_MODULES if module in modules] == []
+        assert 0 < main_time < IMPORT_TIME_BUDGET
+
+    def test_help(self) -> None:
+        process, modules, _ = import_main(
+            args=[str(pathlib.Path("src", "main.py")), "--help"]
         )
-        assert_content(
-            f_path=project_dir.joinpath("testing_module").joinpath("test"),
-            expected="Testing\n",
+        assert process.returncode == 0, process.stderr.decode("utf-8")
+        assert "--template" in process.stdout.decode("utf-8")
+        assert [module for module in LAZY_MODULES if module in modules] == []
+
+        # Invalid arguments are reported before importing the subsystems
+        process, modules, _ = import_main(
+            args=[str(pathlib.Path("src", "main.py")), "--template", "t", "--jobs", "x"]
         )
-        shutil.rmtree(cache_dir)
+        assert process.returncode == 2
+        assert [module for module in LAZY_MODULES if module in modules] == []
 
     def test_main_entrypoint(self) -> None:
         cache_dir = TEST_ASSETS_DIR.joinpath(".test_cache")
         if cache_dir.is_dir():
             shutil.rmtree(cache_dir)
+        log_dir = TEST_ASSETS_DIR.joinpath(".test_logs")
 
         p = subprocess.Popen(
             [
                 "python3",
                 pathlib.Path("src", "main.py"),
                 "--template",
-                TEST_ASSETS_DIR.joinpath("run_case_1"),
+                ROOT_DIR.joinpath("src", "core", "runner_test_assets", "run_case_1"),
                 "--cache",
                 cache_dir,
+                "--logs",
+                log_dir,
+                "--jobs",
+                "2",
             ]
         )
         res, _ = p.communicate()
         p.wait()
         if p.returncode != 0:
             raise RuntimeError(res.decode("utf-8"))
+        assert log_dir.joinpath("testing.log").is_file()
         shutil.rmtree(cache_dir)
+        shutil.rmtree(log_dir)